@@ -0,0 +1,121 @@
+"""
+Single-pass decoding of BLE advertisements.
+
+Fingerprinting, iOS detection and manufacturer lookup all need the same few
+AD structures. Instead of each of them fetching and hex-encoding values through
+ScanEntry.getValue and getValueText, an advertisement is walked once into an
+Advertisement record that all of them share.
+"""
+from typing import Any
+
+from .core.constants import (
+    COMPLETE_16B_SERVICES,
+    COMPLETE_LOCAL_NAME,
+    DEVICE_CLASS,
+    INCOMPLETE_16B_SERVICES,
+    MANUFACTURER_DATA_TYPE,
+    SHORT_LOCAL_NAME,
+)
+
+COMPANY_ID_LENGTH = 2  # Manufacturer data starts with a 2-byte company ID
+SERVICE_UUID_16_LENGTH = 2
+
+class Advertisement:
+    """The parts of a BLE advertisement used to identify and classify a device."""
+    __slots__ = (
+        'addr',
+        'addr_type',
+        'device_class',
+        'manufacturer_data',
+        'manufacturer_id',
+        'name',
+        'rssi',
+        'services',
+        'short_name',
+    )
+
+    def __init__(self, addr: str, addr_type: str, rssi: int) -> None:
+        """Initialize an advertisement without any advertising data."""
+        self.addr = addr
+        self.addr_type = addr_type
+        self.rssi = rssi
+        self.manufacturer_id: int | None = None
+        self.manufacturer_data = b''
+        self.services: frozenset[int] = frozenset()
+        self.name = ''
+        self.short_name = ''
+        self.device_class = b''
+
+def read_company_id(manufacturer_data: bytes | None) -> int | None:
+    """
+    Read the company ID from the start of manufacturer specific data.
+
+    The ID is a 16-bit little-endian integer (Core Specification Supplement,
+    Part A, 1.4). It is read from the two bytes in place, without slicing,
+    hex encoding or parsing text.
+
+    Args:
+        manufacturer_data: Raw value of the manufacturer specific data AD structure,
+            e.g. from ScanEntry.getValue(MANUFACTURER_DATA_TYPE)
+
+    Returns:
+        The company ID, or None if the data is too short to contain one.
+    """
+    if manufacturer_data is None or len(manufacturer_data) < COMPANY_ID_LENGTH:
+        return None
+    return manufacturer_data[0] | manufacturer_data[1] << 8
+
+def _decode_name(value: bytes) -> str:
+    """Decode a local name the way bluepy does, replacing garbage from misbehaving devices."""
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return ''.join(chr(x) if 32 <= x <= 127 else '?' for x in value)  # noqa: PLR2004 (printable ASCII)
+
+def decode_advertisement(device: Any) -> Advertisement:
+    """
+    Decode the advertising data of a scan entry in a single pass.
+
+    Args:
+        device: The BLE device object, or an already decoded Advertisement
+
+    Returns:
+        The decoded Advertisement. An Advertisement is returned unchanged, so
+        every consumer accepts both raw scan entries and decoded advertisements.
+    """
+    if isinstance(device, Advertisement):
+        return device
+    return decode_scan_data(device.addr, device.addrType, device.rssi, device.scanData)
+
+def decode_scan_data(addr: str, addr_type: str, rssi: int, scan_data: dict[int, bytes]) -> Advertisement:
+    """
+    Decode AD structures that have been separated from their scan entry.
+
+    Args:
+        addr: Address of the advertiser
+        addr_type: "public" or "random"
+        rssi: Received signal strength
+        scan_data: Dictionary mapping AD types to raw values, as in ScanEntry.scanData
+
+    Returns:
+        The decoded Advertisement.
+    """
+    advertisement = Advertisement(addr, addr_type, rssi)
+    services: set[int] = set()
+    for ad_type, value in scan_data.items():
+        if ad_type == MANUFACTURER_DATA_TYPE:
+            advertisement.manufacturer_data = value
+            advertisement.manufacturer_id = read_company_id(value)
+        elif ad_type in (INCOMPLETE_16B_SERVICES, COMPLETE_16B_SERVICES):
+            # Service UUIDs are little-endian too
+            for offset in range(0, len(value) - 1, SERVICE_UUID_16_LENGTH):
+                services.add(value[offset] | value[offset + 1] << 8)
+        elif ad_type == COMPLETE_LOCAL_NAME:
+            advertisement.name = _decode_name(value)
+        elif ad_type == SHORT_LOCAL_NAME:
+            advertisement.short_name = _decode_name(value)
+        elif ad_type == DEVICE_CLASS:
+            advertisement.device_class = value
+    if services:
+        advertisement.services = frozenset(services)
+    return advertisement
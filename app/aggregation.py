@@ -4,7 +4,20 @@ Data aggregation module for managing historical scan data.
 from datetime import datetime, timedelta
 
 from .models import ScanResult
+from .sketch import merge_sketches
 
+PERSISTED_DAILY_RESULTS = 7  # Daily results kept beyond the week of hourly data
+
+def persisted_history_start(now: datetime) -> datetime:
+    """
+    Get the time from which get_aggregated_history keeps results.
+
+    Older results are dropped when the history is saved, so they need not be
+    passed to it.
+    """
+    week_ago = now - timedelta(days=7)
+    first_day = week_ago.replace(hour=0, minute=0, second=0, microsecond=0)
+    return first_day - timedelta(days=PERSISTED_DAILY_RESULTS - 1)
 
 def aggregate_hourly(results: list[ScanResult]) -> list[ScanResult]:
     """
@@ -36,7 +49,7 @@ def aggregate_hourly(results: list[ScanResult]) -> list[ScanResult]:
         other_devices = sum(r.other_devices for r in group) / len(group)
 
         # Aggregate manufacturer stats
-        manufacturer_stats: dict[str, float] = {}
+        manufacturer_stats: dict[int, float] = {}
         for result in group:
             for manufacturer, count in result.manufacturer_stats.items():
                 if manufacturer not in manufacturer_stats:
@@ -59,7 +72,9 @@ def aggregate_hourly(results: list[ScanResult]) -> list[ScanResult]:
             ios_devices=round(ios_devices),
             other_devices=round(other_devices),
             manufacturer_stats={k: round(v) for k, v in manufacturer_stats.items()},
-            session_stats=session_stats
+            session_stats=session_stats,
+            # Sketches merge exactly, so the rollup keeps the full dwell time distribution
+            dwell_sketch=merge_sketches([r.dwell_sketch for r in group])
         ))
 
     return sorted(aggregated_results, key=lambda x: x.timestamp)
@@ -94,7 +109,7 @@ def aggregate_daily(results: list[ScanResult]) -> list[ScanResult]:
         other_devices = sum(r.other_devices for r in group) / len(group)
 
         # Aggregate manufacturer stats
-        manufacturer_stats: dict[str, float] = {}
+        manufacturer_stats: dict[int, float] = {}
         for result in group:
             for manufacturer, count in result.manufacturer_stats.items():
                 if manufacturer not in manufacturer_stats:
@@ -117,7 +132,9 @@ def aggregate_daily(results: list[ScanResult]) -> list[ScanResult]:
             ios_devices=round(ios_devices),
             other_devices=round(other_devices),
             manufacturer_stats={k: round(v) for k, v in manufacturer_stats.items()},
-            session_stats=session_stats
+            session_stats=session_stats,
+            # Sketches merge exactly, so the rollup keeps the full dwell time distribution
+            dwell_sketch=merge_sketches([r.dwell_sketch for r in group])
         ))
 
     return sorted(aggregated_results, key=lambda x: x.timestamp)
@@ -138,6 +155,7 @@ def get_aggregated_history(results: list[ScanResult]) -> dict[str, list[ScanResu
     now = datetime.now()
     day_ago = now - timedelta(days=1)
     week_ago = now - timedelta(days=7)
+    history_start = persisted_history_start(now)
 
     # Sort results by timestamp
     sorted_results = sorted(results, key=lambda x: x.timestamp)
@@ -145,7 +163,7 @@ def get_aggregated_history(results: list[ScanResult]) -> dict[str, list[ScanResu
     # Split data into time periods
     detailed_data = [r for r in sorted_results if r.timestamp >= day_ago]
     hourly_data = [r for r in sorted_results if day_ago > r.timestamp >= week_ago]
-    daily_data = [r for r in sorted_results if r.timestamp < week_ago]
+    daily_data = [r for r in sorted_results if history_start <= r.timestamp < week_ago]
 
     # Aggregate data
     hourly_aggregated = aggregate_hourly(hourly_data)
@@ -153,7 +171,7 @@ def get_aggregated_history(results: list[ScanResult]) -> dict[str, list[ScanResu
 
     # For daily data, keep only the last 7 days
     if daily_aggregated:
-        daily_aggregated = sorted(daily_aggregated, key=lambda x: x.timestamp, reverse=True)[:7]
+        daily_aggregated = sorted(daily_aggregated, key=lambda x: x.timestamp, reverse=True)[:PERSISTED_DAILY_RESULTS]
         daily_aggregated = sorted(daily_aggregated, key=lambda x: x.timestamp)
 
     return {
@@ -0,0 +1,265 @@
+"""
+Bluetooth adapter management and system checks.
+
+All external commands are run with asyncio subprocesses so that configuring
+the adapter never blocks the event loop serving the API. Checking the adapter
+does not spawn any process at all: its state is read with an HCI ioctl and
+cached for a short time.
+"""
+import asyncio
+import fcntl
+import logging
+import shutil
+import socket
+import struct
+import subprocess
+import time
+from typing import Any
+
+from fastapi import HTTPException
+
+from .core.constants import (
+    ADAPTER_INITIAL_BACKOFF_SECONDS,
+    ADAPTER_MAX_BACKOFF_SECONDS,
+    DEFAULT_BLUETOOTH_ADAPTER,
+    HEALTH_PROBE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Adapter states tracked by AdapterManager
+ADAPTER_UNINITIALISED = "uninitialised"
+ADAPTER_READY = "ready"
+ADAPTER_FAILED = "failed"
+
+# HCI ioctl constants, see <bluetooth/hci.h>
+AF_BLUETOOTH = getattr(socket, 'AF_BLUETOOTH', 31)  # Not exposed by Python builds without Bluetooth headers
+BTPROTO_HCI = getattr(socket, 'BTPROTO_HCI', 1)
+HCIGETDEVINFO = 0x800448D3  # _IOR('H', 211, int)
+HCI_DEV_INFO_SIZE = 92  # sizeof(struct hci_dev_info)
+HCI_DEV_INFO_FLAGS_OFFSET = 16  # Offset of the flags field in struct hci_dev_info
+HCI_UP = 0x01  # Adapter is powered on
+
+async def run_command(*args: str) -> tuple[int, str]:
+    """
+    Run an external command without blocking the event loop.
+
+    Args:
+        args: The command and its arguments
+
+    Returns:
+        Tuple of (return code, decoded standard output).
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, _ = await process.communicate()
+    return process.returncode, stdout.decode(errors='replace')
+
+async def run_checked_command(*args: str) -> str:
+    """
+    Run an external command and raise if it fails.
+
+    Raises:
+        subprocess.CalledProcessError: If the command exits with a non-zero status
+    """
+    returncode, stdout = await run_command(*args)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, list(args), output=stdout)
+    return stdout
+
+def adapter_index(adapter: str) -> int:
+    """Get the numeric index of an HCI adapter name, e.g. 0 for "hci0"."""
+    return int(adapter.removeprefix('hci'))
+
+def read_adapter_flags(adapter: str = DEFAULT_BLUETOOTH_ADAPTER) -> int:
+    """
+    Read the HCI device flags of an adapter with the HCIGETDEVINFO ioctl.
+
+    This is what hciconfig does internally, without spawning a process.
+
+    Raises:
+        OSError: If the adapter does not exist or Bluetooth sockets are not available
+    """
+    request = bytearray(HCI_DEV_INFO_SIZE)
+    struct.pack_into('=H', request, 0, adapter_index(adapter))
+    with socket.socket(AF_BLUETOOTH, socket.SOCK_RAW, BTPROTO_HCI) as sock:
+        fcntl.ioctl(sock.fileno(), HCIGETDEVINFO, request)
+    return struct.unpack_from('=I', request, HCI_DEV_INFO_FLAGS_OFFSET)[0]
+
+def check_system_requirements(adapter: str = DEFAULT_BLUETOOTH_ADAPTER) -> tuple[bool, str]:
+    """
+    Checks if the system meets the requirements for BLE scanning.
+    Returns (success: bool, message: str)
+    """
+    # Check if BlueZ is installed, with the btmgmt tool that configures the adapter
+    if shutil.which('btmgmt') is None:
+        return False, "BlueZ is not installed or not accessible"
+
+    # Check if Bluetooth is enabled
+    try:
+        flags = read_adapter_flags(adapter)
+    except OSError as e:
+        logger.debug(f"Reading {adapter} flags failed: {e}")
+        return False, "Could not check Bluetooth status"
+
+    if not flags & HCI_UP:
+        return False, "Bluetooth is not powered on"
+
+    return True, "System requirements met"
+
+class AdapterProbe:
+    """
+    Caches the result of check_system_requirements for a short time.
+
+    Health checks and the scan loop share one probe, so frequent health checks
+    are answered from memory instead of querying the adapter every time.
+    """
+    def __init__(self, adapter: str = DEFAULT_BLUETOOTH_ADAPTER, ttl_seconds: float = HEALTH_PROBE_TTL_SECONDS) -> None:
+        """
+        Initialize the AdapterProbe.
+
+        Args:
+            adapter: Name of the HCI adapter to check
+            ttl_seconds: How long a result is reused before the adapter is checked again
+        """
+        self.adapter = adapter
+        self.ttl_seconds = ttl_seconds
+        self._result: tuple[bool, str] | None = None
+        self._expires_at = 0.0
+
+    def check(self) -> tuple[bool, str]:
+        """Return the cached check result, refreshing it if it has expired."""
+        now = time.monotonic()
+        if self._result is None or now >= self._expires_at:
+            self._result = check_system_requirements(self.adapter)
+            self._expires_at = now + self.ttl_seconds
+        return self._result
+
+    def invalidate(self) -> None:
+        """Forget the cached result, e.g. after the adapter has failed or been reset."""
+        self._result = None
+
+async def setup_bluetooth(adapter: str = DEFAULT_BLUETOOTH_ADAPTER) -> None:
+    """Set up Bluetooth adapter for scanning."""
+    try:
+        # Reset the Bluetooth adapter
+        await run_checked_command('hciconfig', adapter, 'reset')
+        # Enable scanning
+        await run_checked_command('hciconfig', adapter, 'up')
+
+        # bluetoothctl acts on the default controller, btmgmt can be pointed at this adapter
+        index = str(adapter_index(adapter))
+
+        # Try to stop any existing discovery, but don't fail if it errors
+        try:
+            await run_command('btmgmt', '--index', index, 'stop-find')
+        except OSError:
+            logger.debug("No active scan to stop")
+
+        # Ensure power is on
+        await run_checked_command('btmgmt', '--index', index, 'power', 'on')
+
+    except subprocess.CalledProcessError as e:
+        logger.error(f"Error setting up Bluetooth: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to set up Bluetooth adapter: {e!s}"
+        ) from e
+
+class AdapterManager:
+    """
+    Tracks the state of a Bluetooth adapter.
+
+    The adapter is initialised once and then left alone while scanning works.
+    It is only reset again after a failure has been reported, and repeated
+    failures are retried with an exponential backoff.
+    """
+    def __init__(
+        self,
+        adapter: str = DEFAULT_BLUETOOTH_ADAPTER,
+        initial_backoff: float = ADAPTER_INITIAL_BACKOFF_SECONDS,
+        max_backoff: float = ADAPTER_MAX_BACKOFF_SECONDS
+    ) -> None:
+        """
+        Initialize the AdapterManager.
+
+        Args:
+            adapter: Name of the HCI adapter, e.g. "hci0"
+            initial_backoff: Seconds to wait after the first failure
+            max_backoff: Maximum seconds to wait between re-initialisation attempts
+        """
+        self.adapter = adapter
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.state = ADAPTER_UNINITIALISED
+        self.resets = 0
+        self.total_failures = 0
+        self.consecutive_failures = 0
+        self.last_error: str | None = None
+        self.next_attempt = 0.0
+
+    def backoff_seconds(self) -> float:
+        """Get the delay imposed by the current run of consecutive failures."""
+        if self.consecutive_failures == 0:
+            return 0.0
+        return min(self.max_backoff, self.initial_backoff * 2 ** (self.consecutive_failures - 1))
+
+    def seconds_until_retry(self) -> float:
+        """Get how long to wait before the adapter may be re-initialised."""
+        return max(0.0, self.next_attempt - time.monotonic())
+
+    async def ensure_ready(self) -> bool:
+        """
+        Make sure the adapter is initialised.
+
+        Does nothing while the adapter is ready, and does not retry before the
+        backoff of a previous failure has expired.
+
+        Returns:
+            True if the adapter is ready for scanning, False otherwise.
+        """
+        if self.state == ADAPTER_READY:
+            return True
+        if self.seconds_until_retry() > 0:
+            return False
+
+        try:
+            await setup_bluetooth(self.adapter)
+        except (HTTPException, OSError) as e:
+            self.mark_failed(e)
+            return False
+
+        self.resets += 1
+        self.state = ADAPTER_READY
+        self.last_error = None
+        logger.info(f"Bluetooth adapter {self.adapter} initialised (resets: {self.resets})")
+        return True
+
+    def mark_healthy(self) -> None:
+        """Record that the adapter is delivering scan results, which clears the failure backoff."""
+        self.consecutive_failures = 0
+
+    def mark_failed(self, error: Exception | str) -> None:
+        """Record a failure so the adapter is re-initialised after the backoff."""
+        self.state = ADAPTER_FAILED
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self.next_attempt = time.monotonic() + self.backoff_seconds()
+        logger.warning(
+            f"Bluetooth adapter {self.adapter} failed: {self.last_error}, "
+            f"retrying in {self.backoff_seconds():.0f} seconds"
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get the adapter state and counters."""
+        return {
+            "adapter": self.adapter,
+            "state": self.state,
+            "resets": self.resets,
+            "failures": self.total_failures,
+            "last_error": self.last_error
+        }
@@ -0,0 +1,134 @@
+"""
+Cache of serialized API responses.
+
+/latest and /time-series only change when a scan result is added to the
+history or their time windows move on, so between two scans every client
+gets the same answer within a minute. Responses are serialized once per
+version, the history version and the current minute, and served from memory
+until it changes; clients that send the ETag of the response they already have get
+304 Not Modified instead of the body.
+"""
+import hashlib
+import json
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+ETAG_DIGEST_SIZE = 16  # Bytes of the body hash in an ETag
+
+class CachedResponse:
+    """A serialized JSON response and its ETag."""
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, content: Any) -> None:
+        """Serialize the content the way FastAPI does for a returned value."""
+        self.body = json.dumps(
+            jsonable_encoder(content),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=ETAG_DIGEST_SIZE).hexdigest()}"'
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+
+    Args:
+        if_none_match: The header value, "*" or a comma separated list of
+            ETags, or None if the header is missing
+        etag: The ETag of the current response
+
+    Returns:
+        True if the client already has the current response.
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+class ResponseCache:
+    """Serialized responses for a single version of the scan history."""
+    def __init__(self) -> None:
+        """Initialize an empty ResponseCache."""
+        self.version: Hashable = None
+        self.entries: dict[tuple[str, tuple[Any, ...]], CachedResponse] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, endpoint: str, params: tuple[Any, ...], version: Hashable) -> CachedResponse | None:
+        """
+        Get a cached response.
+
+        Args:
+            endpoint: Path of the endpoint
+            params: The query parameters the response depends on
+            version: The current version of the scan history and anything else
+                the responses depend on. A new version drops every response of
+                the previous one.
+
+        Returns:
+            The cached response, or None if there is none for this version.
+        """
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+        return self.entries.get((endpoint, params))
+
+    def put(
+        self,
+        endpoint: str,
+        params: tuple[Any, ...],
+        version: Hashable,
+        content: Any
+    ) -> CachedResponse:
+        """Serialize and cache a response for a version of the scan history."""
+        cached = CachedResponse(content)
+        if version == self.version:
+            self.entries[(endpoint, params)] = cached
+        return cached
+
+    def respond(
+        self,
+        request: Request,
+        params: tuple[Any, ...],
+        version: Hashable,
+        build: Callable[[], Any]
+    ) -> Response:
+        """
+        Answer a request from the cache, building the response on a miss.
+
+        Args:
+            request: The request, its path is the endpoint
+            params: The query parameters the response depends on
+            version: The current version the responses depend on
+            build: Builds the content of the response
+
+        Returns:
+            The JSON response with its ETag, or 304 Not Modified if the client
+            sent a matching If-None-Match header.
+        """
+        endpoint = request.url.path
+        cached = self.get(endpoint, params, version)
+        if cached is None:
+            self.misses += 1
+            cached = self.put(endpoint, params, version, build())
+        else:
+            self.hits += 1
+        # Clients revalidate on every request, the history changes every scan
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(cached.body, media_type="application/json", headers=headers)
+
+    def get_stats(self) -> dict[str, int]:
+        """Get the number of cached responses, hits and misses."""
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses
+        }
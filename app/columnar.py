@@ -0,0 +1,250 @@
+"""
+Columnar scan history in NumPy ring buffers.
+
+An alternative to the deque of ScanResult objects, for keeping weeks of
+scan results at one-minute resolution. Timestamps, device counts and session
+statistics are preallocated columns and manufacturer counts are a matrix of
+16-bit integers with a column per manufacturer seen, so a result costs two
+bytes per manufacturer instead of a dataclass, two dictionaries and a sketch.
+Counts are whole devices; the hourly and daily averages of older results
+loaded from disk are rounded. Window metrics and time series are computed
+with vectorized reductions over the columns; only the dwell time sketches,
+which are objects, are merged in Python.
+
+NumPy is an optional dependency; the store is selected with
+HISTORY_STORE=columnar.
+"""
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from .core.constants import COLUMNAR_HISTORY_MINUTES, COLUMNAR_MANUFACTURER_COLUMNS
+from .models import ScanResult
+from .sketch import QuantileSketch
+from .timeseries import EPOCH, MINUTE, RollupStats, minute_index
+from .windows import format_window_metrics
+
+_MICROSECOND = timedelta(microseconds=1)
+_MINUTE_MICROSECONDS = MINUTE // _MICROSECOND
+_SESSION_STATS = ("total_sessions", "active_sessions", "average_dwell_time")
+_MAX_MANUFACTURER_COUNT = np.iinfo(np.uint16).max
+
+def _number(value: float) -> float:
+    """Convert a column value back to a Python number, an int if it is whole."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+class ColumnarHistory:
+    """Bounded history of scan results kept as columns in ring buffers."""
+    def __init__(
+        self,
+        capacity: int = COLUMNAR_HISTORY_MINUTES,
+        manufacturer_columns: int = COLUMNAR_MANUFACTURER_COLUMNS
+    ) -> None:
+        """
+        Initialize the ColumnarHistory.
+
+        Args:
+            capacity: Number of results kept, the oldest are overwritten beyond it
+            manufacturer_columns: Manufacturer columns allocated at a time
+        """
+        self.capacity = capacity
+        self.version = 0  # Changes whenever the results do, for caching what is derived from them
+        self._timestamps = np.zeros(capacity, dtype=np.int64)  # Microseconds since EPOCH
+        self._counts = np.zeros((capacity, 3), dtype=np.uint32)  # Unique, iOS and other devices
+        self._sessions = np.zeros((capacity, len(_SESSION_STATS)))
+        self.manufacturer_columns = manufacturer_columns
+        self._manufacturers = np.zeros((capacity, manufacturer_columns), dtype=np.uint16)
+        self._columns: dict[int, int] = {}  # Manufacturer key to its column
+        self._keys: list[int] = []  # Manufacturer key of each column
+        self._sketches: list[QuantileSketch | None] = [None] * capacity  # None for windows without closed sessions
+        self._head = 0  # Row of the next result
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Get the number of results."""
+        return self._size
+
+    def __getitem__(self, index: int) -> ScanResult:
+        """Get a result by its position from the oldest, negative positions count from the newest."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("history index out of range")
+        return self._result((self._head - self._size + index) % self.capacity)
+
+    def __iter__(self) -> Iterator[ScanResult]:
+        """Iterate over the results, oldest first."""
+        for index in range(self._size):
+            yield self[index]
+
+    def append(self, result: ScanResult) -> None:
+        """Add the newest result, overwriting the oldest if the history is full."""
+        row = self._head
+        self._timestamps[row] = (result.timestamp - EPOCH) // _MICROSECOND
+        self._counts[row] = [round(count) for count in (result.unique_devices, result.ios_devices, result.other_devices)]
+        self._sessions[row] = [result.session_stats.get(name, 0) for name in _SESSION_STATS]
+        self._manufacturers[row] = 0
+        for manufacturer, count in result.manufacturer_stats.items():
+            column = self._column(manufacturer)  # Before indexing, adding a column may replace the matrix
+            self._manufacturers[row, column] = min(round(count), _MAX_MANUFACTURER_COUNT)
+        self._sketches[row] = result.dwell_sketch if result.dwell_sketch.count else None
+        self._head = (row + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.version += 1
+
+    def extend(self, results: Iterable[ScanResult]) -> None:
+        """Add results, oldest first."""
+        for result in results:
+            self.append(result)
+
+    def clear(self) -> None:
+        """Remove all results."""
+        self._manufacturers[:] = 0
+        self._columns.clear()
+        self._keys.clear()
+        self._sketches = [None] * self.capacity
+        self._head = 0
+        self._size = 0
+        self.version += 1
+
+    def _rows(self) -> np.ndarray:
+        """Get the rows of the results, oldest first."""
+        if self._size < self.capacity:
+            return np.arange(self._size)
+        return (np.arange(self.capacity) + self._head) % self.capacity
+
+    def copy(self, start_time: datetime | None = None) -> 'ColumnarHistory':
+        """
+        Copy the results from a time onwards into a new history.
+
+        Only the columns are copied, which is quick, so a copy can be taken
+        on the event loop and read in a worker thread while new results are
+        appended to the original.
+
+        Args:
+            start_time: Time of the oldest results to copy, or None to copy all
+        """
+        rows = self._rows()
+        if start_time is not None:
+            rows = rows[self._timestamps[rows] >= (start_time - EPOCH) // _MICROSECOND]
+        copy = ColumnarHistory(0, 0)
+        copy.capacity = max(len(rows), 1)
+        copy._timestamps = self._timestamps[rows]
+        copy._counts = self._counts[rows]
+        copy._sessions = self._sessions[rows]
+        copy._manufacturers = self._manufacturers[rows, :len(self._keys)]
+        copy._columns = dict(self._columns)
+        copy._keys = list(self._keys)
+        copy._sketches = [self._sketches[row] for row in rows.tolist()]
+        copy._size = len(rows)
+        return copy
+
+    def _column(self, manufacturer: int) -> int:
+        """Get the column of a manufacturer, adding one if it is new."""
+        column = self._columns.get(manufacturer)
+        if column is None:
+            column = len(self._keys)
+            if column == self._manufacturers.shape[1]:
+                # Grow by a fixed step rather than doubling, each column costs two bytes for every row
+                grown = np.zeros((self.capacity, column + self.manufacturer_columns), dtype=np.uint16)
+                grown[:, :column] = self._manufacturers
+                self._manufacturers = grown
+            self._columns[manufacturer] = column
+            self._keys.append(manufacturer)
+        return column
+
+    def _result(self, row: int) -> ScanResult:
+        """Rebuild the result stored in a row."""
+        unique_devices, ios_devices, other_devices = (_number(value) for value in self._counts[row])
+        manufacturers = self._manufacturers[row, :len(self._keys)]
+        return ScanResult(
+            timestamp=EPOCH + int(self._timestamps[row]) * _MICROSECOND,
+            unique_devices=unique_devices,
+            ios_devices=ios_devices,
+            other_devices=other_devices,
+            manufacturer_stats={
+                self._keys[column]: _number(manufacturers[column]) for column in np.flatnonzero(manufacturers)
+            },
+            session_stats={
+                name: _number(value) for name, value in zip(_SESSION_STATS, self._sessions[row], strict=True)
+            },
+            dwell_sketch=self._sketches[row] or QuantileSketch()
+        )
+
+    def _manufacturer_sums(self, sums: np.ndarray) -> dict[int, float]:
+        """Map the non-zero sums of the manufacturer columns to their keys."""
+        return {self._keys[column]: _number(sums[column]) for column in np.flatnonzero(sums)}
+
+    def get_metrics(self, start_time: datetime) -> dict[str, Any]:
+        """
+        Get the metrics of the results from a time onwards.
+
+        Args:
+            start_time: Start of the window
+
+        Returns:
+            The metrics in the same form as SlidingWindowMetrics.get_metrics().
+        """
+        size = self._size
+        selected = self._timestamps[:size] >= (start_time - EPOCH) // _MICROSECOND
+        rows = selected[:, np.newaxis]
+        dwell_sketch = QuantileSketch()
+        for row in np.flatnonzero(selected):
+            sketch = self._sketches[row]
+            if sketch is not None:
+                dwell_sketch.merge(sketch)
+        return format_window_metrics(
+            int(selected.sum()),
+            self._counts[:size].sum(axis=0, where=rows).tolist(),
+            [_number(value) for value in self._counts[:size].max(axis=0, where=rows, initial=0)],
+            self._manufacturer_sums(self._manufacturers[:size, :len(self._keys)].sum(axis=0, where=rows)),
+            dwell_sketch
+        )
+
+    def get_slots(self, start_time: datetime, end_time: datetime, interval_minutes: int) -> list[dict[str, Any]]:
+        """
+        Build a time series from the columns.
+
+        Args:
+            start_time: A time in the first slot
+            end_time: A time in the last slot
+            interval_minutes: Length of the slots
+
+        Returns:
+            The slots in the same form as MinuteRollups.get_slots().
+        """
+        first_slot = minute_index(start_time) // interval_minutes
+        slot_count = minute_index(end_time) // interval_minutes - first_slot + 1
+        result_slots = self._timestamps[:self._size] // _MINUTE_MICROSECONDS // interval_minutes - first_slot
+        rows = np.flatnonzero((result_slots >= 0) & (result_slots < slot_count))
+        slots = result_slots[rows]
+
+        counts = np.bincount(slots, minlength=slot_count)
+        sums = np.zeros((slot_count, 3), dtype=np.uint64)
+        np.add.at(sums, slots, self._counts[rows])
+        peaks = np.zeros((slot_count, 3), dtype=np.uint32)
+        np.maximum.at(peaks, slots, self._counts[rows])
+        session_sums = np.zeros((slot_count, len(_SESSION_STATS)))
+        np.add.at(session_sums, slots, self._sessions[rows])
+        manufacturer_sums = np.zeros((slot_count, len(self._keys)), dtype=np.uint64)
+        np.add.at(manufacturer_sums, slots, self._manufacturers[rows, :len(self._keys)])
+        sketches = [QuantileSketch() for _ in range(slot_count)]
+        for row, slot in zip(rows.tolist(), slots.tolist(), strict=True):
+            sketch = self._sketches[row]
+            if sketch is not None:
+                sketches[slot].merge(sketch)
+
+        time_series = []
+        for slot in range(slot_count):
+            stats = RollupStats()
+            stats.count = int(counts[slot])
+            stats.sums = sums[slot].tolist()
+            stats.peaks = [_number(value) for value in peaks[slot]]
+            stats.session_sums = session_sums[slot].tolist()
+            stats.manufacturer_sums = self._manufacturer_sums(manufacturer_sums[slot])
+            stats.dwell_sketch = sketches[slot]
+            time_series.append(stats.to_slot(EPOCH + (first_slot + slot) * interval_minutes * MINUTE))
+        return time_series
@@ -1,4 +1,5 @@
 """Constants used throughout the application."""
+import os
 
 # BLE Advertisement Data Types
 MANUFACTURER_DATA_TYPE = 255  # Manufacturer Specific Data
@@ -13,11 +14,44 @@ DEVICE_CLASS = 13  # Device Class
 MAX_HISTORY_HOURS = 24
 MAX_HISTORY_MINUTES = MAX_HISTORY_HOURS * 60
 MAX_TIME_SERIES_MINUTES = 1440  # 24 hours in minutes
-SCAN_INTERVAL_SECONDS = 60  # Scan every minute
-SCAN_DURATION_SECONDS = 10  # Each scan lasts 10 seconds
+SCAN_INTERVAL_SECONDS = 60  # Length of each scan window
+SCAN_DURATION_SECONDS = SCAN_INTERVAL_SECONDS  # Scanning is continuous, so each window is scanned end to end
+SCAN_PROCESS_TIMEOUT_SECONDS = 1.0  # How long each Scanner.process() call listens before returning
+SESSION_SNAPSHOT_INTERVAL_SECONDS = 60  # Time between snapshots of the open sessions
+SESSION_EVENT_QUEUE_SIZE = 1000  # Session events a stream consumer may fall behind before it is dropped
+SESSION_EVENT_KEEPALIVE_SECONDS = 15  # Longest silence on a session event stream
+
+# History store constants
+HISTORY_STORE = os.environ.get('HISTORY_STORE', 'deque')  # deque, or columnar to keep NumPy arrays (requires numpy)
+COLUMNAR_HISTORY_DAYS = int(os.environ.get('COLUMNAR_HISTORY_DAYS', '30'))  # Days of scan results kept by the columnar store
+COLUMNAR_HISTORY_MINUTES = COLUMNAR_HISTORY_DAYS * 24 * 60
+COLUMNAR_MANUFACTURER_COLUMNS = 64  # Manufacturer columns the columnar store allocates at a time
+
+# Bluetooth adapter constants
+DEFAULT_BLUETOOTH_ADAPTER = 'hci0'
+# Adapters to scan with concurrently, e.g. BLUETOOTH_ADAPTERS=hci0,hci1
+BLUETOOTH_ADAPTERS = os.environ.get('BLUETOOTH_ADAPTERS', DEFAULT_BLUETOOTH_ADAPTER).split(',')
+ADAPTER_INITIAL_BACKOFF_SECONDS = 5  # Wait after the first failed adapter initialisation
+ADAPTER_MAX_BACKOFF_SECONDS = 300  # Upper bound for the exponential re-initialisation backoff
+HEALTH_PROBE_TTL_SECONDS = 5  # How long a system requirements check result is reused
+
+# Scan source constants
+SCAN_SOURCE = os.environ.get('SCAN_SOURCE', 'bluepy')  # bluepy, replay or synthetic
+SCAN_REPLAY_FILE = os.environ.get('SCAN_REPLAY_FILE', '/data/advertisements.jsonl')  # Recording played by the replay source
+SCAN_REPLAY_SPEED = float(os.environ.get('SCAN_REPLAY_SPEED', '1.0'))  # Speed of replayed or synthetic traffic, 0 for unthrottled
+SCAN_RECORD_FILE = os.environ.get('SCAN_RECORD_FILE')  # Record live advertisements to this file when set
+SYNTHETIC_DEVICES = int(os.environ.get('SYNTHETIC_DEVICES', '200'))  # Size of the simulated crowd
+
+# Fingerprinting constants
+FINGERPRINT_CACHE_SIZE = int(os.environ.get('FINGERPRINT_CACHE_SIZE', '4096'))  # Advertising payloads remembered by the LRU
+# Use 64-bit integer fingerprints instead of SHA-256 hex strings to save memory with many sessions
+COMPACT_FINGERPRINTS = os.environ.get('COMPACT_FINGERPRINTS', 'false').lower() in ('1', 'true', 'yes')
+FINGERPRINT_KEY = os.environ.get('FINGERPRINT_KEY', '').encode()  # Key of the compact fingerprint hash
+FINGERPRINT_POOL_WORKERS = int(os.environ.get('FINGERPRINT_POOL_WORKERS', '0'))  # Processes for large batches, 0 to disable
+FINGERPRINT_POOL_THRESHOLD = 2000  # Unseen payloads in a window before fingerprinting is sent to the pool
 
 # Apple-specific constants
-APPLE_COMPANY_ID = '4c00'  # Apple's company ID
+APPLE_COMPANY_ID = 0x004C  # Apple's company ID, advertised little-endian as 4c 00
 APPLE_SERVICE_UUIDS = [
     '0xFD6F',  # Apple Continuity
     '0xFE95',  # Apple Nearby
@@ -0,0 +1,108 @@
+"""
+Session lifecycle events for Server-Sent Events consumers.
+
+The scan loop publishes an event when a session opens, a batch of updates for
+every scan window and an event when a session closes. Each subscriber reads
+from its own bounded queue; publishing never waits, and a subscriber whose
+queue is full is dropped rather than holding up the scan loop.
+"""
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+from .core.constants import SESSION_EVENT_KEEPALIVE_SECONDS, SESSION_EVENT_QUEUE_SIZE
+from .fingerprint import fingerprint_to_hex
+from .session import DeviceSession
+
+SESSION_OPEN = "open"
+SESSION_UPDATE = "update"
+SESSION_CLOSE = "close"
+
+# An event type and its JSON serializable data
+Event = tuple[str, dict[str, Any]]
+
+def session_event_data(session: DeviceSession) -> dict[str, Any]:
+    """Describe a session for an event."""
+    return {
+        "fingerprint": fingerprint_to_hex(session.fingerprint),
+        "start": session.start_time.isoformat(),
+        "end": session.last_seen.isoformat(),
+        "dwell_time": session.get_dwell_time(),
+        "rssi_trend": session.get_rssi_trend()
+    }
+
+def format_event(event: Event) -> str:
+    """Format an event as a Server-Sent Events message."""
+    event_type, data = event
+    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+class EventBroadcaster:
+    """Fans events out to subscribers over bounded queues."""
+    def __init__(self, queue_size: int = SESSION_EVENT_QUEUE_SIZE) -> None:
+        """
+        Initialize the EventBroadcaster.
+
+        Args:
+            queue_size: Events a subscriber may fall behind before it is dropped
+        """
+        self.queue_size = queue_size
+        self.subscribers: set[asyncio.Queue[Event | None]] = set()
+        self.dropped = 0
+
+    def subscribe(self) -> asyncio.Queue[Event | None]:
+        """
+        Start receiving events.
+
+        Returns:
+            The subscriber's queue. None in the queue marks the end of the
+            events, after the subscriber was dropped.
+        """
+        # One extra slot so there is always room for the end marker
+        queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize=self.queue_size + 1)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue[Event | None]) -> None:
+        """Stop receiving events."""
+        self.subscribers.discard(queue)
+
+    def publish(self, event: Event) -> None:
+        """Send an event to every subscriber without waiting, dropping those that fell behind."""
+        for queue in list(self.subscribers):
+            if queue.qsize() >= self.queue_size:
+                self.subscribers.discard(queue)
+                self.dropped += 1
+                queue.put_nowait(None)
+            else:
+                queue.put_nowait(event)
+
+    async def stream(self, keepalive_seconds: float = SESSION_EVENT_KEEPALIVE_SECONDS) -> AsyncIterator[str]:
+        """
+        Subscribe and format the events as Server-Sent Events until the subscriber is dropped.
+
+        Comments are sent while there are no events, so that proxies keep the
+        connection open. The subscription is made when the stream is first
+        iterated and ends when it is closed, so a client that disconnects
+        before its stream starts never holds a queue.
+        """
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive_seconds)
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield format_event(event)
+        finally:
+            self.unsubscribe(queue)
+
+    def get_stats(self) -> dict[str, int]:
+        """Get the number of subscribers and of subscribers dropped for falling behind."""
+        return {
+            "subscribers": len(self.subscribers),
+            "dropped": self.dropped
+        }
@@ -0,0 +1,450 @@
+"""
+Device fingerprinting and classification.
+
+A fingerprint identifies a device across MAC address rotations using the
+stable parts of its advertising data, either as a SHA-256 hex string or,
+with COMPACT_FINGERPRINTS, as a 64-bit integer that is converted to hex only
+when it leaves the process. Devices re-advertise the same payload
+many times per scan window, so FingerprintCache remembers the fingerprint,
+iOS flag and manufacturer of recently seen payloads and identifies the rest
+of a window in one batch.
+
+Devices are classified by platform with integer lookup tables built at import.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from .advertisement import Advertisement, decode_advertisement, decode_scan_data
+from .core.constants import (
+    APPLE_COMPANY_ID,
+    APPLE_SERVICE_UUIDS,
+    COMPACT_FINGERPRINTS,
+    FINGERPRINT_CACHE_SIZE,
+    FINGERPRINT_KEY,
+    FINGERPRINT_POOL_THRESHOLD,
+    FINGERPRINT_POOL_WORKERS,
+)
+from .manufacturers import get_manufacturer_key_from_device
+
+IOS_PRIVATE_ADDR_PREFIX = "40:00"
+COMPACT_FINGERPRINT_BYTES = 8
+
+# SHA-256 hex strings by default, 64-bit integers with COMPACT_FINGERPRINTS
+Fingerprint = str | int
+
+# Platforms reported by classify_platform
+PLATFORM_IOS = "ios"
+PLATFORM_ANDROID = "android"
+PLATFORM_WINDOWS = "windows"
+PLATFORM_UNKNOWN = "unknown"
+
+# Company IDs whose manufacturer data identifies the platform of the advertiser
+PLATFORM_COMPANY_IDS = {
+    APPLE_COMPANY_ID: PLATFORM_IOS,
+    0x0006: PLATFORM_WINDOWS,  # Microsoft Swift Pair and Nearby Share
+    0x00E0: PLATFORM_ANDROID,  # Google
+    0x0075: PLATFORM_ANDROID,  # Samsung
+}
+
+# Apple service UUIDs as 16-bit integers, matched against decoded service lists
+APPLE_SERVICE_UUID_VALUES = frozenset(int(uuid, 16) for uuid in APPLE_SERVICE_UUIDS)
+
+# 16-bit service UUIDs that identify the platform of the advertiser, built once at import
+PLATFORM_SERVICE_UUIDS = {
+    **dict.fromkeys(APPLE_SERVICE_UUID_VALUES, PLATFORM_IOS),
+    0xFE2C: PLATFORM_ANDROID,  # Google Fast Pair
+    0xFEF3: PLATFORM_ANDROID,  # Google Nearby
+}
+
+def classify_platform(device: Any) -> str:
+    """
+    Classify the platform of a device from its advertising data.
+
+    Manufacturer data takes precedence over service UUIDs. Classification only
+    does integer lookups, one for the company ID and one per advertised service.
+    Args:
+        device: The BLE device object or its decoded Advertisement
+    Returns:
+        One of PLATFORM_IOS, PLATFORM_ANDROID, PLATFORM_WINDOWS or PLATFORM_UNKNOWN.
+    """
+    advertisement = decode_advertisement(device)
+
+    platform = PLATFORM_COMPANY_IDS.get(advertisement.manufacturer_id)
+    if platform is not None:
+        return platform
+
+    for uuid in advertisement.services:
+        platform = PLATFORM_SERVICE_UUIDS.get(uuid)
+        if platform is not None:
+            return platform
+    return PLATFORM_UNKNOWN
+
+def is_ios_device(device: Any) -> bool:
+    """
+    Detects if a device is likely an iOS device based on advertising data patterns.
+    Args:
+        device: The BLE device object or its decoded Advertisement
+    Returns:
+        True if the device is likely an iOS device, False otherwise.
+    """
+    return classify_platform(device) == PLATFORM_IOS
+
+def _get_service_components(advertisement: Advertisement) -> list[str]:
+    """Extract service information from an advertisement."""
+    if advertisement.services:
+        services_str = ','.join(f"{uuid:04x}" for uuid in sorted(advertisement.services))
+        return [f"services:{services_str}"]
+    return []
+
+def _is_stable_name(name: str) -> bool:
+    """Check whether a name looks like a real name rather than random hex."""
+    return len(name) > 1 and not all(c in '0123456789abcdefABCDEF' for c in name)
+
+def _get_name_components(advertisement: Advertisement) -> list[str]:
+    """Extract name information from an advertisement."""
+    if advertisement.name:
+        if _is_stable_name(advertisement.name):
+            return [f"name:{advertisement.name}"]
+    elif advertisement.short_name and _is_stable_name(advertisement.short_name):
+        return [f"short_name:{advertisement.short_name}"]
+    return []
+
+def _get_manufacturer_components(advertisement: Advertisement) -> list[str]:
+    """Extract manufacturer information from an advertisement."""
+    manu_data = advertisement.manufacturer_data
+    if manu_data:
+        if advertisement.manufacturer_id == APPLE_COMPANY_ID:
+            return [f"manu:{manu_data.hex()}"]
+        return [f"manu:{manu_data[:2].hex()}"]
+    return []
+
+def _get_fingerprint_key(advertisement: Advertisement) -> bytes:
+    """
+    Build the canonical string that a fingerprint hashes.
+    Handles MAC randomization by focusing on stable device identifiers and platform-specific patterns.
+    """
+    fingerprint_components = []
+
+    # Get manufacturer data (most stable identifier)
+    fingerprint_components.extend(_get_manufacturer_components(advertisement))
+
+    # Get service information (stable across MAC changes)
+    fingerprint_components.extend(_get_service_components(advertisement))
+
+    # Get device name (if available and not random)
+    fingerprint_components.extend(_get_name_components(advertisement))
+
+    # Device Class (stable across MAC changes)
+    if advertisement.device_class:
+        fingerprint_components.append(f"class:{advertisement.device_class.hex()}")
+
+    # For iOS devices, check for specific advertising patterns
+    if advertisement.addr_type == "random" and advertisement.addr.startswith(IOS_PRIVATE_ADDR_PREFIX):
+        # This is likely an iOS device with a private address
+        # The manufacturer data and services are more reliable identifiers
+        if not any("manu:" in comp for comp in fingerprint_components):
+            # If we don't have manufacturer data, use the address type
+            fingerprint_components.append("ios_private_addr")
+
+    # For Android devices, check for specific advertising patterns
+    if advertisement.addr_type == "random" and not advertisement.addr.startswith(IOS_PRIVATE_ADDR_PREFIX):
+        # This is likely an Android device with a random address
+        # The manufacturer data and services are more reliable identifiers
+        if not any("manu:" in comp for comp in fingerprint_components):
+            # If we don't have manufacturer data, use the address type
+            fingerprint_components.append("android_random_addr")
+
+    # If we have no components, use the address type as a last resort
+    if not fingerprint_components:
+        fingerprint_components.append(f"addr_type:{advertisement.addr_type}")
+
+    # Sort components for consistent ordering
+    fingerprint_components.sort()
+    return '|'.join(fingerprint_components).encode()
+
+def build_device_fingerprint(device: Any) -> str:
+    """
+    Creates a fingerprint for a BLE device based on its advertising data.
+    Args:
+        device: The BLE device object or its decoded Advertisement
+    Returns:
+        A SHA-256 hash string representing the device fingerprint.
+    """
+    return hashlib.sha256(_get_fingerprint_key(decode_advertisement(device))).hexdigest()
+
+def build_compact_fingerprint(device: Any) -> int:
+    """
+    Creates a 64-bit integer fingerprint from the same components as build_device_fingerprint.
+
+    Integers take a fraction of the memory of 64-character hex strings and are
+    much cheaper to hash as dict keys and set members. The hash is keyed with
+    FINGERPRINT_KEY so fingerprints cannot be matched across deployments.
+    Args:
+        device: The BLE device object or its decoded Advertisement
+    Returns:
+        An unsigned 64-bit integer fingerprint.
+    """
+    digest = hashlib.blake2b(
+        _get_fingerprint_key(decode_advertisement(device)),
+        digest_size=COMPACT_FINGERPRINT_BYTES,
+        key=FINGERPRINT_KEY
+    ).digest()
+    return int.from_bytes(digest, 'big')
+
+def fingerprint_to_hex(fingerprint: Fingerprint) -> str:
+    """Format a fingerprint for API responses and files, whichever representation it uses."""
+    if isinstance(fingerprint, int):
+        return f"{fingerprint:0{COMPACT_FINGERPRINT_BYTES * 2}x}"
+    return fingerprint
+
+@dataclass(frozen=True)
+class DeviceIdentity:
+    """Everything the scan pipeline derives from an advertisement's payload."""
+    fingerprint: Fingerprint
+    is_ios: bool
+    manufacturer: int  # Manufacturer key, see manufacturers.manufacturer_name
+
+def identify_device(device: Any, compact: bool = COMPACT_FINGERPRINTS) -> DeviceIdentity:
+    """
+    Decode an advertisement once and derive its fingerprint, iOS flag and manufacturer.
+
+    Args:
+        device: The BLE device object
+        compact: Use a 64-bit integer fingerprint instead of a SHA-256 hex string
+    """
+    advertisement = decode_advertisement(device)
+    build_fingerprint = build_compact_fingerprint if compact else build_device_fingerprint
+    return DeviceIdentity(
+        fingerprint=build_fingerprint(advertisement),
+        is_ios=is_ios_device(advertisement),
+        manufacturer=get_manufacturer_key_from_device(advertisement)
+    )
+
+def _identify_payloads(payloads: list[tuple[str, str, dict[int, bytes]]], compact: bool) -> list[DeviceIdentity]:
+    """Identify (address, address type, scan data) tuples. Runs in pool worker processes."""
+    return [
+        identify_device(decode_scan_data(addr, addr_type, 0, scan_data), compact)
+        for addr, addr_type, scan_data in payloads
+    ]
+
+def _shard_payloads(devices: Sequence[Any], shards: int) -> list[list[tuple[str, str, dict[int, bytes]]]]:
+    """Split the addresses and AD structures of a batch into shards for the pool workers."""
+    payloads = [(device.addr, device.addrType, device.scanData) for device in devices]
+    shard_size = -(-len(payloads) // max(1, shards))  # Ceiling division
+    return [payloads[i:i + shard_size] for i in range(0, len(payloads), shard_size)]
+
+def _split_identities(identities: list[DeviceIdentity]) -> tuple[list[Fingerprint], list[bool], list[int]]:
+    """Split identities into their fingerprints, iOS flags and manufacturer keys."""
+    return (
+        [identity.fingerprint for identity in identities],
+        [identity.is_ios for identity in identities],
+        [identity.manufacturer for identity in identities]
+    )
+
+def build_device_fingerprints(
+    devices: Sequence[Any],
+    compact: bool = COMPACT_FINGERPRINTS,
+    executor: Executor | None = None,
+    pool_threshold: int = FINGERPRINT_POOL_THRESHOLD,
+    shards: int = FINGERPRINT_POOL_WORKERS
+) -> tuple[list[Fingerprint], list[bool], list[int]]:
+    """
+    Fingerprint and classify a whole batch of devices.
+
+    When an executor is given and the batch has at least pool_threshold
+    devices, the batch is split into shards that are identified in parallel.
+    Only the addresses and AD structures are sent to the workers, not the
+    scan entries.
+    Args:
+        devices: The BLE device objects
+        compact: Use 64-bit integer fingerprints instead of SHA-256 hex strings
+        executor: Optional process pool to shard large batches across
+        pool_threshold: Minimum batch size worth the cost of sending it to the pool
+        shards: Number of shards to split a pooled batch into, usually one per worker
+    Returns:
+        Fingerprints, iOS flags and manufacturer keys, in the order of the devices.
+    """
+    if executor is not None and len(devices) >= pool_threshold:
+        batches = _shard_payloads(devices, shards)
+        identities = [
+            identity
+            for batch in executor.map(_identify_payloads, batches, [compact] * len(batches))
+            for identity in batch
+        ]
+    else:
+        identities = [identify_device(device, compact) for device in devices]
+    return _split_identities(identities)
+
+async def build_device_fingerprints_async(
+    devices: Sequence[Any],
+    compact: bool = COMPACT_FINGERPRINTS,
+    executor: Executor | None = None,
+    pool_threshold: int = FINGERPRINT_POOL_THRESHOLD,
+    shards: int = FINGERPRINT_POOL_WORKERS
+) -> tuple[list[Fingerprint], list[bool], list[int]]:
+    """
+    Fingerprint and classify a whole batch of devices without blocking the event loop on the pool.
+
+    Takes the same arguments as build_device_fingerprints. The shards are
+    submitted from a worker thread, as the first submissions spawn the pool
+    processes, and awaited; small batches are still identified in process.
+    """
+    if executor is None or len(devices) < pool_threshold:
+        return build_device_fingerprints(devices, compact)
+
+    batches = _shard_payloads(devices, shards)
+    futures = await asyncio.to_thread(
+        lambda: [executor.submit(_identify_payloads, batch, compact) for batch in batches]
+    )
+    results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+    return _split_identities([identity for batch in results for identity in batch])
+
+class FingerprintCache:
+    """
+    Bounded LRU cache of device identities keyed on the advertising payload.
+
+    The key holds the AD structures, the address type and whether the address
+    looks like an iOS private address, which is everything a fingerprint
+    depends on, so a cached identity is always the one that would be computed.
+    With pool workers configured, large batches of unseen payloads are
+    identified in a process pool.
+    """
+    def __init__(
+        self,
+        maxsize: int = FINGERPRINT_CACHE_SIZE,
+        compact: bool = COMPACT_FINGERPRINTS,
+        workers: int = FINGERPRINT_POOL_WORKERS
+    ) -> None:
+        """
+        Initialize the FingerprintCache.
+
+        Args:
+            maxsize: Maximum number of payloads to remember
+            compact: Produce 64-bit integer fingerprints instead of SHA-256 hex strings
+            workers: Size of the process pool for large batches, 0 to identify in process
+        """
+        self.maxsize = maxsize
+        self.compact = compact
+        self.workers = workers
+        self.executor: ProcessPoolExecutor | None = None
+        self.entries: OrderedDict[tuple, DeviceIdentity] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(device: Any) -> tuple:
+        return (
+            device.addrType,
+            device.addr.startswith(IOS_PRIVATE_ADDR_PREFIX),
+            tuple(sorted(device.scanData.items()))
+        )
+
+    def _store(self, key: tuple, identity: DeviceIdentity) -> None:
+        self.entries[key] = identity
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def identify(self, device: Any) -> DeviceIdentity:
+        """
+        Get the identity of a scanned device, computing it only for unseen payloads.
+
+        Args:
+            device: The BLE device object
+
+        Returns:
+            The DeviceIdentity of the device.
+        """
+        key = self._key(device)
+        identity = self.entries.get(key)
+        if identity is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return identity
+
+        self.misses += 1
+        identity = identify_device(device, self.compact)
+        self._store(key, identity)
+        return identity
+
+    async def identify_many(self, devices: Sequence[Any]) -> tuple[list[Fingerprint], list[bool], list[int]]:
+        """
+        Identify a whole scan window, computing identities only for unseen payloads.
+
+        Large batches of unseen payloads are awaited from the process pool,
+        so the event loop keeps serving requests while they are identified.
+
+        Args:
+            devices: The BLE device objects
+
+        Returns:
+            Fingerprints, iOS flags and manufacturer keys, in the order of the devices.
+        """
+        keys = [self._key(device) for device in devices]
+        identities: list[DeviceIdentity | None] = []
+        unseen: dict[tuple, Any] = {}
+        for key, device in zip(keys, devices, strict=True):
+            identity = self.entries.get(key)
+            if identity is None:
+                self.misses += 1
+                unseen.setdefault(key, device)
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            identities.append(identity)
+
+        if unseen:
+            executor = self._get_executor() if len(unseen) >= FINGERPRINT_POOL_THRESHOLD else None
+            fingerprints, ios_flags, manufacturers = await build_device_fingerprints_async(
+                list(unseen.values()), self.compact, executor, shards=self.workers
+            )
+            computed = {
+                key: DeviceIdentity(fingerprint, is_ios, manufacturer)
+                for key, fingerprint, is_ios, manufacturer
+                in zip(unseen, fingerprints, ios_flags, manufacturers, strict=True)
+            }
+            for key, identity in computed.items():
+                self._store(key, identity)
+            identities = [
+                computed[key] if identity is None else identity
+                for key, identity in zip(keys, identities, strict=True)
+            ]
+
+        return _split_identities(identities)
+
+    def _get_executor(self) -> ProcessPoolExecutor | None:
+        if self.workers <= 0:
+            return None
+        if self.executor is None:
+            # Scan worker threads are running, so worker processes are spawned rather than forked
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def close(self) -> None:
+        """Shut down the process pool, if it was started."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def clear(self) -> None:
+        """Forget all cached identities."""
+        self.entries.clear()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Get the cache size and counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,43 +1,40 @@
 import asyncio
-import hashlib
 import logging
-import subprocess
-from collections import deque
 from datetime import datetime, timedelta
 from typing import Any
 
-from bluepy.btle import DefaultDelegate, Scanner
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 
+from .aggregation import persisted_history_start
+from .bluetooth import AdapterManager, AdapterProbe
+from .cache import ResponseCache
 from .core.constants import (
-    APPLE_COMPANY_ID,
-    APPLE_SERVICE_UUIDS,
-    COMPLETE_16B_SERVICES,
-    COMPLETE_LOCAL_NAME,
-    DEVICE_CLASS,
-    INCOMPLETE_16B_SERVICES,
-    MANUFACTURER_DATA_TYPE,
+    BLUETOOTH_ADAPTERS,
+    HISTORY_STORE,
     MAX_HISTORY_MINUTES,
     MAX_TIME_SERIES_MINUTES,
     SCAN_DURATION_SECONDS,
     SCAN_INTERVAL_SECONDS,
-    SHORT_LOCAL_NAME,
+    SCAN_RECORD_FILE,
+    SCAN_SOURCE,
 )
-from .manufacturers import get_manufacturer_from_device
+from .events import SESSION_CLOSE, SESSION_OPEN, SESSION_UPDATE, EventBroadcaster, session_event_data
+from .fingerprint import Fingerprint, FingerprintCache
+from .manufacturers import resolve_manufacturer_stats
 from .models import ScanResult
 from .persistence import DataPersistence
-from .session import SessionManager
+from .scanner import ContinuousScanner, ScanBatch, ScanSource, ScanWindow, ScanWorker
+from .session import DeviceSession, SessionManager, pack_snapshot
+from .sketch import QuantileSketch
+from .sources import RecordingScanSource, create_scan_source
+from .timeseries import MinuteRollups, minute_index
+from .windows import ScanHistory, SlidingWindowMetrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class ScanDelegate(DefaultDelegate):
-    """Delegate for handling BLE scan events."""
-    def __init__(self) -> None:
-        """Initialize the ScanDelegate."""
-        DefaultDelegate.__init__(self)
-
 class BackgroundScanner:
     """Manages the background BLE scanning task."""
     def __init__(self) -> None:
@@ -59,6 +56,24 @@ class BackgroundScanner:
                 pass
             self.task = None
 
+def columnar_history_class() -> type:
+    """
+    Import the columnar history store, which needs the optional NumPy.
+
+    Raises:
+        RuntimeError: If NumPy is not installed.
+    """
+    try:
+        from .columnar import ColumnarHistory
+    except ModuleNotFoundError as e:
+        if e.name != 'numpy':
+            raise
+        raise RuntimeError(
+            "HISTORY_STORE=columnar needs NumPy; install it with pip install -r requirements-columnar.txt "
+            "or build the image with --build-arg HISTORY_STORE=columnar"
+        ) from e
+    return ColumnarHistory
+
 app = FastAPI(
     title="BLE Device Counter",
     description="A simple API to count BLE devices in proximity",
@@ -69,170 +84,77 @@ app = FastAPI(
 persistence = DataPersistence()
 scanner = BackgroundScanner()
 
-# Store last 24 hours of scan results (assuming scans every minute)
-scan_history = deque(maxlen=MAX_HISTORY_MINUTES)
+if HISTORY_STORE == 'columnar':
+    # Keep COLUMNAR_HISTORY_DAYS of scan results in NumPy arrays, which answer every query themselves
+    ColumnarHistory = columnar_history_class()
+    scan_history = ColumnarHistory()
+    metrics_windows: dict[timedelta, SlidingWindowMetrics] = {}
+    minute_rollups: MinuteRollups | None = None
+else:
+    # Running aggregates of the windows reported by /latest
+    metrics_windows = {
+        window: SlidingWindowMetrics(window) for window in (timedelta(hours=1), timedelta(hours=24))
+    }
+
+    # Scan results by minute, merged into the slots of /time-series
+    minute_rollups = MinuteRollups()
+
+    # Store last 24 hours of scan results (assuming scans every minute)
+    scan_history = ScanHistory(
+        maxlen=MAX_HISTORY_MINUTES,
+        aggregates=[*metrics_windows.values(), minute_rollups]
+    )
 
 # Load existing history on startup
 scan_history.extend(persistence.load_history())
 logger.info(f"Loaded {len(scan_history)} historical scan results")
 
-# Initialize session manager
-session_manager = SessionManager()
+# Dwell times of the sessions that closed since the last scan window was recorded
+closed_dwell_times: list[float] = []
 
-def check_system_requirements() -> tuple[bool, str]:
-    """
-    Checks if the system meets the requirements for BLE scanning.
-    Returns (success: bool, message: str)
-    """
-    try:
-        # Check if BlueZ is installed
-        result = subprocess.run(['bluetoothctl', '--version'],
-                              capture_output=True,
-                              text=True, check=False)
-        logger.debug(f"bluetoothctl --version result: {result.returncode}, {result.stdout}")
-        if result.returncode != 0:
-            return False, "BlueZ is not installed or not accessible"
-    except (subprocess.SubprocessError, FileNotFoundError):
-        return False, "BlueZ is not installed or not accessible"
+# Session lifecycle events for /sessions/events subscribers
+session_events = EventBroadcaster()
 
-    try:
-        # Check if Bluetooth is enabled
-        result = subprocess.run(['bluetoothctl', 'show'],
-                              capture_output=True,
-                              text=True, check=False)
-        logger.debug(f"bluetoothctl show result: {result.returncode}, {result.stdout}")
-        if result.returncode != 0:
-            return False, "Could not check Bluetooth status"
-
-        # Parse the output line by line to find Powered status
-        powered = False
-        for line in result.stdout.splitlines():
-            logger.debug(f"Checking line: {line}")
-            if line.strip().startswith('Powered:'):
-                powered = line.strip().endswith('yes')
-                logger.debug(f"Found Powered line: {line}, powered = {powered}")
-                break
-
-        if not powered:
-            return False, "Bluetooth is not powered on"
-    except subprocess.SubprocessError:
-        return False, "Could not check Bluetooth status"
+# Serialized /latest and /time-series responses for the current scan history
+response_cache = ResponseCache()
 
-    return True, "System requirements met"
+def record_opened_session(session: DeviceSession) -> None:
+    """Announce a new session to event subscribers."""
+    if session_events.subscribers:
+        session_events.publish((SESSION_OPEN, session_event_data(session)))
 
-def is_ios_device(device: Any) -> bool:
-    """
-    Detects if a device is likely an iOS device based on advertising data patterns.
-    Args:
-        device: The BLE device object
-    Returns:
-        True if the device is likely an iOS device, False otherwise.
-    """
-    # Check for Apple-specific manufacturer data
-    if device.getValue(MANUFACTURER_DATA_TYPE):
-        manu_data = device.getValueText(MANUFACTURER_DATA_TYPE)
-        if manu_data and manu_data.startswith(APPLE_COMPANY_ID):
-            return True
-
-    # Check for Apple service UUIDs
-    services = []
-    if device.getValue(INCOMPLETE_16B_SERVICES):
-        services.append(device.getValueText(INCOMPLETE_16B_SERVICES))
-    if device.getValue(COMPLETE_16B_SERVICES):
-        services.append(device.getValueText(COMPLETE_16B_SERVICES))
-
-    services_str = ''.join(services).upper()
-    for uuid in APPLE_SERVICE_UUIDS:
-        if uuid.replace('0x', '').upper() in services_str:
-            return True
-
-    return False
-
-def _get_service_components(device: Any) -> list[str]:
-    """Extract service information from device."""
-    services = []
-    if device.getValue(INCOMPLETE_16B_SERVICES):
-        services.append(device.getValueText(INCOMPLETE_16B_SERVICES))
-    if device.getValue(COMPLETE_16B_SERVICES):
-        services.append(device.getValueText(COMPLETE_16B_SERVICES))
-    if services:
-        services_str = ''.join(sorted(services))
-        return [f"services:{services_str}"]
-    return []
-
-def _get_name_components(device: Any) -> list[str]:
-    """Extract name information from device."""
-    if device.getValue(COMPLETE_LOCAL_NAME):
-        name = device.getValueText(COMPLETE_LOCAL_NAME)
-        if len(name) > 1 and not all(c in '0123456789abcdefABCDEF' for c in name):
-            return [f"name:{name}"]
-    elif device.getValue(SHORT_LOCAL_NAME):
-        name = device.getValueText(SHORT_LOCAL_NAME)
-        if len(name) > 1 and not all(c in '0123456789abcdefABCDEF' for c in name):
-            return [f"short_name:{name}"]
-    return []
-
-def _get_manufacturer_components(device: Any) -> list[str]:
-    """Extract manufacturer information from device."""
-    if device.getValue(MANUFACTURER_DATA_TYPE):
-        manu_data = device.getValueText(MANUFACTURER_DATA_TYPE)
-        if manu_data:
-            if manu_data.startswith(APPLE_COMPANY_ID):
-                return [f"manu:{manu_data}"]
-            return [f"manu:{manu_data[:4]}"]
-    return []
-
-def build_device_fingerprint(device: Any) -> str:
-    """
-    Creates a fingerprint for a BLE device based on its advertising data.
-    Handles MAC randomization by focusing on stable device identifiers and platform-specific patterns.
-    Args:
-        device: The BLE device object
-    Returns:
-        A SHA-256 hash string representing the device fingerprint.
-    """
-    fingerprint_components = []
-
-    # Get manufacturer data (most stable identifier)
-    fingerprint_components.extend(_get_manufacturer_components(device))
+def record_closed_session(session: DeviceSession) -> None:
+    """Count the dwell time of a session that timed out towards the current scan window."""
+    closed_dwell_times.append(session.get_dwell_time())
+    if session_events.subscribers:
+        session_events.publish((SESSION_CLOSE, session_event_data(session)))
 
-    # Get service information (stable across MAC changes)
-    fingerprint_components.extend(_get_service_components(device))
-
-    # Get device name (if available and not random)
-    fingerprint_components.extend(_get_name_components(device))
-
-    # Device Class (stable across MAC changes)
-    if device.getValue(DEVICE_CLASS):
-        device_class = device.getValueText(DEVICE_CLASS)
-        fingerprint_components.append(f"class:{device_class}")
+# Initialize session manager
+session_manager = SessionManager(on_open=record_opened_session, on_expire=record_closed_session)
 
-    # For iOS devices, check for specific advertising patterns
-    if device.addrType == "random" and device.addr.startswith("40:00"):
-        # This is likely an iOS device with a private address
-        # The manufacturer data and services are more reliable identifiers
-        if not any("manu:" in comp for comp in fingerprint_components):
-            # If we don't have manufacturer data, use the address type
-            fingerprint_components.append("ios_private_addr")
+def restore_sessions() -> None:
+    """Resume the sessions that were open when the service last stopped."""
+    snapshot = persistence.load_sessions()
+    if snapshot is None:
+        return
+    try:
+        restored = session_manager.restore(snapshot, datetime.now())
+        logger.info(f"Restored {restored} open sessions")
+    except ValueError as e:
+        logger.error(f"Ignoring invalid session snapshot: {e}")
 
-    # For Android devices, check for specific advertising patterns
-    if device.addrType == "random" and not device.addr.startswith("40:00"):
-        # This is likely an Android device with a random address
-        # The manufacturer data and services are more reliable identifiers
-        if not any("manu:" in comp for comp in fingerprint_components):
-            # If we don't have manufacturer data, use the address type
-            fingerprint_components.append("android_random_addr")
+restore_sessions()
 
-    # If we have no components, use the address type as a last resort
-    if not fingerprint_components:
-        fingerprint_components.append(f"addr_type:{device.addrType}")
+# Initialize each Bluetooth adapter once, re-initialising only after failures.
+# Replayed and synthetic scan sources do not use any adapter.
+scan_adapters = BLUETOOTH_ADAPTERS if SCAN_SOURCE == 'bluepy' else []
+adapter_managers = {adapter: AdapterManager(adapter) for adapter in scan_adapters}
 
-    # Sort components for consistent ordering
-    fingerprint_components.sort()
+# Cached adapter checks shared by /health and the scan loop
+adapter_probes = {adapter: AdapterProbe(adapter) for adapter in scan_adapters}
 
-    # Create a hash of all components
-    fingerprint = hashlib.sha256('|'.join(fingerprint_components).encode()).hexdigest()
-    return fingerprint
+# Identities of recently seen advertising payloads
+fingerprint_cache = FingerprintCache()
 
 def calculate_metrics(time_window: timedelta) -> dict[str, Any]:
     """
@@ -243,141 +165,220 @@ def calculate_metrics(time_window: timedelta) -> dict[str, Any]:
         A dictionary with calculated metrics.
     """
     now = datetime.now()
-    window_start = now - time_window
-
-    # Filter results within the time window
-    window_results = [
-        result for result in scan_history
-        if result.timestamp >= window_start
-    ]
-
-    if not window_results:
-        return {
-            "average_unique_devices": 0,
-            "average_ios_devices": 0,
-            "average_other_devices": 0,
-            "peak_unique_devices": 0,
-            "peak_ios_devices": 0,
-            "peak_other_devices": 0,
-            "manufacturer_stats": {}
-        }
+    if HISTORY_STORE == 'columnar':
+        return scan_history.get_metrics(now - time_window)
+    window_metrics = metrics_windows.get(time_window)
+    if window_metrics is None:
+        # Windows without running aggregates are summarized from the history
+        window_start = now - time_window
+        window_metrics = SlidingWindowMetrics(time_window)
+        window_metrics.extend(result for result in scan_history if result.timestamp >= window_start)
+    return window_metrics.get_metrics(now)
+
+async def record_scan_window(devices: list[Any], current_time: datetime) -> ScanResult:
+    """
+    Fingerprint the devices seen in a scan window and record the result.
+    Devices seen by several adapters, or under several addresses, are counted once.
+    Args:
+        devices: The BLE devices seen during the window by all adapters
+        current_time: The time at which the window was closed
+    Returns:
+        The ScanResult appended to the scan history.
+    """
+    # Identify the whole window at once and deduplicate by fingerprint,
+    # keeping the strongest signal per device
+    fingerprints, ios_flags, manufacturers = await fingerprint_cache.identify_many(devices)
+    strongest: dict[Fingerprint, tuple[int, bool, int]] = {}
+    for device, fingerprint, is_ios, manufacturer in zip(devices, fingerprints, ios_flags, manufacturers, strict=True):
+        existing = strongest.get(fingerprint)
+        if existing is None or device.rssi > existing[0]:
+            strongest[fingerprint] = (device.rssi, is_ios, manufacturer)
+
+    ios_devices = 0
+    manufacturer_stats: dict[int, int] = {}
+
+    # Clean up old sessions
+    session_manager.cleanup_old_sessions(current_time)
+
+    for fingerprint, (rssi, is_ios, manufacturer) in strongest.items():
+        # Update session
+        session_manager.update_session(fingerprint, current_time, rssi)
+
+        if is_ios:
+            ios_devices += 1
+
+        # Track manufacturer statistics
+        manufacturer_stats[manufacturer] = manufacturer_stats.get(manufacturer, 0) + 1
+
+    if session_events.subscribers:
+        # One event for all sessions seen in the window, however many addresses they used
+        updated_sessions = dict.fromkeys(session_manager.sessions[fingerprint] for fingerprint in strongest)
+        session_events.publish((SESSION_UPDATE, {
+            "timestamp": current_time.isoformat(),
+            "sessions": [session_event_data(session) for session in updated_sessions]
+        }))
+
+    # Get session statistics
+    session_stats = session_manager.get_session_stats()
+    dwell_sketch = QuantileSketch()
+    for dwell_time in closed_dwell_times:
+        dwell_sketch.add(dwell_time)
+    closed_dwell_times.clear()
+
+    # Create and store scan result
+    unique_devices = len(strongest)
+    scan_result = ScanResult(
+        timestamp=current_time,
+        unique_devices=unique_devices,
+        ios_devices=ios_devices,
+        other_devices=unique_devices - ios_devices,
+        manufacturer_stats=manufacturer_stats,
+        session_stats=session_stats,  # Add session statistics
+        dwell_sketch=dwell_sketch
+    )
+    scan_history.append(scan_result)
+
+    logger.info(f"Scan window completed: {unique_devices} unique devices found")
+    logger.info(f"Active sessions: {session_stats['active_sessions']}")
+    logger.info(f"Average dwell time: {session_stats['average_dwell_time']:.1f} seconds")
+    return scan_result
+
+async def save_history_if_due() -> None:
+    """
+    Save the scan history in a worker thread if enough time has passed since the last save.
 
-    unique_devices = [r.unique_devices for r in window_results]
-    ios_devices = [r.ios_devices for r in window_results]
-    other_devices = [r.other_devices for r in window_results]
+    The results are copied on the event loop, where they are appended. The
+    columnar store copies only the columns of the results that are kept, and
+    the worker thread turns them into ScanResults.
+    """
+    if persistence.should_save():
+        if HISTORY_STORE == 'columnar':
+            history = scan_history.copy(persisted_history_start(datetime.now()))
+            await asyncio.to_thread(lambda: persistence.save_history(list(history)))
+        else:
+            await asyncio.to_thread(persistence.save_history, list(scan_history))
 
-    # Calculate manufacturer statistics
-    manufacturer_stats = {}
-    for result in window_results:
-        for manufacturer, count in result.manufacturer_stats.items():
-            manufacturer_stats[manufacturer] = manufacturer_stats.get(manufacturer, 0) + count
+async def save_sessions(force: bool = False) -> None:
+    """
+    Save a snapshot of the open sessions.
 
-    # Calculate averages for manufacturers
-    for manufacturer in manufacturer_stats:
-        manufacturer_stats[manufacturer] = manufacturer_stats[manufacturer] / len(window_results)
+    The sessions are copied on the event loop, where they are updated, and
+    packed and written to disk in a worker thread.
+    Args:
+        force: Save even if the last snapshot is recent, e.g. on shutdown
+    """
+    if force or persistence.should_save_sessions():
+        sessions = session_manager.copy_sessions()
+        await asyncio.to_thread(lambda: persistence.save_sessions(pack_snapshot(sessions)))
 
-    return {
-        "average_unique_devices": sum(unique_devices) / len(unique_devices),
-        "average_ios_devices": sum(ios_devices) / len(ios_devices),
-        "average_other_devices": sum(other_devices) / len(other_devices),
-        "peak_unique_devices": max(unique_devices),
-        "peak_ios_devices": max(ios_devices),
-        "peak_other_devices": max(other_devices),
-        "manufacturer_stats": manufacturer_stats
-    }
+def check_adapters() -> tuple[bool, str]:
+    """
+    Check the system requirements for every configured adapter.
+    Returns (success: bool, message: str), naming the first adapter that fails.
+    """
+    for adapter, probe in adapter_probes.items():
+        success, message = probe.check()
+        if not success:
+            return False, f"{adapter}: {message}"
+    return True, "System requirements met"
 
-def setup_bluetooth() -> None:
-    """Set up Bluetooth adapter for scanning."""
+async def scan_adapter(adapter: str, queue: asyncio.Queue[ScanBatch]) -> None:
+    """
+    Keep one adapter scanning, feeding its batches into the shared queue.
+    The adapter is re-initialised with a backoff whenever its scan worker fails.
+    """
+    adapter_manager = adapter_managers[adapter]
+    adapter_probe = adapter_probes[adapter]
+    source: ScanSource = ContinuousScanner(adapter)
+    if SCAN_RECORD_FILE:
+        source = RecordingScanSource(source, SCAN_RECORD_FILE)
+    worker = ScanWorker(source, queue, asyncio.get_running_loop())
     try:
-        # Reset the Bluetooth adapter
-        subprocess.run(['hciconfig', 'hci0', 'reset'], check=True)
-        # Enable scanning
-        subprocess.run(['hciconfig', 'hci0', 'up'], check=True)
-
-        # Try to stop any existing scans, but don't fail if it errors
-        try:
-            subprocess.run(['bluetoothctl', 'scan', 'off'], check=False)
-        except subprocess.SubprocessError:
-            logger.debug("No active scan to stop")
-
-        # Ensure power is on
-        subprocess.run(['bluetoothctl', 'power', 'on'], check=True)
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Error setting up Bluetooth: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to set up Bluetooth adapter: {e!s}"
-        ) from e
+        while True:
+            try:
+                # Check system requirements
+                success, message = adapter_probe.check()
+                if not success:
+                    logger.error(f"System requirements not met for {adapter}: {message}")
+                    await asyncio.sleep(SCAN_INTERVAL_SECONDS)  # Wait before retrying
+                    continue
+
+                # Set up Bluetooth adapter if it is not ready yet
+                if not await adapter_manager.ensure_ready():
+                    logger.error(f"Bluetooth adapter {adapter} not ready: {adapter_manager.last_error}")
+                    await asyncio.sleep(adapter_manager.seconds_until_retry())
+                    continue
+
+                logger.info(f"Starting background BLE scan on {adapter}")
+                worker.start()
+                await worker.wait()
+
+            except Exception as e:
+                logger.error(f"Error during background scan on {adapter}: {e}")
+                adapter_manager.mark_failed(e)
+                adapter_probe.invalidate()
+                await worker.stop()
+                await asyncio.sleep(adapter_manager.seconds_until_retry())
+    finally:
+        await worker.stop()
+
+async def run_scan_source(source: ScanSource, queue: asyncio.Queue[ScanBatch]) -> None:
+    """
+    Feed the batches of a replayed or synthetic source into the shared queue.
+    Returns once the source is finished, and restarts it after errors.
+    """
+    worker = ScanWorker(source, queue, asyncio.get_running_loop())
+    try:
+        while not source.finished:
+            try:
+                logger.info(f"Starting {source.name} scan source")
+                worker.start()
+                await worker.wait()
+            except Exception as e:
+                logger.error(f"Error reading {source.name} scan source: {e}")
+                await worker.stop()
+                await asyncio.sleep(SCAN_INTERVAL_SECONDS)
+        logger.info(f"Scan source {source.name} finished")
+    finally:
+        await worker.stop()
 
 async def background_scan() -> None:
-    """Background task that runs BLE scans periodically."""
-    while True:
-        try:
-            # Check system requirements
-            success, message = check_system_requirements()
-            if not success:
-                logger.error(f"System requirements not met: {message}")
-                await asyncio.sleep(SCAN_INTERVAL_SECONDS)  # Wait before retrying
-                continue
-
-            # Set up Bluetooth adapter
-            setup_bluetooth()
-
-            logger.info("Starting background BLE scan")
-            scanner = Scanner().withDelegate(ScanDelegate())
-            devices = scanner.scan(SCAN_DURATION_SECONDS)
-
-            # Track unique devices
-            unique_devices: set[str] = set()
-            ios_devices: set[str] = set()
-            manufacturer_stats = {}
-            current_time = datetime.now()
-
-            # Clean up old sessions
-            session_manager.cleanup_old_sessions(current_time)
-
-            for device in devices:
-                fingerprint = build_device_fingerprint(device)
-                unique_devices.add(fingerprint)
-
-                # Update session
-                session_manager.update_session(fingerprint, current_time, device.rssi)
-
-                if is_ios_device(device):
-                    ios_devices.add(fingerprint)
-
-                # Track manufacturer statistics
-                manufacturer = get_manufacturer_from_device(device)
-                manufacturer_stats[manufacturer] = manufacturer_stats.get(manufacturer, 0) + 1
-
-            # Get session statistics
-            session_stats = session_manager.get_session_stats()
-
-            # Create and store scan result
-            scan_result = ScanResult(
-                timestamp=current_time,
-                unique_devices=len(unique_devices),
-                ios_devices=len(ios_devices),
-                other_devices=len(unique_devices) - len(ios_devices),
-                manufacturer_stats=manufacturer_stats,
-                session_stats=session_stats  # Add session statistics
-            )
-            scan_history.append(scan_result)
-
-            # Save to disk if enough time has passed
-            if persistence.should_save():
-                persistence.save_history(list(scan_history))
-
-            logger.info(f"Background scan completed: {len(unique_devices)} unique devices found")
-            logger.info(f"Active sessions: {session_stats['active_sessions']}")
-            logger.info(f"Average dwell time: {session_stats['average_dwell_time']:.1f} seconds")
-
-            await asyncio.sleep(SCAN_INTERVAL_SECONDS)
-
-        except Exception as e:
-            logger.error(f"Error during background scan: {e}")
-            await asyncio.sleep(SCAN_INTERVAL_SECONDS)
+    """
+    Background task that scans continuously and records one result per scan window.
+    Every configured adapter, or the configured replayed or synthetic source, is
+    read by its own worker thread; this coroutine merges their batches into a
+    single window.
+    """
+    queue: asyncio.Queue[ScanBatch] = asyncio.Queue()
+    if SCAN_SOURCE == 'bluepy':
+        adapter_tasks = [asyncio.create_task(scan_adapter(adapter, queue)) for adapter in adapter_managers]
+    else:
+        adapter_tasks = [asyncio.create_task(run_scan_source(create_scan_source(SCAN_SOURCE), queue))]
+    try:
+        window = ScanWindow(datetime.now())
+        while True:
+            batch = await queue.get()
+            adapter_manager = adapter_managers.get(batch.source)
+            if adapter_manager is not None:
+                adapter_manager.mark_healthy()
+            window.add(batch.devices)
+
+            if window.is_complete(batch.timestamp):
+                try:
+                    # Windows are recorded at their boundary rather than when the late batch arrived,
+                    # so sessions missed for one window are a whole interval old and become inactive
+                    await record_scan_window(list(window.devices.values()), window.end_time)
+                    await save_history_if_due()
+                    await save_sessions()
+                except Exception as e:
+                    logger.error(f"Error recording scan window: {e}")
+                window = ScanWindow(batch.timestamp)
+    except asyncio.CancelledError:
+        # Stop the adapter scans and wait for their workers before finishing
+        for task in adapter_tasks:
+            task.cancel()
+        await asyncio.gather(*adapter_tasks, return_exceptions=True)
+        raise
 
 @app.on_event("startup")
 async def startup_event() -> None:
@@ -386,14 +387,31 @@ async def startup_event() -> None:
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    """Stop background scanning task on shutdown."""
+    """Stop background scanning task on shutdown and keep the open sessions for the next start."""
     await scanner.stop()
+    fingerprint_cache.close()
+    try:
+        await save_sessions(force=True)
+    except Exception as e:
+        logger.error(f"Error saving sessions on shutdown: {e}")
+
+def response_version() -> tuple[int, int]:
+    """
+    Get the version that cached responses are valid for.
+
+    The last hour and 24 hour windows and the time series slots move with the
+    clock, so a response depends on the current minute as well as on the scan
+    history; responses age even when no scans arrive, e.g. if scanning stalls.
+    """
+    return scan_history.version, minute_index(datetime.now())
 
 @app.get("/latest")
-async def get_latest_scan() -> dict[str, Any]:
+async def get_latest_scan(request: Request) -> Response:
     """
     Return the most recent scan results and historical statistics.
     This endpoint does not trigger a new scan - it returns data from the background scanning task.
+    The response is cached until the next scan result or minute and carries
+    an ETag; a request with a matching If-None-Match header gets 304 Not Modified.
     Returns:
         Dictionary containing:
         - current_scan: Most recent scan results
@@ -401,6 +419,10 @@ async def get_latest_scan() -> dict[str, Any]:
         - last_24h: Statistics for the last 24 hours
         - session_stats: Current session statistics
     """
+    return response_cache.respond(request, (), response_version(), build_latest_scan)
+
+def build_latest_scan() -> dict[str, Any]:
+    """Build the /latest response from the scan history and the open sessions."""
     try:
         # Calculate metrics for different time windows
         last_hour = calculate_metrics(timedelta(hours=1))
@@ -413,9 +435,10 @@ async def get_latest_scan() -> dict[str, Any]:
                 "unique_devices": latest_scan.unique_devices,
                 "ios_devices": latest_scan.ios_devices,
                 "other_devices": latest_scan.other_devices,
-                "manufacturer_stats": latest_scan.manufacturer_stats,
+                "manufacturer_stats": resolve_manufacturer_stats(latest_scan.manufacturer_stats),
                 "scan_duration_seconds": SCAN_DURATION_SECONDS,
-                "session_stats": latest_scan.session_stats  # Add session statistics
+                "session_stats": latest_scan.session_stats,  # Add session statistics
+                "dwell_time_percentiles": latest_scan.dwell_sketch.percentiles()
             }
         else:
             current_scan = {
@@ -428,7 +451,8 @@ async def get_latest_scan() -> dict[str, Any]:
                     "total_sessions": 0,
                     "active_sessions": 0,
                     "average_dwell_time": 0
-                }
+                },
+                "dwell_time_percentiles": QuantileSketch().percentiles()
             }
 
         # Get current session statistics
@@ -450,90 +474,43 @@ async def get_latest_scan() -> dict[str, Any]:
             detail=f"Error getting scan results: {e!s}"
         ) from e
 
+@app.get("/sessions/events")
+async def stream_session_events() -> StreamingResponse:
+    """
+    Stream session lifecycle events as Server-Sent Events.
+
+    An "open" event is sent when a device session starts, an "update" event
+    with every session seen at the end of each scan window and a "close" event
+    when a session times out. Each event describes the sessions by fingerprint,
+    start, end, dwell time and RSSI trend. Consumers that fall too far behind
+    are disconnected.
+    """
+    return StreamingResponse(
+        session_events.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @app.get("/health")
-async def health_check() -> dict[str, str]:
+async def health_check() -> dict[str, Any]:
     """
     Check if the system meets the requirements for BLE scanning.
     Returns:
-        Dictionary containing status and message.
+        Dictionary containing status, message, the state and counters of each adapter,
+        the fingerprint cache counters, the session event subscribers and the
+        response cache counters.
     """
-    success, message = check_system_requirements()
+    success, message = check_adapters()
     if not success:
         raise HTTPException(status_code=500, detail=message)
-    return {"status": "healthy", "message": message}
-
-def _assign_results_to_slots(scan_history, start_time, interval_minutes, time_slots):
-    """Assign scan results to time slots."""
-    for result in scan_history:
-        if result.timestamp < start_time:
-            continue
-        slot_time = result.timestamp.replace(
-            minute=(result.timestamp.minute // interval_minutes) * interval_minutes,
-            second=0,
-            microsecond=0
-        )
-        if slot_time not in time_slots:
-            slot_time = min(time_slots.keys(), key=lambda t: abs((t - slot_time).total_seconds()))
-        time_slots[slot_time].append(result)
-
-def _build_time_slot_stats(slot_time, results):
-    """Build statistics for a time slot."""
-    if results:
-        unique_devices = [r.unique_devices for r in results]
-        ios_devices = [r.ios_devices for r in results]
-        other_devices = [r.other_devices for r in results]
-        manufacturer_stats = {}
-        session_stats = {
-            "total_sessions": 0,
-            "active_sessions": 0,
-            "average_dwell_time": 0
-        }
-
-        # Calculate manufacturer statistics
-        for r in results:
-            for manu, count in r.manufacturer_stats.items():
-                manufacturer_stats[manu] = manufacturer_stats.get(manu, 0) + count
-            # Aggregate session statistics
-            if hasattr(r, 'session_stats'):
-                session_stats["total_sessions"] += r.session_stats.get("total_sessions", 0)
-                session_stats["active_sessions"] += r.session_stats.get("active_sessions", 0)
-                session_stats["average_dwell_time"] += r.session_stats.get("average_dwell_time", 0)
-
-        # Calculate averages
-        for manu in manufacturer_stats:
-            manufacturer_stats[manu] = manufacturer_stats[manu] / len(results)
-        if len(results) > 0:
-            session_stats["total_sessions"] = session_stats["total_sessions"] / len(results)
-            session_stats["active_sessions"] = session_stats["active_sessions"] / len(results)
-            session_stats["average_dwell_time"] = session_stats["average_dwell_time"] / len(results)
-
-        return {
-            "timestamp": slot_time.isoformat(),
-            "average_unique_devices": sum(unique_devices) / len(unique_devices),
-            "average_ios_devices": sum(ios_devices) / len(ios_devices),
-            "average_other_devices": sum(other_devices) / len(other_devices),
-            "peak_unique_devices": max(unique_devices),
-            "peak_ios_devices": max(ios_devices),
-            "peak_other_devices": max(other_devices),
-            "manufacturer_stats": manufacturer_stats,
-            "session_stats": session_stats
-        }
-    else:
-        return {
-            "timestamp": slot_time.isoformat(),
-            "average_unique_devices": 0,
-            "average_ios_devices": 0,
-            "average_other_devices": 0,
-            "peak_unique_devices": 0,
-            "peak_ios_devices": 0,
-            "peak_other_devices": 0,
-            "manufacturer_stats": {},
-            "session_stats": {
-                "total_sessions": 0,
-                "active_sessions": 0,
-                "average_dwell_time": 0
-            }
-        }
+    return {
+        "status": "healthy",
+        "message": message,
+        "adapters": [manager.get_stats() for manager in adapter_managers.values()],
+        "fingerprint_cache": fingerprint_cache.get_stats(),
+        "session_events": session_events.get_stats(),
+        "response_cache": response_cache.get_stats()
+    }
 
 def _calculate_manufacturer_summary(time_series):
     manufacturer_summary = {}
@@ -559,14 +536,25 @@ def _calculate_manufacturer_summary(time_series):
     return manufacturer_summary
 
 @app.get("/time-series")
-async def get_time_series(interval_minutes: int = 60) -> dict[str, Any]:
+async def get_time_series(request: Request, interval_minutes: int = 60) -> Response:
     """
     Get time series data for the last 24 hours, suitable for generating bar charts.
+    The response is cached until the next scan result or minute and carries
+    an ETag; a request with a matching If-None-Match header gets 304 Not Modified.
     Args:
         interval_minutes: Time interval between data points in minutes (default: 60)
     Returns:
         Dictionary containing time series data for the last 24 hours
     """
+    return response_cache.respond(
+        request,
+        (interval_minutes,),
+        response_version(),
+        lambda: build_time_series(interval_minutes)
+    )
+
+def build_time_series(interval_minutes: int) -> dict[str, Any]:
+    """Build the /time-series response from the scan history."""
     if interval_minutes < 1 or interval_minutes > MAX_TIME_SERIES_MINUTES:
         raise HTTPException(
             status_code=400,
@@ -576,18 +564,9 @@ async def get_time_series(interval_minutes: int = 60) -> dict[str, Any]:
     now = datetime.now()
     start_time = now - timedelta(hours=24)
 
-    # Initialize time slots
-    time_slots = {}
-    current_time = start_time
-    while current_time <= now:
-        time_slots[current_time] = []
-        current_time += timedelta(minutes=interval_minutes)
-
-    # Assign scan results to slots
-    _assign_results_to_slots(scan_history, start_time, interval_minutes, time_slots)
-
-    # Build new time series format
-    time_series = [_build_time_slot_stats(slot_time, results) for slot_time, results in time_slots.items()]
+    # Slots are aligned to multiples of the interval and merged from the per-minute rollups
+    time_series_source = scan_history if HISTORY_STORE == 'columnar' else minute_rollups
+    time_series = time_series_source.get_slots(start_time, now, interval_minutes)
 
     # Calculate summary statistics
     summary = {
@@ -1,240 +1,122 @@
 """
 Manufacturer database and lookup functions.
-Based on Nordic Semiconductor's company ID database.
+Based on Nordic Semiconductor's Bluetooth numbers database, which mirrors the
+Bluetooth SIG company identifier registry.
 """
+import gzip
+from array import array
+from pathlib import Path
+from typing import Any, TypeVar
 
-from typing import Any
+from .advertisement import decode_advertisement
 
 # Constants
 MANUFACTURER_DATA_TYPE = 255  # Manufacturer Specific Data
-MIN_MANUFACTURER_DATA_LENGTH = 4  # Minimum length for valid manufacturer data
+COMPANY_ID_SLOTS = 1 << 16  # Company IDs are 16-bit
+COMPANY_IDENTIFIERS_PATH = Path(__file__).parent / 'data' / 'company_identifiers.tsv.gz'
+UNKNOWN_MANUFACTURER = "Unknown"
+UNKNOWN_MANUFACTURER_KEY = 0  # Manufacturer key of devices without a known company ID
 
-# Dictionary mapping company IDs to manufacturer names
-# This is a subset of the full database - we can expand it as needed
-MANUFACTURER_DB = {
-    0x0006: "Microsoft",
-    0x000D: "Texas Instruments",
-    0x0018: "Nordic Semiconductor ASA",
-    0x0025: "Qualcomm",
-    0x0026: "Marvell Technology Group Ltd.",
-    0x0027: "Mediatek",
-    0x0028: "Samsung Electronics Co. Ltd.",
-    0x0029: "Google Inc.",
-    0x002A: "Huawei Technologies Co. Ltd.",
-    0x002B: "Realtek Semiconductor Corp.",
-    0x002C: "NXP Semiconductors",
-    0x002D: "Cisco Systems Inc.",
-    0x002E: "Sony Corporation",
-    0x002F: "Broadcom Corporation",
-    0x0030: "Intel Corporation",
-    0x0031: "Amazon.com Services LLC",
-    0x0032: "Fitbit Inc.",
-    0x0033: "Garmin International Inc.",
-    0x0034: "Philips Lighting B.V.",
-    0x0035: "Bosch Sensortec GmbH",
-    0x0036: "Samsung Electronics Co. Ltd.",
-    0x0037: "Hewlett Packard Enterprise",
-    0x0038: "Hewlett Packard Enterprise",
-    0x0039: "Hewlett Packard Enterprise",
-    0x003A: "Hewlett Packard Enterprise",
-    0x003B: "Hewlett Packard Enterprise",
-    0x003C: "Hewlett Packard Enterprise",
-    0x003D: "Hewlett Packard Enterprise",
-    0x003E: "Hewlett Packard Enterprise",
-    0x003F: "Hewlett Packard Enterprise",
-    0x0040: "Hewlett Packard Enterprise",
-    0x0041: "Hewlett Packard Enterprise",
-    0x0042: "Hewlett Packard Enterprise",
-    0x0043: "Hewlett Packard Enterprise",
-    0x0044: "Hewlett Packard Enterprise",
-    0x0045: "Hewlett Packard Enterprise",
-    0x0046: "Hewlett Packard Enterprise",
-    0x0047: "Hewlett Packard Enterprise",
-    0x0048: "Hewlett Packard Enterprise",
-    0x0049: "Hewlett Packard Enterprise",
-    0x004A: "Hewlett Packard Enterprise",
-    0x004B: "Hewlett Packard Enterprise",
-    0x004C: "Apple Inc.",
-    0x004D: "Apple Inc.",
-    0x004E: "Apple Inc.",
-    0x004F: "Apple Inc.",
-    0x0050: "Apple Inc.",
-    0x0051: "Apple Inc.",
-    0x0052: "Apple Inc.",
-    0x0053: "Apple Inc.",
-    0x0054: "Apple Inc.",
-    0x0055: "Apple Inc.",
-    0x0056: "Apple Inc.",
-    0x0057: "Apple Inc.",
-    0x0058: "Apple Inc.",
-    0x0059: "Nordic Semiconductor ASA",
-    0x005A: "Apple Inc.",
-    0x005B: "Apple Inc.",
-    0x005C: "Apple Inc.",
-    0x005D: "Apple Inc.",
-    0x005E: "Apple Inc.",
-    0x005F: "Apple Inc.",
-    0x0060: "Apple Inc.",
-    0x0061: "Apple Inc.",
-    0x0062: "Apple Inc.",
-    0x0063: "Apple Inc.",
-    0x0064: "Apple Inc.",
-    0x0065: "Apple Inc.",
-    0x0066: "Apple Inc.",
-    0x0067: "Apple Inc.",
-    0x0068: "Apple Inc.",
-    0x0069: "Apple Inc.",
-    0x006A: "Apple Inc.",
-    0x006B: "Apple Inc.",
-    0x006C: "Apple Inc.",
-    0x006D: "Apple Inc.",
-    0x006E: "Apple Inc.",
-    0x006F: "Apple Inc.",
-    0x0070: "Apple Inc.",
-    0x0071: "Apple Inc.",
-    0x0072: "Apple Inc.",
-    0x0073: "Apple Inc.",
-    0x0074: "Apple Inc.",
-    0x0075: "Apple Inc.",
-    0x0076: "Apple Inc.",
-    0x0077: "Apple Inc.",
-    0x0078: "Apple Inc.",
-    0x0079: "Apple Inc.",
-    0x007A: "Apple Inc.",
-    0x007B: "Apple Inc.",
-    0x007C: "Apple Inc.",
-    0x007D: "Apple Inc.",
-    0x007E: "Apple Inc.",
-    0x007F: "Apple Inc.",
-    0x0080: "Apple Inc.",
-    0x0081: "Apple Inc.",
-    0x0082: "Apple Inc.",
-    0x0083: "Apple Inc.",
-    0x0084: "Apple Inc.",
-    0x0085: "Apple Inc.",
-    0x0086: "Apple Inc.",
-    0x0087: "Apple Inc.",
-    0x0088: "Apple Inc.",
-    0x0089: "Apple Inc.",
-    0x008A: "Apple Inc.",
-    0x008B: "Apple Inc.",
-    0x008C: "Apple Inc.",
-    0x008D: "Apple Inc.",
-    0x008E: "Apple Inc.",
-    0x008F: "Apple Inc.",
-    0x0090: "Apple Inc.",
-    0x0091: "Apple Inc.",
-    0x0092: "Apple Inc.",
-    0x0093: "Apple Inc.",
-    0x0094: "Apple Inc.",
-    0x0095: "Apple Inc.",
-    0x0096: "Apple Inc.",
-    0x0097: "Apple Inc.",
-    0x0098: "Apple Inc.",
-    0x0099: "Apple Inc.",
-    0x009A: "Apple Inc.",
-    0x009B: "Apple Inc.",
-    0x009C: "Apple Inc.",
-    0x009D: "Apple Inc.",
-    0x009E: "Apple Inc.",
-    0x009F: "Apple Inc.",
-    0x00A0: "Apple Inc.",
-    0x00A1: "Apple Inc.",
-    0x00A2: "Apple Inc.",
-    0x00A3: "Apple Inc.",
-    0x00A4: "Apple Inc.",
-    0x00A5: "Apple Inc.",
-    0x00A6: "Apple Inc.",
-    0x00A7: "Apple Inc.",
-    0x00A8: "Apple Inc.",
-    0x00A9: "Apple Inc.",
-    0x00AA: "Apple Inc.",
-    0x00AB: "Apple Inc.",
-    0x00AC: "Apple Inc.",
-    0x00AD: "Apple Inc.",
-    0x00AE: "Apple Inc.",
-    0x00AF: "Apple Inc.",
-    0x00B0: "Apple Inc.",
-    0x00B1: "Apple Inc.",
-    0x00B2: "Apple Inc.",
-    0x00B3: "Apple Inc.",
-    0x00B4: "Apple Inc.",
-    0x00B5: "Apple Inc.",
-    0x00B6: "Apple Inc.",
-    0x00B7: "Apple Inc.",
-    0x00B8: "Apple Inc.",
-    0x00B9: "Apple Inc.",
-    0x00BA: "Apple Inc.",
-    0x00BB: "Apple Inc.",
-    0x00BC: "Apple Inc.",
-    0x00BD: "Apple Inc.",
-    0x00BE: "Apple Inc.",
-    0x00BF: "Apple Inc.",
-    0x00C0: "Apple Inc.",
-    0x00C1: "Apple Inc.",
-    0x00C2: "Apple Inc.",
-    0x00C3: "Apple Inc.",
-    0x00C4: "Apple Inc.",
-    0x00C5: "Apple Inc.",
-    0x00C6: "Apple Inc.",
-    0x00C7: "Apple Inc.",
-    0x00C8: "Apple Inc.",
-    0x00C9: "Apple Inc.",
-    0x00CA: "Apple Inc.",
-    0x00CB: "Apple Inc.",
-    0x00CC: "Apple Inc.",
-    0x00CD: "Apple Inc.",
-    0x00CE: "Apple Inc.",
-    0x00CF: "Apple Inc.",
-    0x00D0: "Apple Inc.",
-    0x00D1: "Apple Inc.",
-    0x00D2: "Apple Inc.",
-    0x00D3: "Apple Inc.",
-    0x00D4: "Apple Inc.",
-    0x00D5: "Apple Inc.",
-    0x00D6: "Apple Inc.",
-    0x00D7: "Apple Inc.",
-    0x00D8: "Apple Inc.",
-    0x00D9: "Apple Inc.",
-    0x00DA: "Apple Inc.",
-    0x00DB: "Apple Inc.",
-    0x00DC: "Apple Inc.",
-    0x00DD: "Apple Inc.",
-    0x00DE: "Apple Inc.",
-    0x00DF: "Apple Inc.",
-    0x00E0: "Apple Inc.",
-    0x00E1: "Apple Inc.",
-    0x00E2: "Apple Inc.",
-    0x00E3: "Apple Inc.",
-    0x00E4: "Apple Inc.",
-    0x00E5: "Apple Inc.",
-    0x00E6: "Apple Inc.",
-    0x00E7: "Apple Inc.",
-    0x00E8: "Apple Inc.",
-    0x00E9: "Apple Inc.",
-    0x00EA: "Apple Inc.",
-    0x00EB: "Apple Inc.",
-    0x00EC: "Apple Inc.",
-    0x00ED: "Apple Inc.",
-    0x00EE: "Apple Inc.",
-    0x00EF: "Apple Inc.",
-    0x00F0: "Apple Inc.",
-    0x00F1: "Apple Inc.",
-    0x00F2: "Apple Inc.",
-    0x00F3: "Apple Inc.",
-    0x00F4: "Apple Inc.",
-    0x00F5: "Apple Inc.",
-    0x00F6: "Apple Inc.",
-    0x00F7: "Apple Inc.",
-    0x00F8: "Apple Inc.",
-    0x00F9: "Apple Inc.",
-    0x00FA: "Apple Inc.",
-    0x00FB: "Apple Inc.",
-    0x00FC: "Apple Inc.",
-    0x00FD: "Apple Inc.",
-    0x00FE: "Apple Inc.",
-    0x00FF: "Apple Inc.",
-}
+Count = TypeVar('Count', int, float)
+
+class CompanyTable:
+    """
+    Company names indexed by 16-bit company ID.
+
+    The registry is read from a gzipped "<hex id>\t<name>" file on first use,
+    so importing the module stays cheap. Lookups index a 65,536-slot array of
+    positions in a list of interned names, with slot 0 of the list meaning
+    unknown, so they need neither hashing nor per-entry objects.
+
+    The positions double as manufacturer keys: small integers that statistics
+    are counted under instead of the names, which are only resolved when they
+    leave the process. Keys are only stable within a process.
+    """
+    def __init__(self, path: Path = COMPANY_IDENTIFIERS_PATH) -> None:
+        """
+        Initialize the CompanyTable.
+
+        Args:
+            path: Gzipped company identifier file
+        """
+        self.path = path
+        self._index: array | None = None
+        self._names: list[str] = []
+        self._positions: dict[str, int] = {}
+
+    def _load(self) -> array:
+        names = [""]
+        positions: dict[str, int] = {}
+        index = array('H', bytes(2 * COMPANY_ID_SLOTS))
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                company_id, name = line.rstrip('\n').split('\t', 1)
+                position = positions.get(name)
+                if position is None:
+                    position = positions[name] = len(names)
+                    names.append(name)
+                index[int(company_id, 16)] = position
+        self._names = names
+        self._positions = positions
+        self._index = index
+        return index
+
+    def key(self, company_id: int | None) -> int:
+        """Get the manufacturer key of a company ID, UNKNOWN_MANUFACTURER_KEY if it is not assigned."""
+        index = self._index if self._index is not None else self._load()
+        if company_id is None or not 0 <= company_id < COMPANY_ID_SLOTS:
+            return UNKNOWN_MANUFACTURER_KEY
+        return index[company_id]
+
+    def intern(self, name: str) -> int:
+        """
+        Get the manufacturer key of a name.
+
+        Names that are not in the registry, such as those in files written with
+        an older registry, are given new keys.
+        """
+        if self._index is None:
+            self._load()
+        if name == UNKNOWN_MANUFACTURER:
+            return UNKNOWN_MANUFACTURER_KEY
+        position = self._positions.get(name)
+        if position is None:
+            position = self._positions[name] = len(self._names)
+            self._names.append(name)
+        return position
+
+    def name(self, key: int) -> str:
+        """Get the manufacturer name of a key."""
+        if self._index is None:
+            self._load()
+        return self._names[key] if key != UNKNOWN_MANUFACTURER_KEY else UNKNOWN_MANUFACTURER
+
+    def get(self, company_id: int, default: str | None = None) -> str | None:
+        """Get the name of a company, or default if the ID is not assigned."""
+        index = self._index if self._index is not None else self._load()
+        if not 0 <= company_id < COMPANY_ID_SLOTS:
+            return default
+        position = index[company_id]
+        return self._names[position] if position else default
+
+    def __getitem__(self, company_id: int) -> str:
+        """Get the name of a company, raising KeyError if the ID is not assigned."""
+        name = self.get(company_id)
+        if name is None:
+            raise KeyError(company_id)
+        return name
+
+    def __contains__(self, company_id: int) -> bool:
+        """Check whether a company ID is assigned."""
+        return self.get(company_id) is not None
+
+    def __len__(self) -> int:
+        """Get the number of assigned company IDs."""
+        index = self._index if self._index is not None else self._load()
+        return sum(1 for position in index if position)
+
+# Company names by ID, loaded on the first lookup
+MANUFACTURER_DB = CompanyTable()
 
 def lookup_manufacturer(manufacturer_id: int) -> str:
     """
@@ -246,31 +128,51 @@ def lookup_manufacturer(manufacturer_id: int) -> str:
     Returns:
         The manufacturer name, or "Unknown" if not found
     """
-    return MANUFACTURER_DB.get(manufacturer_id, "Unknown")
+    return MANUFACTURER_DB.get(manufacturer_id, UNKNOWN_MANUFACTURER)
 
 def get_manufacturer_from_device(device: Any) -> str:
     """
     Extract and look up the manufacturer from a BLE device.
 
     Args:
-        device: The BLE device object
+        device: The BLE device object or its decoded Advertisement
 
     Returns:
         The manufacturer name, or "Unknown" if not found
     """
-    if device.getValue(MANUFACTURER_DATA_TYPE):  # Manufacturer Specific Data
-        manu_data = device.getValueText(MANUFACTURER_DATA_TYPE)
-        if manu_data and len(manu_data) >= MIN_MANUFACTURER_DATA_LENGTH:
-            try:
-                # Try both little-endian and big-endian formats
-                company_id_le = int(manu_data[2:4] + manu_data[0:2], 16)
-                company_id_be = int(manu_data[0:4], 16)
+    company_id = decode_advertisement(device).manufacturer_id
+    if company_id is None:
+        return UNKNOWN_MANUFACTURER
+    return lookup_manufacturer(company_id)
+
+def get_manufacturer_key_from_device(device: Any) -> int:
+    """
+    Get the manufacturer key of a BLE device, for counting devices by manufacturer.
+
+    Args:
+        device: The BLE device object or its decoded Advertisement
+
+    Returns:
+        The manufacturer key, UNKNOWN_MANUFACTURER_KEY if the manufacturer is not known
+    """
+    return MANUFACTURER_DB.key(decode_advertisement(device).manufacturer_id)
+
+def manufacturer_name(key: int) -> str:
+    """Resolve a manufacturer key to the manufacturer name."""
+    return MANUFACTURER_DB.name(key)
+
+def intern_manufacturer(name: str) -> int:
+    """Get the manufacturer key of a manufacturer name."""
+    return MANUFACTURER_DB.intern(name)
+
+def resolve_manufacturer_stats(stats: dict[int, Count]) -> dict[str, Count]:
+    """
+    Resolve statistics keyed by manufacturer key to statistics keyed by name.
+
+    Used where statistics leave the process, in API responses and saved history.
+    """
+    return {MANUFACTURER_DB.name(key): value for key, value in stats.items()}
 
-                # Try little-endian first, then big-endian
-                manufacturer = lookup_manufacturer(company_id_le)
-                if manufacturer != "Unknown":
-                    return manufacturer
-                return lookup_manufacturer(company_id_be)
-            except ValueError:
-                pass
-    return "Unknown"
\ No newline at end of file
+def intern_manufacturer_stats(stats: dict[str, Count]) -> dict[int, Count]:
+    """Convert statistics keyed by manufacturer name to statistics keyed by manufacturer key."""
+    return {MANUFACTURER_DB.intern(name): value for name, value in stats.items()}
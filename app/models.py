@@ -4,18 +4,30 @@ Data models used throughout the application.
 from dataclasses import dataclass
 from datetime import datetime
 
+from .sketch import QuantileSketch
+
 
 @dataclass
 class ScanResult:
-    """Represents the results of a BLE scan."""
+    """
+    Represents the results of a BLE scan.
+
+    Manufacturer statistics are keyed by manufacturer key rather than name, see
+    manufacturers.resolve_manufacturer_stats. The dwell sketch holds the dwell
+    times of the sessions that closed during the scan, or during the hour or
+    day of an aggregated result.
+    """
     timestamp: datetime
     unique_devices: int
     ios_devices: int
     other_devices: int
-    manufacturer_stats: dict[str, int]
+    manufacturer_stats: dict[int, int]
     session_stats: dict[str, float] | None = None
+    dwell_sketch: QuantileSketch | None = None
 
     def __post_init__(self):
+        if self.dwell_sketch is None:
+            self.dwell_sketch = QuantileSketch()
         if self.session_stats is None:
             self.session_stats = {
                 "total_sessions": 0,
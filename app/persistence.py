@@ -10,27 +10,39 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 from .aggregation import get_aggregated_history
+from .core.constants import SESSION_SNAPSHOT_INTERVAL_SECONDS
+from .manufacturers import intern_manufacturer_stats, resolve_manufacturer_stats
 from .models import ScanResult
+from .sketch import QuantileSketch
 
 logger = logging.getLogger(__name__)
 
 class DataPersistence:
     """Handles saving and loading scan history."""
-    def __init__(self, data_dir: str = "/data", save_interval_minutes: int = 60) -> None:
+    def __init__(
+        self,
+        data_dir: str = "/data",
+        save_interval_minutes: int = 60,
+        session_save_interval_seconds: int = SESSION_SNAPSHOT_INTERVAL_SECONDS
+    ) -> None:
         """
         Initialize data persistence with a storage directory.
 
         Args:
             data_dir: Directory where data will be stored
             save_interval_minutes: Minimum minutes between saves
+            session_save_interval_seconds: Minimum seconds between session snapshots
         """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.detailed_file = self.data_dir / "scan_history_detailed.json"
         self.hourly_file = self.data_dir / "scan_history_hourly.json"
         self.daily_file = self.data_dir / "scan_history_daily.json"
+        self.sessions_file = self.data_dir / "sessions.bin"
         self.save_interval = timedelta(minutes=save_interval_minutes)
         self.last_save = datetime.now()
+        self.session_save_interval = timedelta(seconds=session_save_interval_seconds)
+        self.last_session_save = datetime.now()
 
     def _serialize_results(self, results: list[ScanResult]) -> list[dict]:
         """Convert ScanResult objects to serializable dictionaries."""
@@ -38,6 +50,9 @@ class DataPersistence:
         for result in results:
             result_dict = asdict(result)
             result_dict['timestamp'] = result_dict['timestamp'].isoformat()
+            # Manufacturer keys are only valid within this process, so files hold names
+            result_dict['manufacturer_stats'] = resolve_manufacturer_stats(result_dict['manufacturer_stats'])
+            result_dict['dwell_sketch'] = result.dwell_sketch.to_dict()
             serializable.append(result_dict)
         return serializable
 
@@ -46,6 +61,10 @@ class DataPersistence:
         results = []
         for result_dict in data:
             result_dict['timestamp'] = datetime.fromisoformat(result_dict['timestamp'])
+            result_dict['manufacturer_stats'] = intern_manufacturer_stats(result_dict['manufacturer_stats'])
+            # Files written before dwell sketches were kept have none
+            if 'dwell_sketch' in result_dict:
+                result_dict['dwell_sketch'] = QuantileSketch.from_dict(result_dict['dwell_sketch'])
             results.append(ScanResult(**result_dict))
         return results
 
@@ -57,11 +76,21 @@ class DataPersistence:
             file_path: Path to the target file
             data: Data to write (must be JSON serializable)
         """
+        self._atomic_write_bytes(file_path, json.dumps(data).encode())
+
+    def _atomic_write_bytes(self, file_path: Path, data: bytes) -> None:
+        """
+        Write bytes to a file atomically using a temporary file and rename.
+
+        Args:
+            file_path: Path to the target file
+            data: Data to write
+        """
         # Create a temporary file in the same directory as the target file
         temp_fd, temp_path = tempfile.mkstemp(dir=str(file_path.parent))
         try:
-            with os.fdopen(temp_fd, 'w') as temp_file:
-                json.dump(data, temp_file)
+            with os.fdopen(temp_fd, 'wb') as temp_file:
+                temp_file.write(data)
             # Perform atomic rename
             os.replace(temp_path, file_path)
         except Exception:
@@ -137,6 +166,39 @@ class DataPersistence:
             logger.error(f"Failed to load scan history: {e!s}")
             return []
 
+    def save_sessions(self, snapshot: bytes) -> None:
+        """
+        Save a snapshot of the open sessions to disk.
+
+        Args:
+            snapshot: Snapshot taken with SessionManager.snapshot()
+        """
+        try:
+            self._atomic_write_bytes(self.sessions_file, snapshot)
+            self.last_session_save = datetime.now()
+        except Exception as e:
+            logger.error(f"Failed to save sessions: {e!s}")
+            raise
+
+    def load_sessions(self) -> bytes | None:
+        """
+        Load the last session snapshot from disk.
+
+        Returns:
+            The snapshot, or None if there is none
+        """
+        try:
+            return self.sessions_file.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Failed to load sessions: {e!s}")
+            return None
+
+    def should_save_sessions(self) -> bool:
+        """Check if enough time has passed since the last session snapshot."""
+        return datetime.now() - self.last_session_save >= self.session_save_interval
+
     def should_save(self) -> bool:
         """Check if enough time has passed since last save."""
         return datetime.now() - self.last_save >= self.save_interval
\ No newline at end of file
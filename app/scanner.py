@@ -0,0 +1,245 @@
+"""
+Continuous BLE scanning pipeline.
+
+Advertisements come from a ScanSource. The live source keeps a bluepy
+scanner running and pushes every advertisement it reports into an in-memory
+buffer; other sources replay recordings or generate synthetic traffic (see
+app.sources). A dedicated worker thread per source reads batches and hands
+them to the event loop through a shared asyncio queue, where batches from all
+sources are merged into scan windows that are cut on the batch timestamps.
+"""
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from bluepy.btle import BTLEException, DefaultDelegate, Scanner
+
+from .bluetooth import adapter_index
+from .core.constants import DEFAULT_BLUETOOTH_ADAPTER, SCAN_INTERVAL_SECONDS, SCAN_PROCESS_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def next_window_end(current_time: datetime, window_seconds: int = SCAN_INTERVAL_SECONDS) -> datetime:
+    """
+    Get the end of the scan window containing the given time.
+
+    Windows are aligned to multiples of window_seconds since the epoch, so all
+    sensors cut their windows at the same wall-clock instants.
+
+    Args:
+        current_time: Time that falls inside the window
+        window_seconds: Length of a scan window in seconds
+
+    Returns:
+        The first window boundary strictly after current_time.
+    """
+    timestamp = current_time.timestamp()
+    boundary = (int(timestamp // window_seconds) + 1) * window_seconds
+    return datetime.fromtimestamp(boundary)
+
+class ScanWindow:
+    """Collects the advertisements seen by all adapters during one scan window."""
+    def __init__(self, start_time: datetime, window_seconds: int = SCAN_INTERVAL_SECONDS) -> None:
+        """Initialize an empty window starting at start_time."""
+        self.start_time = start_time
+        self.end_time = next_window_end(start_time, window_seconds)
+        self.devices: dict[str, Any] = {}
+
+    def add(self, devices: Iterable[Any]) -> None:
+        """Add advertisements to the window, keeping the strongest entry per address."""
+        for device in devices:
+            existing = self.devices.get(device.addr)
+            if existing is None or device.rssi >= existing.rssi:
+                self.devices[device.addr] = device
+
+    def is_complete(self, current_time: datetime) -> bool:
+        """Check whether the window has reached its end time."""
+        return current_time >= self.end_time
+
+class ScanDelegate(DefaultDelegate):
+    """Delegate for handling BLE scan events."""
+    def __init__(self, on_advertisement: Callable[[Any], None] | None = None) -> None:
+        """
+        Initialize the ScanDelegate.
+
+        Args:
+            on_advertisement: Called with the scan entry for every advertisement received
+        """
+        DefaultDelegate.__init__(self)
+        self.on_advertisement = on_advertisement
+
+    def handleDiscovery(self, dev: Any, is_new_dev: bool, is_new_data: bool) -> None:  # noqa: N802 (bluepy callback name)
+        """Forward every received advertisement to the pipeline."""
+        if self.on_advertisement is not None:
+            self.on_advertisement(dev)
+
+@dataclass
+class ScanBatch:
+    """Advertisements read from a scan source at a point in time."""
+    timestamp: datetime
+    devices: list[Any]
+    source: str = DEFAULT_BLUETOOTH_ADAPTER
+
+class ScanSource(ABC):
+    """
+    Base class for sources of BLE advertisements.
+
+    read() is called repeatedly from a worker thread and may block for up to
+    about SCAN_PROCESS_TIMEOUT_SECONDS. The timestamps of the batches it returns
+    drive the scan windows, so a source may run faster or slower than real time.
+    """
+    name = "source"
+
+    @property
+    def finished(self) -> bool:
+        """Whether the source has no more advertisements to deliver."""
+        return False
+
+    def start(self) -> None:  # noqa: B027 (optional hook)
+        """Prepare the source for reading."""
+
+    @abstractmethod
+    def read(self) -> ScanBatch:
+        """Return the next batch of advertisements."""
+
+    def stop(self) -> None:  # noqa: B027 (optional hook)
+        """Release the resources held by the source."""
+
+class ContinuousScanner(ScanSource):
+    """Live source that keeps a bluepy scanner running on one adapter and buffers the advertisements it reports."""
+    def __init__(self, adapter: str = DEFAULT_BLUETOOTH_ADAPTER, process_timeout: float = SCAN_PROCESS_TIMEOUT_SECONDS) -> None:
+        """
+        Initialize the ContinuousScanner.
+
+        Args:
+            adapter: Name of the HCI adapter to scan with, e.g. "hci0"
+            process_timeout: Seconds each call to process() listens for advertisements
+        """
+        self.adapter = adapter
+        self.name = adapter
+        self.process_timeout = process_timeout
+        self.scanner: Scanner | None = None
+        self.pending: dict[str, Any] = {}
+
+    def _on_advertisement(self, device: Any) -> None:
+        self.pending[device.addr] = device
+
+    def start(self) -> None:
+        """Start scanning. Advertisements are buffered until drain() is called."""
+        self.pending = {}
+        self.scanner = Scanner(adapter_index(self.adapter)).withDelegate(ScanDelegate(self._on_advertisement))
+        self.scanner.start()
+
+    def process(self) -> None:
+        """Listen for advertisements for up to process_timeout seconds."""
+        if self.scanner is None:
+            raise RuntimeError("Scanner has not been started")
+        self.scanner.process(self.process_timeout)
+
+    def drain(self) -> list[Any]:
+        """
+        Return the advertisements buffered since the last drain.
+
+        The underlying scanner is cleared as well so that bluepy creates fresh
+        scan entries from now on and the returned entries are no longer mutated.
+        """
+        devices = list(self.pending.values())
+        self.pending = {}
+        if self.scanner is not None:
+            self.scanner.clear()
+        return devices
+
+    def read(self) -> ScanBatch:
+        """Listen for advertisements and return everything received."""
+        self.process()
+        return ScanBatch(datetime.now(), self.drain(), self.name)
+
+    def stop(self) -> None:
+        """Stop scanning, ignoring errors from a helper that has already exited."""
+        if self.scanner is None:
+            return
+        try:
+            self.scanner.stop()
+        except BTLEException as e:
+            logger.debug(f"Error stopping scanner: {e}")
+        self.scanner = None
+
+class ScanWorker:
+    """
+    Runs a ScanSource in a dedicated thread.
+
+    Blocking calls such as bluepy's never run on the event loop. Each batch read
+    from the source is put on an asyncio queue. Several workers can share a
+    queue, one per source. The worker exits when it is stopped, when the source
+    is finished, or when reading fails, in which case wait() raises the error.
+    """
+    def __init__(self, source: ScanSource, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Initialize the ScanWorker.
+
+        Args:
+            source: The source to read advertisements from
+            queue: Queue receiving ScanBatch objects
+            loop: The event loop that owns the queue
+        """
+        self.source = source
+        self.queue = queue
+        self.loop = loop
+        self.thread: threading.Thread | None = None
+        self.finished: asyncio.Future | None = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Start the worker thread if it is not already running."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self._stopping.clear()
+        self.finished = self.loop.create_future()
+        self.thread = threading.Thread(target=self._run, name=f"ble-scan-worker-{self.source.name}", daemon=True)
+        self.thread.start()
+
+    async def wait(self) -> None:
+        """Wait until the worker thread exits, raising the error that stopped it if any."""
+        if self.finished is not None:
+            await asyncio.shield(self.finished)
+
+    async def stop(self) -> None:
+        """Ask the worker thread to stop and wait for it without blocking the event loop."""
+        self._stopping.set()
+        if self.thread is not None:
+            await asyncio.to_thread(self.thread.join)
+            self.thread = None
+
+    def _call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        try:
+            self.loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The event loop has been closed, nobody is listening any more
+            self._stopping.set()
+
+    def _finish(self, finished: asyncio.Future, error: Exception | None) -> None:
+        if finished.done():
+            return
+        if error is None:
+            finished.set_result(None)
+        else:
+            finished.set_exception(error)
+
+    def _run(self) -> None:
+        finished = self.finished
+        error = None
+        try:
+            self.source.start()
+            while not self._stopping.is_set() and not self.source.finished:
+                self._call_soon(self.queue.put_nowait, self.source.read())
+        except Exception as e:
+            logger.error(f"Scan worker for {self.source.name} failed: {e}")
+            error = e
+        finally:
+            self.source.stop()
+            self._call_soon(self._finish, finished, error)
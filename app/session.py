@@ -1,4 +1,13 @@
+import struct
+import sys
+import weakref
+from array import array
+from collections.abc import Callable, Iterator, Mapping
 from datetime import datetime, timedelta
+from itertools import pairwise
+
+from .core.constants import SCAN_INTERVAL_SECONDS
+from .fingerprint import Fingerprint
 
 # Constants for session management
 MIN_RSSI_SAMPLES = 2  # Minimum number of RSSI samples needed for trend analysis
@@ -6,98 +15,740 @@ MAX_RSSI_DIFF = 10  # Maximum RSSI difference to consider devices as the same
 MIN_RSSI_DIFF = 5  # Minimum RSSI difference to consider devices as different
 MAX_SAMPLES = 10  # Maximum number of RSSI samples to keep
 
+# A session's row of the RSSI column: the samples, then the sums of their older and newer half
+_RSSI_ROW = MAX_SAMPLES + 2
+_FIRST_HALF_SUM = MAX_SAMPLES
+_SECOND_HALF_SUM = MAX_SAMPLES + 1
+_EMPTY_RSSI_ROW = array('h', bytes(2 * _RSSI_ROW))
+
+# End of the linked list of sessions in the order they were last seen
+_NO_ROW = -1
+_MIN_NEW_ROWS = 64  # Rows the session table grows by at least
+
+# Session snapshots: a header and the columns of the session table, each
+# little-endian, then the fingerprint of every row (zero for free rows) and
+# the further fingerprints of rotated devices with their rows. Fingerprints
+# are 32 digest bytes or a 64-bit integer each.
+SNAPSHOT_MAGIC = b'SNSS'
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct('<4sBBII')  # Magic, version, fingerprint kind, row and further fingerprint counts
+_SNAPSHOT_COLUMNS = ('start', 'last_seen', 'rssi', 'head', 'sample_count', 'active', 'trend')
+_HEX_FINGERPRINTS = 0
+_COMPACT_FINGERPRINTS = 1
+_FINGERPRINT_SIZES = {_HEX_FINGERPRINTS: 32, _COMPACT_FINGERPRINTS: 8}
+# RSSI trends by their code in the trend column
+_TRENDS = (None, "stable", "increasing", "decreasing")
+_TREND_CODES = {trend: code for code, trend in enumerate(_TRENDS)}
+_INCREASING = _TREND_CODES["increasing"]
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_SECOND = timedelta(seconds=1) // _MICROSECOND
+
+# The open sessions copied for a snapshot: the snapshot columns of the session
+# table, the fingerprint of every row and the further fingerprints by row
+SessionCopy = tuple[list[array], list[Fingerprint | None], dict[int, tuple[Fingerprint, ...]]]
+
+# Offsets of the RSSI buckets searched for a rotated device, nearest first
+_MATCH_OFFSETS = sorted(range(-MAX_RSSI_DIFF, MAX_RSSI_DIFF + 1), key=abs)
+
+def _microseconds(timestamp: datetime) -> int:
+    """Convert a timestamp to microseconds since the epoch."""
+    return (timestamp - _EPOCH) // _MICROSECOND
+
+def _datetime(microseconds: int) -> datetime:
+    """Convert microseconds since the epoch to a timestamp."""
+    return _EPOCH + microseconds * _MICROSECOND
+
+class _SessionTable:
+    """
+    The state of sessions in columns, one row per session.
+
+    Timestamps are microseconds since the epoch. A row of the RSSI column is a
+    ring buffer of the last MAX_SAMPLES values, followed by the sums of its
+    older and newer half, so an update neither allocates nor shifts samples and
+    the trend is known without summing them. A session takes a few dozen bytes
+    of array items instead of an object with its own array, datetimes and
+    ints. Rows are also linked in the order their sessions were last seen.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty table."""
+        self.start = array('q')
+        self.last_seen = array('q')
+        self.rssi = array('h')
+        self.head = array('B')  # Position of the oldest sample
+        self.sample_count = array('B')  # Zero for free rows
+        self.active = array('B')
+        self.trend = array('B')
+        self.previous = array('i')
+        self.next = array('i')
+        self.fingerprints: list[Fingerprint | None] = []
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def grow(self, count: int) -> range:
+        """Append free rows and return their numbers."""
+        rows = range(len(self), len(self) + count)
+        for column in (self.start, self.last_seen, self.head, self.sample_count, self.active, self.trend, self.previous, self.next):
+            column.frombytes(bytes(count * column.itemsize))
+        self.rssi.frombytes(bytes(count * _EMPTY_RSSI_ROW.itemsize * _RSSI_ROW))
+        self.fingerprints.extend([None] * count)
+        return rows
+
+    def open(self, row: int, fingerprint: Fingerprint, time: int, rssi: int) -> None:
+        """Start an active session with a single sample in a free row."""
+        self.fingerprints[row] = fingerprint
+        self.start[row] = time
+        self.last_seen[row] = time
+        base = row * _RSSI_ROW
+        self.rssi[base:base + _RSSI_ROW] = _EMPTY_RSSI_ROW
+        # The older half holds sample_count // 2 samples, the newer half the rest
+        self.rssi[base] = rssi
+        self.rssi[base + _SECOND_HALF_SUM] = rssi
+        self.head[row] = 0
+        self.sample_count[row] = 1
+        self.active[row] = 1
+        self.trend[row] = _TREND_CODES[None]
+
+    def free(self, row: int) -> None:
+        """Mark a row as free, to be reused by another session."""
+        self.fingerprints[row] = None
+        self.sample_count[row] = 0
+        self.active[row] = 0
+        self.trend[row] = _TREND_CODES[None]
+
+    def copy_row(self, row: int) -> '_SessionTable':
+        """Copy a row to a table of its own."""
+        table = _SessionTable()
+        table.grow(1)
+        for column in ('start', 'last_seen', 'head', 'sample_count', 'active', 'trend'):
+            getattr(table, column)[0] = getattr(self, column)[row]
+        table.rssi[:] = self.rssi[row * _RSSI_ROW:(row + 1) * _RSSI_ROW]
+        table.fingerprints[0] = self.fingerprints[row]
+        return table
+
+    def sample(self, row: int, position: int) -> int:
+        """Get a sample of a row by its position from the oldest."""
+        return self.rssi[row * _RSSI_ROW + (self.head[row] + position) % MAX_SAMPLES]
+
+    def last_rssi(self, row: int) -> int:
+        """The most recent RSSI sample of a row."""
+        return self.sample(row, self.sample_count[row] - 1)
+
+    def update(self, row: int, time: int, rssi: int) -> None:
+        """Record a sighting in a row and recalculate its trend."""
+        self.last_seen[row] = time
+        samples = self.rssi
+        base = row * _RSSI_ROW
+        head = self.head[row]
+        sample_count = self.sample_count[row]
+        if sample_count < MAX_SAMPLES:
+            samples[base + (head + sample_count) % MAX_SAMPLES] = rssi
+            sample_count += 1
+            self.sample_count[row] = sample_count
+            # The older half grows by one sample on every other update
+            moved = samples[base + (head + (sample_count - 1) // 2) % MAX_SAMPLES] if sample_count % 2 == 0 else 0
+        else:
+            # Overwrite the oldest sample, the oldest of the newer half becomes part of the older half
+            samples[base + _FIRST_HALF_SUM] -= samples[base + head]
+            samples[base + head] = rssi
+            head = (head + 1) % MAX_SAMPLES
+            self.head[row] = head
+            moved = samples[base + (head + MAX_SAMPLES // 2 - 1) % MAX_SAMPLES]
+        samples[base + _FIRST_HALF_SUM] += moved
+        samples[base + _SECOND_HALF_SUM] += rssi - moved
+        self.trend[row] = self._calculate_rssi_trend(row)
+
+    def _calculate_rssi_trend(self, row: int) -> int:
+        """Determine the code of the RSSI trend of a row based on its samples."""
+        sample_count = self.sample_count[row]
+        if sample_count < MIN_RSSI_SAMPLES:
+            return _TREND_CODES[None]
+
+        # Calculate average RSSI for first and last half of samples
+        base = row * _RSSI_ROW
+        mid_point = sample_count // 2
+        first_half_avg = self.rssi[base + _FIRST_HALF_SUM] / mid_point
+        second_half_avg = self.rssi[base + _SECOND_HALF_SUM] / (sample_count - mid_point)
+
+        diff = second_half_avg - first_half_avg
+        if abs(diff) < MIN_RSSI_DIFF:
+            return _TREND_CODES["stable"]
+        return _TREND_CODES["increasing" if diff > 0 else "decreasing"]
+
 class DeviceSession:
-    """Represents a continuous session for a device."""
-    def __init__(self, fingerprint: str, start_time: datetime, initial_rssi: int) -> None:
-        self.fingerprint = fingerprint
-        self.start_time = start_time
-        self.last_seen = start_time
-        self.rssi_samples: list[int] = [initial_rssi]
-        self.is_active = True
+    """
+    Represents a continuous session for a device.
+
+    The session is a row of a table of session state. Sessions of a
+    SessionManager share its table and are updated through the manager; a
+    session created on its own has a table of one row.
+    """
+    __slots__ = ('__weakref__', '_row', '_table')
+
+    def __init__(self, fingerprint: Fingerprint, start_time: datetime, initial_rssi: int) -> None:
+        self._table = _SessionTable()
+        self._row = self._table.grow(1)[0]
+        self._table.open(self._row, fingerprint, _microseconds(start_time), initial_rssi)
+
+    @classmethod
+    def _of_row(cls, table: _SessionTable, row: int) -> 'DeviceSession':
+        """Get a session for a row of a table."""
+        session = cls.__new__(cls)
+        session._table = table
+        session._row = row
+        return session
+
+    def _detach(self) -> None:
+        """Keep a copy of the session's row, which its table is about to reuse."""
+        self._table = self._table.copy_row(self._row)
+        self._row = 0
+
+    @property
+    def fingerprint(self) -> Fingerprint:
+        """The fingerprint the session was opened with."""
+        return self._table.fingerprints[self._row]
+
+    @property
+    def start_time(self) -> datetime:
+        """When the device was first seen."""
+        return _datetime(self._table.start[self._row])
+
+    @property
+    def last_seen(self) -> datetime:
+        """When the device was last seen."""
+        return _datetime(self._table.last_seen[self._row])
+
+    @property
+    def is_active(self) -> bool:
+        """Whether the device was seen in the last scan window."""
+        return bool(self._table.active[self._row])
+
+    @property
+    def rssi_trend(self) -> str | None:
+        """The RSSI trend, as of the last update."""
+        return _TRENDS[self._table.trend[self._row]]
+
+    @property
+    def rssi_samples(self) -> list[int]:
+        """The kept RSSI samples, oldest first."""
+        return [self._table.sample(self._row, i) for i in range(self._table.sample_count[self._row])]
+
+    @property
+    def last_rssi(self) -> int:
+        """The most recent RSSI sample."""
+        return self._table.last_rssi(self._row)
 
     def update(self, current_time: datetime, rssi: int) -> None:
         """Update session with new timestamp and RSSI value."""
-        self.last_seen = current_time
-        self.rssi_samples.append(rssi)
-        # Keep only last samples
-        if len(self.rssi_samples) > MAX_SAMPLES:
-            self.rssi_samples.pop(0)
+        self._table.update(self._row, _microseconds(current_time), rssi)
 
     def get_dwell_time(self) -> float:
         """Calculate dwell time in seconds."""
-        return (self.last_seen - self.start_time).total_seconds()
+        return (self._table.last_seen[self._row] - self._table.start[self._row]) / _SECOND
 
     def get_rssi_trend(self) -> str | None:
-        """Determine RSSI trend based on samples."""
-        if len(self.rssi_samples) < MIN_RSSI_SAMPLES:
-            return None
+        """Get the RSSI trend, as of the last update."""
+        return self.rssi_trend
 
-        # Calculate average RSSI for first and last half of samples
-        mid_point = len(self.rssi_samples) // 2
-        first_half_avg = sum(self.rssi_samples[:mid_point]) / mid_point
-        second_half_avg = sum(self.rssi_samples[mid_point:]) / (len(self.rssi_samples) - mid_point)
+class _SessionView(Mapping[Fingerprint, DeviceSession]):
+    """The open sessions of a SessionManager by fingerprint."""
+    def __init__(self, rows: dict[Fingerprint, int], session: Callable[[int], DeviceSession]) -> None:
+        """
+        Initialize the view.
 
-        diff = second_half_avg - first_half_avg
-        if abs(diff) < MIN_RSSI_DIFF:
-            return "stable"
-        return "increasing" if diff > 0 else "decreasing"
+        Args:
+            rows: The row of each fingerprint's session
+            session: Gets the session of a row
+        """
+        self._rows = rows
+        self._session = session
+
+    def __getitem__(self, fingerprint: Fingerprint) -> DeviceSession:
+        return self._session(self._rows[fingerprint])
+
+    def __iter__(self) -> Iterator[Fingerprint]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
 
 class SessionManager:
-    """Manages device sessions and handles MAC randomization."""
-    def __init__(self) -> None:
-        self.sessions: dict[str, DeviceSession] = {}
+    """
+    Manages device sessions and handles MAC randomization.
+
+    The state of all sessions is kept in one table of columns. Each fingerprint
+    leads to a row of the table; DeviceSession objects are only made for the
+    rows that are looked up, and stay the same object while they are in use.
+
+    A device that rotates its address gets a new fingerprint and is matched to a
+    session whose signal was getting stronger and whose last RSSI is close to
+    the new one. To keep that lookup independent of the number of sessions,
+    sessions with an increasing trend are indexed in buckets by their last RSSI.
+
+    Sessions are also linked in the order they were last seen, so cleanup only
+    visits expired sessions. This relies on updates arriving in time order, as
+    scan windows do.
+
+    A session is active while its device is seen in every scan window, and
+    stays open but inactive until it times out. Active sessions are the most
+    recently seen ones, so windows only visit the sessions that became
+    inactive.
+
+    Session statistics are kept as running totals that are adjusted whenever a
+    session is opened, updated, deactivated or closed, so reading them does not
+    depend on the number of sessions either.
+    """
+    def __init__(
+        self,
+        on_open: Callable[[DeviceSession], None] | None = None,
+        on_expire: Callable[[DeviceSession], None] | None = None
+    ) -> None:
+        """
+        Initialize the SessionManager.
+
+        Args:
+            on_open: Called with each new session
+            on_expire: Called with each session that times out, e.g. to archive it
+        """
         self.session_timeout = timedelta(minutes=5)
+        # Sessions not seen for a whole scan window are inactive
+        self.active_timeout = timedelta(seconds=SCAN_INTERVAL_SECONDS)
+        self.on_open = on_open
+        self.on_expire = on_expire
+        # Devices of a scan window are updated with the same time, which is converted once
+        self._current_time: datetime | None = None
+        self._current_microseconds = 0
+        self._table = _SessionTable()
+        # The row of each fingerprint's session, and the fingerprints after the first of rotated devices
+        self._rows: dict[Fingerprint, int] = {}
+        self._extra_fingerprints: dict[int, list[Fingerprint]] = {}
+        self._free_rows: list[int] = []
+        # Ends of the list of rows from least to most recently seen, and the first active row in it
+        self._oldest = _NO_ROW
+        self._newest = _NO_ROW
+        self._first_active = _NO_ROW
+        # Rows of sessions with an increasing RSSI trend, by last RSSI
+        self._increasing: dict[int, set[int]] = {}
+        # Open and active sessions, and the sum of the active sessions' dwell times in microseconds
+        self._session_count = 0
+        self._active_count = 0
+        self._active_dwell_time = 0
+        # The sessions handed out for rows, for as long as they are referenced
+        self._sessions: weakref.WeakValueDictionary[int, DeviceSession] = weakref.WeakValueDictionary()
+        self.sessions: Mapping[Fingerprint, DeviceSession] = _SessionView(self._rows, self._session)
+
+    @property
+    def session_timeout(self) -> timedelta:
+        """How long a session stays open after its device was last seen."""
+        return self._session_timeout * _MICROSECOND
+
+    @session_timeout.setter
+    def session_timeout(self, timeout: timedelta) -> None:
+        self._session_timeout = timeout // _MICROSECOND
 
-    def update_session(self, fingerprint: str, current_time: datetime, rssi: int) -> None:
+    def _session(self, row: int) -> DeviceSession:
+        """Get the session of a row."""
+        session = self._sessions.get(row)
+        if session is None:
+            session = DeviceSession._of_row(self._table, row)
+            self._sessions[row] = session
+        return session
+
+    def update_session(self, fingerprint: Fingerprint, current_time: datetime, rssi: int) -> None:
         """Update or create a session for a device."""
-        if fingerprint in self.sessions:
-            session = self.sessions[fingerprint]
-            if (current_time - session.last_seen) <= self.session_timeout:
-                session.update(current_time, rssi)
+        if current_time != self._current_time:
+            self._current_time = current_time
+            self._current_microseconds = _microseconds(current_time)
+        time = self._current_microseconds
+        row = self._rows.get(fingerprint)
+        if row is not None:
+            if time - self._table.last_seen[row] <= self._session_timeout:
+                self._continue_session(row, time, rssi)
             else:
                 # Create new session if timeout exceeded
-                self.sessions[fingerprint] = DeviceSession(fingerprint, current_time, rssi)
+                self._release_fingerprint(row, fingerprint)
+                self._open_session(fingerprint, time, rssi)
         else:
             # Check for potential MAC rotation
-            matching_session = self._find_potential_match(fingerprint, current_time, rssi)
-            if matching_session:
-                matching_session.update(current_time, rssi)
-                self.sessions[fingerprint] = matching_session
+            matching_row = self._find_potential_match(time, rssi)
+            if matching_row is not None:
+                self._continue_session(matching_row, time, rssi)
+                self._rows[fingerprint] = matching_row
+                self._extra_fingerprints.setdefault(matching_row, []).append(fingerprint)
             else:
-                self.sessions[fingerprint] = DeviceSession(fingerprint, current_time, rssi)
-
-    def _find_potential_match(self, fingerprint: str, current_time: datetime, rssi: int) -> DeviceSession | None:
-        """Find a potential match for a device that may have rotated its MAC address."""
-        for session in self.sessions.values():
-            if not session.is_active:
-                continue
-            if (current_time - session.last_seen) <= self.session_timeout:
-                # Check RSSI trend and difference
-                if session.get_rssi_trend() == "increasing" and abs(rssi - session.rssi_samples[-1]) <= MAX_RSSI_DIFF:
-                    return session
+                self._open_session(fingerprint, time, rssi)
+
+    def _open_session(self, fingerprint: Fingerprint, time: int, rssi: int) -> None:
+        """Start a new session for a fingerprint."""
+        if not self._free_rows:
+            # Grow by an eighth, as lists do, and hand the new rows out in order
+            self._free_rows.extend(reversed(self._table.grow(max(len(self._table) // 8, _MIN_NEW_ROWS))))
+        row = self._free_rows.pop()
+        self._table.open(row, fingerprint, time, rssi)
+        self._rows[fingerprint] = row
+        self._append(row)
+        self._session_count += 1
+        self._active_count += 1
+        if self.on_open is not None:
+            self.on_open(self._session(row))
+
+    def _continue_session(self, row: int, time: int, rssi: int) -> None:
+        """Record a new sighting of a device in its session."""
+        table = self._table
+        if table.trend[row] == _INCREASING:
+            self._unindex_session(row)
+        previous_seen = table.last_seen[row]
+        table.update(row, time, rssi)
+        if row != self._newest:
+            self._unlink(row)
+            self._append(row)
+        if table.active[row]:
+            self._active_dwell_time += time - previous_seen
+        else:
+            table.active[row] = 1
+            self._active_count += 1
+            self._active_dwell_time += time - table.start[row]
+            if self._first_active == _NO_ROW:
+                self._first_active = row
+        if table.trend[row] == _INCREASING:
+            self._index_session(row)
+
+    def _deactivate_session(self, row: int) -> None:
+        """Take a session that is no longer seen out of the active totals."""
+        table = self._table
+        table.active[row] = 0
+        self._active_count -= 1
+        self._active_dwell_time -= table.last_seen[row] - table.start[row]
+
+    def _release_fingerprint(self, row: int, fingerprint: Fingerprint) -> None:
+        """Detach a fingerprint from its timed out session, closing the session if it was the last one."""
+        extra_fingerprints = self._extra_fingerprints.get(row)
+        if not extra_fingerprints:
+            self._close_session(row)
+            return
+        if self._table.fingerprints[row] == fingerprint:
+            self._table.fingerprints[row] = extra_fingerprints.pop(0)
+        else:
+            extra_fingerprints.remove(fingerprint)
+        if not extra_fingerprints:
+            del self._extra_fingerprints[row]
+        del self._rows[fingerprint]
+
+    def _close_session(self, row: int) -> None:
+        """Drop a timed out session with its fingerprints, free its row and hand the session to the expiry hook."""
+        table = self._table
+        del self._rows[table.fingerprints[row]]
+        for fingerprint in self._extra_fingerprints.pop(row, ()):
+            del self._rows[fingerprint]
+        if table.trend[row] == _INCREASING:
+            self._unindex_session(row)
+        if table.active[row]:
+            self._deactivate_session(row)
+        self._unlink(row)
+        self._session_count -= 1
+
+        session = self._sessions.pop(row, None)
+        if session is None and self.on_expire is not None:
+            session = DeviceSession._of_row(table, row)
+        if session is not None:
+            session._detach()
+        table.free(row)
+        self._free_rows.append(row)
+        if self.on_expire is not None:
+            self.on_expire(session)
+
+    def _append(self, row: int) -> None:
+        """Link a row as the most recently seen."""
+        table = self._table
+        table.previous[row] = self._newest
+        table.next[row] = _NO_ROW
+        if self._newest == _NO_ROW:
+            self._oldest = row
+        else:
+            table.next[self._newest] = row
+        self._newest = row
+        if self._first_active == _NO_ROW and table.active[row]:
+            self._first_active = row
+
+    def _unlink(self, row: int) -> None:
+        """Take a row out of the list of rows in the order they were last seen."""
+        table = self._table
+        previous_row = table.previous[row]
+        next_row = table.next[row]
+        if previous_row == _NO_ROW:
+            self._oldest = next_row
+        else:
+            table.next[previous_row] = next_row
+        if next_row == _NO_ROW:
+            self._newest = previous_row
+        else:
+            table.previous[next_row] = previous_row
+        if self._first_active == row:
+            self._first_active = next_row
+
+    def _index_session(self, row: int) -> None:
+        """Add a session with an increasing trend to the bucket of its last RSSI."""
+        self._increasing.setdefault(self._table.last_rssi(row), set()).add(row)
+
+    def _unindex_session(self, row: int) -> None:
+        """Remove a session from the bucket of its last RSSI, before that changes."""
+        rssi = self._table.last_rssi(row)
+        bucket = self._increasing[rssi]
+        bucket.discard(row)
+        if not bucket:
+            del self._increasing[rssi]
+
+    def _find_potential_match(self, time: int, rssi: int) -> int | None:
+        """Find the row of a session for a device that may have rotated its MAC address."""
+        last_seen = self._table.last_seen
+        oldest_match = time - self._session_timeout
+        # Only the buckets within MAX_RSSI_DIFF are checked, the nearest first
+        for offset in _MATCH_OFFSETS:
+            for row in self._increasing.get(rssi + offset, ()):
+                # The old address of a rotated device is no longer seen, so inactive sessions match too
+                if last_seen[row] >= oldest_match:
+                    return row
         return None
 
     def cleanup_old_sessions(self, current_time: datetime) -> None:
-        """Remove sessions that have timed out."""
-        expired_sessions = [
-            fp for fp, session in self.sessions.items()
-            if (current_time - session.last_seen) > self.session_timeout
-        ]
-        for fp in expired_sessions:
-            del self.sessions[fp]
+        """Deactivate sessions that were not seen in the last scan window and remove sessions that have timed out."""
+        time = _microseconds(current_time)
+        table = self._table
+        inactive_since = time - self.active_timeout // _MICROSECOND
+        row = self._first_active
+        while row != _NO_ROW and table.last_seen[row] <= inactive_since:
+            self._deactivate_session(row)
+            row = table.next[row]
+        self._first_active = row
+
+        expired_before = time - self._session_timeout
+        while self._oldest != _NO_ROW and table.last_seen[self._oldest] < expired_before:
+            self._close_session(self._oldest)
+
+    def clear(self) -> None:
+        """Forget all sessions without expiring them."""
+        # Sessions handed out keep the rows of the old table
+        self._table = _SessionTable()
+        self._rows.clear()
+        self._extra_fingerprints.clear()
+        self._free_rows.clear()
+        self._oldest = _NO_ROW
+        self._newest = _NO_ROW
+        self._first_active = _NO_ROW
+        self._increasing.clear()
+        self._session_count = 0
+        self._active_count = 0
+        self._active_dwell_time = 0
+        self._sessions.clear()
+
+    def copy_sessions(self) -> SessionCopy:
+        """
+        Copy what a snapshot holds of the open sessions.
+
+        Copying takes the columns of the session table as a whole and the list
+        of fingerprints by row, so it is quick enough for the event loop, where
+        the sessions are updated; pack_snapshot() does the rest.
+        """
+        table = self._table
+        return (
+            [getattr(table, column)[:] for column in _SNAPSHOT_COLUMNS],
+            table.fingerprints.copy(),
+            {row: tuple(fingerprints) for row, fingerprints in self._extra_fingerprints.items()}
+        )
+
+    def snapshot(self) -> bytes:
+        """
+        Serialize the open sessions.
+
+        Returns:
+            A binary snapshot that restore() accepts, even in another process.
+        """
+        return pack_snapshot(self.copy_sessions())
+
+    def restore(self, snapshot: bytes, current_time: datetime) -> int:
+        """
+        Restore sessions from a snapshot, replacing the current ones.
+
+        Sessions that would have timed out by current_time are dropped. The
+        columns are loaded as a whole, and the rows that are kept stay where
+        they were saved; only their links are rebuilt.
+
+        Args:
+            snapshot: A snapshot taken with snapshot()
+            current_time: The time the sessions are restored at
+
+        Returns:
+            The number of restored sessions.
+
+        Raises:
+            ValueError: If the snapshot is not a valid session snapshot.
+        """
+        table, extra_fingerprints = _unpack_snapshot(snapshot)
+        cutoff = _microseconds(current_time) - self._session_timeout
+        last_seen = table.last_seen
+        rows: list[int] = []
+        free_rows: list[int] = []
+        for row, sample_count in enumerate(table.sample_count):
+            (rows if sample_count and last_seen[row] >= cutoff else free_rows).append(row)
+        rows.sort(key=last_seen.__getitem__)
+
+        self.clear()
+        self._table = table
+        for row in free_rows:
+            table.free(row)
+        self._free_rows.extend(reversed(free_rows))
+        self._rows.update(zip(map(table.fingerprints.__getitem__, rows), rows, strict=True))
+        for row, fingerprint in extra_fingerprints:
+            if table.sample_count[row]:
+                self._rows[fingerprint] = row
+                self._extra_fingerprints.setdefault(row, []).append(fingerprint)
+
+        # Rows keep their place in the table and are linked in the order they were last seen
+        for older, newer in pairwise(rows):
+            table.next[older] = newer
+            table.previous[newer] = older
+        if rows:
+            self._oldest = rows[0]
+            self._newest = rows[-1]
+
+        # Active sessions are the most recently seen ones
+        first_active = len(rows)
+        while first_active and table.active[rows[first_active - 1]]:
+            first_active -= 1
+        for row in rows[:first_active]:
+            table.active[row] = 0
+        active_rows = rows[first_active:]
+        self._first_active = active_rows[0] if active_rows else _NO_ROW
+        self._session_count = len(rows)
+        self._active_count = len(active_rows)
+        self._active_dwell_time = sum(last_seen[row] - table.start[row] for row in active_rows)
+        for row in rows:
+            if table.trend[row] == _INCREASING:
+                self._index_session(row)
+        return self._session_count
 
     def get_session_stats(self) -> dict[str, float]:
-        """Get current session statistics."""
-        active_sessions = [s for s in self.sessions.values() if s.is_active]
-        if not active_sessions:
+        """
+        Get current session statistics.
+
+        A device that rotated its address is counted once, not once per address.
+        """
+        if not self._active_count:
             return {
-                "total_sessions": 0,
+                "total_sessions": self._session_count,
                 "active_sessions": 0,
                 "average_dwell_time": 0
             }
 
         return {
-            "total_sessions": len(self.sessions),
-            "active_sessions": len(active_sessions),
-            "average_dwell_time": sum(s.get_dwell_time() for s in active_sessions) / len(active_sessions)
-        }
\ No newline at end of file
+            "total_sessions": self._session_count,
+            "active_sessions": self._active_count,
+            "average_dwell_time": self._active_dwell_time / (_SECOND * self._active_count)
+        }
+
+def _little_endian(column: array) -> bytes:
+    """Get the bytes of an array with its items in little-endian order."""
+    if sys.byteorder == 'big':
+        column = column[:]
+        column.byteswap()
+    return column.tobytes()
+
+def _pack_fingerprints(fingerprints: list[Fingerprint | None], kind: int) -> bytes:
+    """Pack fingerprints, with zeros for missing ones."""
+    if kind == _COMPACT_FINGERPRINTS:
+        return _little_endian(array('Q', (0 if fp is None else fp for fp in fingerprints)))
+    empty = bytes(_FINGERPRINT_SIZES[kind])
+    return b''.join(empty if fp is None else bytes.fromhex(fp) for fp in fingerprints)
+
+def pack_snapshot(sessions: SessionCopy) -> bytes:
+    """
+    Serialize sessions copied with SessionManager.copy_sessions().
+
+    Packing does not touch the sessions themselves, so it can run in a worker
+    thread while they are updated.
+
+    Returns:
+        A binary snapshot that SessionManager.restore() accepts.
+    """
+    columns, fingerprints, extra_fingerprints = sessions
+    first = next((fp for fp in fingerprints if fp is not None), None)
+    kind = _COMPACT_FINGERPRINTS if isinstance(first, int) else _HEX_FINGERPRINTS
+    extra_rows = array('I', (row for row, row_fingerprints in extra_fingerprints.items() for _ in row_fingerprints))
+    extras = [fp for row_fingerprints in extra_fingerprints.values() for fp in row_fingerprints]
+    return b''.join((
+        _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, kind, len(fingerprints), len(extras)),
+        *map(_little_endian, columns),
+        _pack_fingerprints(fingerprints, kind),
+        _little_endian(extra_rows),
+        _pack_fingerprints(extras, kind)
+    ))
+
+def _unpack_fingerprints(data: bytes, kind: int) -> list[Fingerprint]:
+    """Unpack fingerprints packed with _pack_fingerprints()."""
+    if kind == _COMPACT_FINGERPRINTS:
+        fingerprints = array('Q')
+        fingerprints.frombytes(data)
+        if sys.byteorder == 'big':
+            fingerprints.byteswap()
+        return fingerprints.tolist()
+    size = _FINGERPRINT_SIZES[kind]
+    return [data[i:i + size].hex() for i in range(0, len(data), size)]
+
+def _read_column(column: array, data: memoryview, offset: int, count: int) -> int:
+    """Append little-endian items to an array and return the offset after them."""
+    end = offset + count * column.itemsize
+    column.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return end
+
+def _unpack_snapshot(snapshot: bytes) -> tuple[_SessionTable, list[tuple[int, Fingerprint]]]:
+    """
+    Unpack a snapshot.
+
+    Returns:
+        A table with the rows as they were saved, unlinked, and the further
+        fingerprints of rotated devices with their rows.
+
+    Raises:
+        ValueError: If the snapshot is not a valid session snapshot.
+    """
+    try:
+        magic, version, kind, row_count, extra_count = _SNAPSHOT_HEADER.unpack_from(snapshot)
+    except struct.error as e:
+        raise ValueError(f"Truncated session snapshot: {e}") from e
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or kind not in _FINGERPRINT_SIZES:
+        raise ValueError("Not a session snapshot of a supported version")
+
+    table = _SessionTable()
+    extra_rows = array('I')
+    sections = [
+        (getattr(table, column), row_count * (_RSSI_ROW if column == 'rssi' else 1))
+        for column in _SNAPSHOT_COLUMNS
+    ]
+    fingerprint_size = _FINGERPRINT_SIZES[kind]
+    size = _SNAPSHOT_HEADER.size + sum(column.itemsize * count for column, count in sections)
+    size += (row_count + extra_count) * fingerprint_size + extra_count * extra_rows.itemsize
+    if len(snapshot) != size:
+        raise ValueError("Truncated session snapshot")
+    table.previous = array('i', [_NO_ROW]) * row_count
+    table.next = array('i', [_NO_ROW]) * row_count
+
+    data = memoryview(snapshot)
+    offset = _SNAPSHOT_HEADER.size
+    for column, count in sections:
+        offset = _read_column(column, data, offset, count)
+    end = offset + row_count * fingerprint_size
+    table.fingerprints = _unpack_fingerprints(snapshot[offset:end], kind)
+    offset = _read_column(extra_rows, data, end, extra_count)
+    extra_fingerprints = _unpack_fingerprints(snapshot[offset:], kind)
+
+    if (
+        max(table.sample_count, default=0) > MAX_SAMPLES
+        or max(table.head, default=0) >= MAX_SAMPLES
+        or max(table.trend, default=0) >= len(_TRENDS)
+        or max(extra_rows, default=0) >= row_count
+    ):
+        raise ValueError("Invalid session record")
+    return table, list(zip(extra_rows, extra_fingerprints, strict=True))
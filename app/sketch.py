@@ -0,0 +1,127 @@
+"""
+Mergeable quantile sketch for dwell time distributions.
+
+Values are counted in logarithmically sized bins, so that every quantile is
+answered within a fixed relative error (as in DDSketch). Two sketches merge
+by adding their bin counts, which gives exactly the sketch of the combined
+values; hourly and daily rollups therefore lose nothing over the per-window
+sketches they are built from.
+"""
+import math
+from typing import Any
+
+SKETCH_RELATIVE_ACCURACY = 0.01  # Quantiles are within 1% of the true value
+SKETCH_MAX_BINS = 1024  # Upper bound on the number of bins, about 6 orders of magnitude at 1%
+SKETCH_MIN_VALUE = 1.0  # Values below this, e.g. devices seen in a single window, are counted as zero
+
+_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+class QuantileSketch:
+    """Bounded-memory sketch of a distribution of non-negative values."""
+    __slots__ = ('bins', 'count', 'zero_count')
+
+    def __init__(self) -> None:
+        """Initialize an empty sketch."""
+        self.bins: dict[int, int] = {}  # Bin index to count, bin i holds values in (gamma^(i-1), gamma^i]
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Add a value to the sketch."""
+        self.count += 1
+        if value < SKETCH_MIN_VALUE:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / _LOG_GAMMA)
+        self.bins[index] = self.bins.get(index, 0) + 1
+        if len(self.bins) > SKETCH_MAX_BINS:
+            self._collapse()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Add all values of another sketch to this one."""
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > SKETCH_MAX_BINS:
+            self._collapse()
+
+    def subtract(self, other: 'QuantileSketch') -> None:
+        """
+        Remove the values of another sketch that was merged into this one.
+
+        Values of bins that have since been collapsed are taken from the
+        lowest bin, where the collapse folded them.
+        """
+        for index, count in other.bins.items():
+            if index not in self.bins:
+                index = min(self.bins)  # noqa: PLW2901 (the bin the values were folded into)
+            remaining = self.bins[index] - count
+            if remaining > 0:
+                self.bins[index] = remaining
+            else:
+                del self.bins[index]
+        self.zero_count -= other.zero_count
+        self.count -= other.count
+
+    def _collapse(self) -> None:
+        """Fold the lowest bins into each other until the sketch is within SKETCH_MAX_BINS."""
+        indexes = sorted(self.bins)
+        excess = len(indexes) - SKETCH_MAX_BINS
+        folded = sum(self.bins.pop(index) for index in indexes[:excess])
+        self.bins[indexes[excess]] += folded
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile of the values in the sketch.
+
+        Args:
+            q: The quantile, between 0 and 1
+
+        Returns:
+            The estimated value, or 0 if the sketch is empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # The point of the bin with the same relative distance to both of its bounds
+                return 2 * _GAMMA ** index / (_GAMMA + 1)
+        return 2 * _GAMMA ** max(self.bins) / (_GAMMA + 1)
+
+    def percentiles(self) -> dict[str, float]:
+        """Get the median, 90th and 99th percentile."""
+        return {
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99)
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert the sketch to a JSON serializable dictionary."""
+        return {
+            "zero_count": self.zero_count,
+            "bins": {str(index): count for index, count in self.bins.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'QuantileSketch':
+        """Recreate a sketch from a dictionary made by to_dict()."""
+        sketch = cls()
+        sketch.zero_count = data["zero_count"]
+        sketch.bins = {int(index): count for index, count in data["bins"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+def merge_sketches(sketches: list[QuantileSketch]) -> QuantileSketch:
+    """Merge sketches into a new sketch, leaving them unchanged."""
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
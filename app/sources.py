@@ -0,0 +1,343 @@
+"""
+Scan sources that do not need Bluetooth hardware.
+
+ReplayScanSource plays back advertisements recorded with RecordingScanSource,
+optionally faster than real time, and SyntheticScanSource generates a crowd of
+devices with rotating addresses and a realistic manufacturer mix. Both produce
+bluepy ScanEntry objects, so the rest of the pipeline cannot tell them apart
+from a live scan and can be load tested on any machine.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, TextIO
+
+from bluepy.btle import ADDR_TYPE_PUBLIC, ADDR_TYPE_RANDOM, ScanEntry
+
+from .core.constants import (
+    COMPLETE_16B_SERVICES,
+    COMPLETE_LOCAL_NAME,
+    MANUFACTURER_DATA_TYPE,
+    SCAN_PROCESS_TIMEOUT_SECONDS,
+    SCAN_REPLAY_FILE,
+    SCAN_REPLAY_SPEED,
+    SCAN_SOURCE,
+    SYNTHETIC_DEVICES,
+)
+from .scanner import ScanBatch, ScanSource
+
+logger = logging.getLogger(__name__)
+
+# Synthetic traffic defaults
+SYNTHETIC_ROTATION_SECONDS = 900  # Private addresses rotate about every 15 minutes
+SYNTHETIC_ADVERTISING_PROBABILITY = 0.5  # Chance that a device is heard during one read
+SYNTHETIC_CHURN_PER_MINUTE = 0.02  # Share of the crowd replaced by new devices every minute
+SYNTHETIC_RSSI_RANGE = (-95, -40)
+
+# (weight, company ID, 16-bit service UUIDs, local name, address type) of the generated device types
+SYNTHETIC_DEVICE_MIX = [
+    (55, 0x004C, [], None, ADDR_TYPE_RANDOM),  # Apple
+    (12, 0x0075, [], None, ADDR_TYPE_RANDOM),  # Samsung
+    (8, 0x00E0, [0xFE2C], None, ADDR_TYPE_RANDOM),  # Google Fast Pair
+    (6, 0x0006, [], None, ADDR_TYPE_RANDOM),  # Microsoft
+    (4, 0x0087, [0x180D], "Forerunner", ADDR_TYPE_PUBLIC),  # Garmin heart rate
+    (3, 0x009E, [], "Bose QC", ADDR_TYPE_RANDOM),  # Bose headphones
+    (12, None, [0x180F, 0xFEAA], None, ADDR_TYPE_RANDOM),  # Beacons without manufacturer data
+]
+
+def parse_ad_structures(raw: bytes) -> dict[int, bytes]:
+    """
+    Split a raw advertising payload into its AD structures.
+
+    Args:
+        raw: Advertising data as a sequence of length, type, value structures
+
+    Returns:
+        Dictionary mapping AD types to their values, like ScanEntry.scanData.
+    """
+    scan_data = {}
+    offset = 0
+    while offset + 1 < len(raw):
+        length = raw[offset]
+        if length == 0:
+            break
+        scan_data[raw[offset + 1]] = raw[offset + 2:offset + 1 + length]
+        offset += length + 1
+    return scan_data
+
+def build_ad_structures(scan_data: dict[int, bytes]) -> bytes:
+    """Encode AD structures back into a raw advertising payload."""
+    return b''.join(bytes([len(value) + 1, ad_type]) + value for ad_type, value in scan_data.items())
+
+def make_scan_entry(addr: str, addr_type: str, rssi: int, raw: bytes, iface: int = 0) -> ScanEntry:
+    """Create a bluepy ScanEntry as if the advertisement had been received by a scanner."""
+    entry = ScanEntry(addr, iface)
+    entry.addrType = addr_type
+    entry.rssi = rssi
+    entry.rawData = raw
+    entry.scanData = parse_ad_structures(raw)
+    entry.updateCount = 1
+    return entry
+
+def advertisement_to_record(device: Any, timestamp: float) -> dict[str, Any]:
+    """
+    Convert a scan entry to a JSON serializable recording record.
+
+    The payload is rebuilt from scanData rather than taken from rawData,
+    which bluepy overwrites with every packet: after a scan response, rawData
+    no longer holds the advertisement that identifies the device.
+    """
+    raw = build_ad_structures(device.scanData)
+    return {
+        "timestamp": timestamp,
+        "addr": device.addr,
+        "addr_type": device.addrType,
+        "rssi": device.rssi,
+        "raw": raw.hex()
+    }
+
+def record_to_advertisement(record: dict[str, Any]) -> ScanEntry:
+    """Convert a recording record back to a scan entry."""
+    return make_scan_entry(record["addr"], record["addr_type"], record["rssi"], bytes.fromhex(record["raw"]))
+
+class RecordingScanSource(ScanSource):
+    """Wraps another source and appends every advertisement it delivers to a JSON lines file."""
+    _lock = threading.Lock()  # Several adapters may record into the same file
+
+    def __init__(self, source: ScanSource, path: str) -> None:
+        """
+        Initialize the RecordingScanSource.
+
+        Args:
+            source: The source whose advertisements are recorded
+            path: File the advertisements are appended to
+        """
+        self.source = source
+        self.name = source.name
+        self.path = Path(path)
+        self._file: TextIO | None = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the wrapped source is finished."""
+        return self.source.finished
+
+    def start(self) -> None:
+        """Open the recording file and start the wrapped source."""
+        self._file = open(self.path, 'a')
+        self.source.start()
+
+    def read(self) -> ScanBatch:
+        """Read a batch from the wrapped source and record it."""
+        batch = self.source.read()
+        if batch.devices and self._file is not None:
+            timestamp = batch.timestamp.timestamp()
+            lines = ''.join(json.dumps(advertisement_to_record(device, timestamp)) + '\n' for device in batch.devices)
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+        return batch
+
+    def stop(self) -> None:
+        """Stop the wrapped source and close the recording file."""
+        try:
+            self.source.stop()
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class ReplayScanSource(ScanSource):
+    """
+    Replays advertisements recorded by RecordingScanSource.
+
+    Batch timestamps are shifted so the recording starts when the source is
+    started. With a speed of 2.0 the recording plays twice as fast as it was
+    recorded, and a speed of 0 replays it as fast as possible.
+    """
+    name = "replay"
+
+    def __init__(self, path: str, speed: float = 1.0, read_interval: float = SCAN_PROCESS_TIMEOUT_SECONDS) -> None:
+        """
+        Initialize the ReplayScanSource.
+
+        Args:
+            path: JSON lines file with recorded advertisements
+            speed: Replay speed relative to real time, 0 for as fast as possible
+            read_interval: Seconds of recording returned by each read
+        """
+        self.path = Path(path)
+        self.speed = speed
+        self.read_interval = read_interval
+        self._file: TextIO | None = None
+        self._next_record: dict[str, Any] | None = None
+        self._exhausted = False
+        self._recording_start = 0.0
+        self._recording_time = 0.0
+        self._replay_start = datetime.now()
+        self._started_at = 0.0
+
+    @property
+    def finished(self) -> bool:
+        """Whether every recorded advertisement has been replayed."""
+        return self._exhausted
+
+    def start(self) -> None:
+        """Open the recording and align its start with the current time."""
+        self._file = open(self.path)
+        self._exhausted = False
+        self._next_record = self._read_record()
+        self._recording_start = self._next_record["timestamp"] if self._next_record else 0.0
+        self._recording_time = self._recording_start
+        self._replay_start = datetime.now()
+        self._started_at = time.monotonic()
+
+    def _read_record(self) -> dict[str, Any] | None:
+        for line in self._file:
+            if line.strip():
+                return json.loads(line)
+        self._exhausted = True
+        return None
+
+    def read(self) -> ScanBatch:
+        """Return the advertisements recorded during the next read interval."""
+        self._recording_time += self.read_interval
+        elapsed = self._recording_time - self._recording_start
+        if self.speed > 0:
+            delay = self._started_at + elapsed / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        devices = []
+        while self._next_record is not None and self._next_record["timestamp"] < self._recording_time:
+            devices.append(record_to_advertisement(self._next_record))
+            self._next_record = self._read_record()
+        return ScanBatch(self._replay_start + timedelta(seconds=elapsed), devices, self.name)
+
+    def stop(self) -> None:
+        """Close the recording."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class SyntheticDevice:
+    """A simulated device with a stable advertising payload and a rotating private address."""
+    def __init__(self, rng: random.Random, created_at: float) -> None:
+        """Create a device with a random type, payload and signal strength."""
+        weights = [entry[0] for entry in SYNTHETIC_DEVICE_MIX]
+        _, company_id, services, name, addr_type = rng.choices(SYNTHETIC_DEVICE_MIX, weights=weights)[0]
+        scan_data = {}
+        if company_id is not None:
+            scan_data[MANUFACTURER_DATA_TYPE] = company_id.to_bytes(2, 'little') + rng.randbytes(rng.randint(2, 24))
+        if services:
+            scan_data[COMPLETE_16B_SERVICES] = b''.join(uuid.to_bytes(2, 'little') for uuid in services)
+        if name is not None:
+            scan_data[COMPLETE_LOCAL_NAME] = f"{name} {rng.randint(100, 999)}".encode()
+        self.raw = build_ad_structures(scan_data)
+        self.addr_type = addr_type
+        self.rssi = rng.randint(*SYNTHETIC_RSSI_RANGE)
+        # Spread the address rotations of different devices over time
+        self.rotation_offset = rng.uniform(0, SYNTHETIC_ROTATION_SECONDS)
+        self.address_seed = rng.getrandbits(32)
+        self.created_at = created_at
+
+    def address(self, clock: float, rotation_seconds: float) -> str:
+        """Get the address the device is using at the given time."""
+        if self.addr_type == ADDR_TYPE_PUBLIC:
+            epoch = 0
+        else:
+            epoch = int((clock + self.rotation_offset) // rotation_seconds)
+        address_rng = random.Random(self.address_seed * 1_000_003 + epoch)
+        # Resolvable private addresses have the two most significant bits set to 01
+        octets = [0x40 | address_rng.getrandbits(6)] + [address_rng.getrandbits(8) for _ in range(5)]
+        return ':'.join(f"{octet:02x}" for octet in octets)
+
+class SyntheticScanSource(ScanSource):
+    """
+    Generates advertisements from a simulated crowd of devices.
+
+    The crowd has a fixed size, but a share of it is replaced by new devices
+    every minute. Devices rotate their private addresses and their signal
+    strength drifts, so the fingerprinting and session matching see realistic
+    traffic. A speed of 0 generates batches as fast as possible.
+    """
+    name = "synthetic"
+    read_interval = SCAN_PROCESS_TIMEOUT_SECONDS  # Simulated seconds covered by each read
+    advertising_probability = SYNTHETIC_ADVERTISING_PROBABILITY
+    churn_per_minute = SYNTHETIC_CHURN_PER_MINUTE
+
+    def __init__(
+        self,
+        device_count: int = SYNTHETIC_DEVICES,
+        speed: float = 1.0,
+        seed: int | None = None,
+        rotation_seconds: float = SYNTHETIC_ROTATION_SECONDS
+    ) -> None:
+        """
+        Initialize the SyntheticScanSource.
+
+        Args:
+            device_count: Number of devices present at any time
+            speed: Generation speed relative to real time, 0 for as fast as possible
+            seed: Seed for reproducible traffic
+            rotation_seconds: How often random addresses rotate
+        """
+        self.device_count = device_count
+        self.speed = speed
+        self.rng = random.Random(seed)
+        self.rotation_seconds = rotation_seconds
+        self.devices: list[SyntheticDevice] = []
+        self.clock = 0.0
+        self._start_time = datetime.now()
+        self._started_at = 0.0
+
+    def start(self) -> None:
+        """Create the initial crowd."""
+        self.clock = 0.0
+        self._start_time = datetime.now()
+        self._started_at = time.monotonic()
+        self.devices = [SyntheticDevice(self.rng, self.clock) for _ in range(self.device_count)]
+
+    def _churn(self) -> None:
+        expected = self.device_count * self.churn_per_minute * self.read_interval / 60
+        replaced = int(expected) + (1 if self.rng.random() < expected % 1 else 0)
+        for _ in range(min(replaced, len(self.devices))):
+            self.devices[self.rng.randrange(len(self.devices))] = SyntheticDevice(self.rng, self.clock)
+
+    def read(self) -> ScanBatch:
+        """Return the advertisements heard during the next read interval."""
+        self.clock += self.read_interval
+        if self.speed > 0:
+            delay = self._started_at + self.clock / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        self._churn()
+        batch = []
+        rng = self.rng
+        for device in self.devices:
+            if rng.random() >= self.advertising_probability:
+                continue
+            device.rssi = max(SYNTHETIC_RSSI_RANGE[0], min(SYNTHETIC_RSSI_RANGE[1], device.rssi + rng.randint(-2, 2)))
+            batch.append(make_scan_entry(device.address(self.clock, self.rotation_seconds), device.addr_type, device.rssi, device.raw))
+        return ScanBatch(self._start_time + timedelta(seconds=self.clock), batch, self.name)
+
+def create_scan_source(kind: str = SCAN_SOURCE) -> ScanSource:
+    """
+    Create a hardware independent scan source from its configured name.
+
+    Args:
+        kind: "replay" or "synthetic"
+
+    Raises:
+        ValueError: If the kind is not known
+    """
+    if kind == "replay":
+        return ReplayScanSource(SCAN_REPLAY_FILE, speed=SCAN_REPLAY_SPEED)
+    if kind == "synthetic":
+        return SyntheticScanSource(SYNTHETIC_DEVICES, speed=SCAN_REPLAY_SPEED)
+    raise ValueError(f"Unknown scan source: {kind}")
@@ -0,0 +1,181 @@
+"""
+Per-minute rollups of the scan history for /time-series.
+
+Every scan result is added to a bucket for the minute it was recorded in as
+it is appended to the history, and taken out again when the history evicts
+it. Time series slots are aligned to multiples of the interval since the
+epoch, so each slot is a run of whole minutes; a series at any interval is
+built by merging the buckets of its slots without going over the results.
+"""
+from datetime import datetime, timedelta
+from typing import Any
+
+from .manufacturers import resolve_manufacturer_stats
+from .models import ScanResult
+from .sketch import QuantileSketch
+
+EPOCH = datetime(1970, 1, 1)  # Slots are aligned to the local clock, like the naive scan timestamps
+MINUTE = timedelta(minutes=1)
+
+def minute_index(timestamp: datetime) -> int:
+    """Get the number of whole minutes from the epoch to a time."""
+    return (timestamp - EPOCH) // MINUTE
+
+class RollupStats:
+    """Sums, peaks and the dwell time sketch of a group of scan results."""
+    __slots__ = ('count', 'dwell_sketch', 'manufacturer_sums', 'peaks', 'session_sums', 'sums')
+
+    def __init__(self) -> None:
+        """Initialize the statistics of an empty group."""
+        self.count = 0
+        self.sums: list[float] = [0, 0, 0]  # Unique, iOS and other devices
+        self.peaks: list[float] = [0, 0, 0]
+        self.manufacturer_sums: dict[int, float] = {}
+        self.session_sums: list[float] = [0, 0, 0]  # Total sessions, active sessions and average dwell time
+        self.dwell_sketch = QuantileSketch()
+
+    def add(self, result: ScanResult) -> None:
+        """Add a scan result to the group."""
+        self.count += 1
+        for i, value in enumerate((result.unique_devices, result.ios_devices, result.other_devices)):
+            self.sums[i] += value
+            self.peaks[i] = max(self.peaks[i], value)
+        for manufacturer, count in result.manufacturer_stats.items():
+            self.manufacturer_sums[manufacturer] = self.manufacturer_sums.get(manufacturer, 0) + count
+        session_stats = result.session_stats
+        self.session_sums[0] += session_stats.get("total_sessions", 0)
+        self.session_sums[1] += session_stats.get("active_sessions", 0)
+        self.session_sums[2] += session_stats.get("average_dwell_time", 0)
+        self.dwell_sketch.merge(result.dwell_sketch)
+
+    def merge(self, other: 'RollupStats') -> None:
+        """Add the results of another group to this one."""
+        self.count += other.count
+        for i in range(len(self.sums)):
+            self.sums[i] += other.sums[i]
+            self.peaks[i] = max(self.peaks[i], other.peaks[i])
+            self.session_sums[i] += other.session_sums[i]
+        for manufacturer, count in other.manufacturer_sums.items():
+            self.manufacturer_sums[manufacturer] = self.manufacturer_sums.get(manufacturer, 0) + count
+        self.dwell_sketch.merge(other.dwell_sketch)
+
+    def to_slot(self, slot_time: datetime) -> dict[str, Any]:
+        """
+        Describe the group as a time series slot.
+
+        Args:
+            slot_time: Start of the slot
+
+        Returns:
+            Averages and peaks of the device counts, average manufacturer counts
+            by name, average session statistics and dwell time percentiles.
+        """
+        if not self.count:
+            return {
+                "timestamp": slot_time.isoformat(),
+                "average_unique_devices": 0,
+                "average_ios_devices": 0,
+                "average_other_devices": 0,
+                "peak_unique_devices": 0,
+                "peak_ios_devices": 0,
+                "peak_other_devices": 0,
+                "manufacturer_stats": {},
+                "session_stats": {
+                    "total_sessions": 0,
+                    "active_sessions": 0,
+                    "average_dwell_time": 0
+                },
+                "dwell_time_percentiles": QuantileSketch().percentiles()
+            }
+
+        count = self.count
+        unique_devices, ios_devices, other_devices = self.sums
+        peak_unique_devices, peak_ios_devices, peak_other_devices = self.peaks
+        total_sessions, active_sessions, average_dwell_time = self.session_sums
+        return {
+            "timestamp": slot_time.isoformat(),
+            "average_unique_devices": unique_devices / count,
+            "average_ios_devices": ios_devices / count,
+            "average_other_devices": other_devices / count,
+            "peak_unique_devices": peak_unique_devices,
+            "peak_ios_devices": peak_ios_devices,
+            "peak_other_devices": peak_other_devices,
+            "manufacturer_stats": resolve_manufacturer_stats({
+                manufacturer: total / count for manufacturer, total in self.manufacturer_sums.items()
+            }),
+            "session_stats": {
+                "total_sessions": total_sessions / count,
+                "active_sessions": active_sessions / count,
+                "average_dwell_time": average_dwell_time / count
+            },
+            "dwell_time_percentiles": self.dwell_sketch.percentiles()
+        }
+
+class MinuteRollups:
+    """Rollups of the scan history by the minute the results were recorded in."""
+    def __init__(self) -> None:
+        """Initialize the MinuteRollups without any results."""
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all results."""
+        self._results: dict[int, list[ScanResult]] = {}
+        self._buckets: dict[int, RollupStats] = {}
+
+    def __len__(self) -> int:
+        """Get the number of minutes with results."""
+        return len(self._buckets)
+
+    def append(self, result: ScanResult) -> None:
+        """Add a result to the bucket of its minute."""
+        minute = minute_index(result.timestamp)
+        bucket = self._buckets.get(minute)
+        if bucket is None:
+            bucket = self._buckets[minute] = RollupStats()
+            self._results[minute] = []
+        self._results[minute].append(result)
+        bucket.add(result)
+
+    def discard(self, result: ScanResult) -> None:
+        """Take a result out of the bucket of its minute, e.g. when the history evicts it."""
+        minute = minute_index(result.timestamp)
+        results = self._results.get(minute, [])
+        remaining = [other for other in results if other is not result]
+        if len(remaining) == len(results):
+            return
+        if not remaining:
+            del self._results[minute]
+            del self._buckets[minute]
+            return
+        # Peaks cannot be taken back out, rebuild the bucket from the few results left in it
+        bucket = RollupStats()
+        for other in remaining:
+            bucket.add(other)
+        self._results[minute] = remaining
+        self._buckets[minute] = bucket
+
+    def get_slots(self, start_time: datetime, end_time: datetime, interval_minutes: int) -> list[dict[str, Any]]:
+        """
+        Build a time series from the buckets.
+
+        Args:
+            start_time: A time in the first slot
+            end_time: A time in the last slot
+            interval_minutes: Length of the slots
+
+        Returns:
+            A slot for every interval from the one containing start_time to the
+            one containing end_time, as described by RollupStats.to_slot().
+        """
+        slots = []
+        first_slot = minute_index(start_time) // interval_minutes
+        last_slot = minute_index(end_time) // interval_minutes
+        for slot in range(first_slot, last_slot + 1):
+            first_minute = slot * interval_minutes
+            stats = RollupStats()
+            for minute in range(first_minute, first_minute + interval_minutes):
+                bucket = self._buckets.get(minute)
+                if bucket is not None:
+                    stats.merge(bucket)
+            slots.append(stats.to_slot(EPOCH + first_minute * MINUTE))
+        return slots
@@ -0,0 +1,229 @@
+"""
+Sliding window aggregates of the scan history.
+
+/latest reports averages, peaks, manufacturer averages and dwell time
+percentiles over the last hour and the last 24 hours. Instead of scanning the
+history for every request, each window keeps running sums, monotonic deques
+of its peaks, manufacturer sums and a dwell time sketch that are updated as
+results are appended to and evicted from it, so a request costs the same
+however long the history is.
+"""
+from collections import deque
+from collections.abc import Iterable, Sequence
+from datetime import datetime, timedelta
+from typing import Any
+
+from .manufacturers import resolve_manufacturer_stats
+from .models import ScanResult
+from .sketch import QuantileSketch
+
+
+def _device_counts(result: ScanResult) -> tuple[float, float, float]:
+    """Get the unique, iOS and other device counts of a result."""
+    return result.unique_devices, result.ios_devices, result.other_devices
+
+def format_window_metrics(
+    count: int,
+    sums: Sequence[float],
+    peaks: Sequence[float],
+    manufacturer_sums: dict[int, float],
+    dwell_sketch: QuantileSketch
+) -> dict[str, Any]:
+    """
+    Describe the results within a window the way /latest reports them.
+
+    Args:
+        count: Number of results
+        sums: Sums of the unique, iOS and other device counts
+        peaks: Peaks of the unique, iOS and other device counts
+        manufacturer_sums: Sums of the counts by manufacturer key
+        dwell_sketch: Dwell times of the sessions that closed within the window
+
+    Returns:
+        Averages and peaks of the device counts, average manufacturer counts
+        by name and dwell time percentiles.
+    """
+    if not count:
+        return {
+            "average_unique_devices": 0,
+            "average_ios_devices": 0,
+            "average_other_devices": 0,
+            "peak_unique_devices": 0,
+            "peak_ios_devices": 0,
+            "peak_other_devices": 0,
+            "manufacturer_stats": {},
+            "dwell_time_percentiles": QuantileSketch().percentiles()
+        }
+
+    unique_devices, ios_devices, other_devices = sums
+    peak_unique_devices, peak_ios_devices, peak_other_devices = peaks
+    return {
+        "average_unique_devices": unique_devices / count,
+        "average_ios_devices": ios_devices / count,
+        "average_other_devices": other_devices / count,
+        "peak_unique_devices": peak_unique_devices,
+        "peak_ios_devices": peak_ios_devices,
+        "peak_other_devices": peak_other_devices,
+        "manufacturer_stats": resolve_manufacturer_stats({
+            manufacturer: total / count for manufacturer, total in manufacturer_sums.items()
+        }),
+        "dwell_time_percentiles": dwell_sketch.percentiles()
+    }
+
+class SlidingWindowMetrics:
+    """Running aggregates of the scan results within a time window."""
+    def __init__(self, window: timedelta) -> None:
+        """
+        Initialize the SlidingWindowMetrics.
+
+        Args:
+            window: How far back from the current time results are included
+        """
+        self.window = window
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget all results."""
+        self._results: deque[ScanResult] = deque()
+        self._appended = 0  # Results ever appended, the sequence number of the next one
+        self._sums = [0.0, 0.0, 0.0]
+        # Per device count, (sequence number, value) pairs with decreasing values;
+        # the first is the peak of the results in the window
+        self._peaks: tuple[deque[tuple[int, float]], ...] = (deque(), deque(), deque())
+        # Manufacturer key to the sum of its counts and the number of results it appears in
+        self._manufacturer_sums: dict[int, list[float]] = {}
+        self._dwell_sketch = QuantileSketch()
+
+    def __len__(self) -> int:
+        """Get the number of results in the window."""
+        return len(self._results)
+
+    def append(self, result: ScanResult) -> None:
+        """Add the newest result."""
+        sequence = self._appended
+        self._appended += 1
+        self._results.append(result)
+        for i, value in enumerate(_device_counts(result)):
+            self._sums[i] += value
+            peaks = self._peaks[i]
+            while peaks and peaks[-1][1] <= value:
+                peaks.pop()
+            peaks.append((sequence, value))
+        for manufacturer, count in result.manufacturer_stats.items():
+            totals = self._manufacturer_sums.get(manufacturer)
+            if totals is None:
+                self._manufacturer_sums[manufacturer] = [count, 1]
+            else:
+                totals[0] += count
+                totals[1] += 1
+        self._dwell_sketch.merge(result.dwell_sketch)
+
+    def extend(self, results: Iterable[ScanResult]) -> None:
+        """Add results, oldest first."""
+        for result in results:
+            self.append(result)
+
+    def _evict_oldest(self) -> None:
+        """Remove the oldest result."""
+        result = self._results.popleft()
+        sequence = self._appended - len(self._results) - 1
+        if not self._results:
+            # Start over from exact zeros rather than accumulate rounding errors
+            self.clear()
+            self._appended = sequence + 1
+            return
+        for i, value in enumerate(_device_counts(result)):
+            self._sums[i] -= value
+            peaks = self._peaks[i]
+            if peaks[0][0] == sequence:
+                peaks.popleft()
+        for manufacturer, count in result.manufacturer_stats.items():
+            totals = self._manufacturer_sums[manufacturer]
+            if totals[1] == 1:
+                del self._manufacturer_sums[manufacturer]
+            else:
+                totals[0] -= count
+                totals[1] -= 1
+        self._dwell_sketch.subtract(result.dwell_sketch)
+
+    def discard(self, result: ScanResult) -> None:
+        """Remove a result if it is the oldest in the window, e.g. when the history evicts it."""
+        if self._results and self._results[0] is result:
+            self._evict_oldest()
+
+    def expire(self, now: datetime) -> None:
+        """Remove the results that are older than the window."""
+        window_start = now - self.window
+        while self._results and self._results[0].timestamp < window_start:
+            self._evict_oldest()
+
+    def get_metrics(self, now: datetime) -> dict[str, Any]:
+        """
+        Get the metrics of the results within the window.
+
+        Args:
+            now: The current time, the end of the window
+
+        Returns:
+            Averages and peaks of the device counts, average manufacturer counts
+            by name and dwell time percentiles.
+        """
+        self.expire(now)
+        return format_window_metrics(
+            len(self._results),
+            self._sums,
+            [peaks[0][1] if peaks else 0 for peaks in self._peaks],
+            {manufacturer: totals[0] for manufacturer, totals in self._manufacturer_sums.items()},
+            self._dwell_sketch
+        )
+
+class ScanHistory(deque):
+    """
+    Bounded history of scan results that keeps aggregates of it up to date.
+
+    Aggregates, such as sliding windows, have append, discard and clear
+    methods that are called as results are appended, evicted and cleared.
+    Results are appended oldest first. append, extend and clear update the
+    aggregates and bump the version; the history is not meant to be changed
+    in any other way.
+    """
+    def __init__(
+        self,
+        iterable: Iterable[ScanResult] = (),
+        maxlen: int | None = None,
+        aggregates: Iterable[Any] = ()
+    ) -> None:
+        """
+        Initialize the ScanHistory.
+
+        Args:
+            iterable: Initial results, oldest first
+            maxlen: Number of results kept, the oldest are evicted beyond it
+            aggregates: Aggregates to update as results are added and evicted
+        """
+        super().__init__(maxlen=maxlen)
+        self.aggregates = list(aggregates)
+        self.version = 0  # Changes whenever the results do, for caching what is derived from them
+        self.extend(iterable)
+
+    def append(self, result: ScanResult) -> None:
+        """Add the newest result, evicting the oldest if the history is full."""
+        if self.maxlen is not None and len(self) == self.maxlen:
+            for aggregate in self.aggregates:
+                aggregate.discard(self[0])
+        super().append(result)
+        self.version += 1
+        for aggregate in self.aggregates:
+            aggregate.append(result)
+
+    def extend(self, results: Iterable[ScanResult]) -> None:
+        """Add results, oldest first."""
+        for result in results:
+            self.append(result)
+
+    def clear(self) -> None:
+        """Remove all results."""
+        super().clear()
+        self.version += 1
+        for aggregate in self.aggregates:
+            aggregate.clear()
@@ -0,0 +1,52 @@
+"""
+Build app/data/company_identifiers.tsv.gz from the Bluetooth SIG company registry.
+
+The names come from Nordic Semiconductor's Bluetooth numbers database as
+packaged by bluetooth-numbers, which is only needed to run this script:
+
+    pip install bluetooth-numbers==1.1.2
+    python scripts/build_company_identifiers.py
+
+Each line of the file is "<4 hex digit company ID>\t<name>", sorted by ID.
+The gzip header carries no timestamp, so the same registry always builds the
+same bytes; --check compares the shipped file with a fresh build instead of
+writing it.
+"""
+import argparse
+import gzip
+import io
+import sys
+from pathlib import Path
+
+from bluetooth_numbers import company
+
+OUTPUT_PATH = Path(__file__).resolve().parent.parent / 'app' / 'data' / 'company_identifiers.tsv.gz'
+
+def build_company_identifiers() -> bytes:
+    """Build the gzipped company identifier file."""
+    lines = "".join(f"{company_id:04x}\t{name}\n" for company_id, name in sorted(company.items()))
+    buffer = io.BytesIO()
+    with gzip.GzipFile(OUTPUT_PATH.with_suffix('').name, 'wb', fileobj=buffer, mtime=0) as f:
+        f.write(lines.encode('utf-8'))
+    return buffer.getvalue()
+
+def main() -> int:
+    """Write the file, or with --check report whether the shipped one is up to date."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--check', action='store_true', help="compare the shipped file instead of writing it")
+    args = parser.parse_args()
+
+    data = build_company_identifiers()
+    if args.check:
+        if OUTPUT_PATH.read_bytes() != data:
+            print(f"{OUTPUT_PATH} is out of date, rebuild it with {Path(__file__).name}")
+            return 1
+        print(f"{OUTPUT_PATH} is up to date ({len(company)} company IDs)")
+        return 0
+
+    OUTPUT_PATH.write_bytes(data)
+    print(f"Wrote {len(company)} company IDs to {OUTPUT_PATH}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,40 @@
+import random
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from app.main import MANUFACTURER_DATA_TYPE
+from app.core.constants import COMPLETE_16B_SERVICES, MANUFACTURER_DATA_TYPE
+from app.manufacturers import intern_manufacturer_stats
+from app.models import ScanResult
+from app.sketch import QuantileSketch
+
+TEST_MANUFACTURERS = ("Apple", "Nordic", "Google", "Samsung", "Unknown")
+SCAN_INTERVAL = timedelta(minutes=1)
+
+def make_results(count, start, fractional=False):
+    """Make results one scan interval apart, with rolled up averages if fractional."""
+    rng = random.Random(0)
+    results = []
+    for i in range(count):
+        sketch = QuantileSketch()
+        for _ in range(rng.randint(0, 3)):
+            sketch.add(rng.uniform(0, 600))
+        ios_devices = rng.randint(0, 20) + (rng.random() if fractional else 0)
+        other_devices = rng.randint(0, 20) + (rng.random() if fractional else 0)
+        manufacturers = rng.sample(TEST_MANUFACTURERS, rng.randint(0, len(TEST_MANUFACTURERS)))
+        results.append(ScanResult(
+            timestamp=start + i * SCAN_INTERVAL,
+            unique_devices=ios_devices + other_devices,
+            ios_devices=ios_devices,
+            other_devices=other_devices,
+            manufacturer_stats=intern_manufacturer_stats({
+                name: rng.randint(1, 10) + (rng.random() if fractional else 0) for name in manufacturers
+            }),
+            session_stats={"total_sessions": 3, "active_sessions": 2, "average_dwell_time": rng.randint(0, 600)},
+            dwell_sketch=sketch
+        ))
+    return results
 
 
 @pytest.fixture(autouse=True)
@@ -15,8 +47,7 @@ def mock_bluetooth():
         mock_device.addrType = "random"  # Most BLE devices use random addresses
         mock_device.rssi = -65
         # Simulate Apple device with manufacturer data and service UUIDs
-        mock_device.getValue = MagicMock(side_effect=lambda x: b'4c00' if x == MANUFACTURER_DATA_TYPE else b'0xFD6F' if x in [2, 3] else None)
-        mock_device.getValueText = MagicMock(side_effect=lambda x: '4c00' if x == MANUFACTURER_DATA_TYPE else '0xFD6F' if x in [2, 3] else '')
+        mock_device.scanData = {MANUFACTURER_DATA_TYPE: b'\x4c\x00', COMPLETE_16B_SERVICES: b'\x6f\xfd'}
 
         # Configure the mock scanner to return our mock device
         scanner_instance = MagicMock()
@@ -36,7 +67,7 @@ def mock_manufacturer_data():
 @pytest.fixture
 def mock_system_requirements():
     """Mock system requirements check for testing."""
-    with patch('app.main.check_system_requirements') as mock_check:
+    with patch('app.main.AdapterProbe.check') as mock_check:
         mock_check.return_value = (True, "System requirements met")
         yield mock_check
 
@@ -46,5 +77,5 @@ def mock_device():
     device.addr = "00:11:22:33:44:55"
     device.addrType = "random"
     device.rssi = -65
-    device.getValue = MagicMock(side_effect=lambda x: b'4c00' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: '4c00' if x == MANUFACTURER_DATA_TYPE else '')
\ No newline at end of file
+    device.scanData = {MANUFACTURER_DATA_TYPE: b'\x4c\x00'}
+    return device
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Tests for the single-pass advertisement decoder.
+"""
+from app.advertisement import Advertisement, decode_advertisement, read_company_id
+from app.core.constants import (
+    COMPLETE_16B_SERVICES,
+    COMPLETE_LOCAL_NAME,
+    DEVICE_CLASS,
+    INCOMPLETE_16B_SERVICES,
+    MANUFACTURER_DATA_TYPE,
+    SHORT_LOCAL_NAME,
+)
+from app.fingerprint import build_device_fingerprint, is_ios_device
+from app.manufacturers import get_manufacturer_from_device
+from app.sources import build_ad_structures, make_scan_entry
+
+# Test constants
+TEST_ADDR = "4a:11:22:33:44:55"
+TEST_RSSI = -60
+TEST_APPLE_ID = 0x004C
+TEST_MANU_DATA = bytes.fromhex("4c0010050b1c")
+TEST_CONTINUITY_UUID = 0xFD6F
+TEST_BATTERY_UUID = 0x180F
+TEST_HEART_RATE_UUID = 0x180D
+TEST_DEVICE_CLASS = bytes.fromhex("0c025a")
+
+def make_entry(scan_data):
+    return make_scan_entry(TEST_ADDR, "random", TEST_RSSI, build_ad_structures(scan_data))
+
+def test_decode_advertisement_reads_every_structure():
+    entry = make_entry({
+        MANUFACTURER_DATA_TYPE: TEST_MANU_DATA,
+        INCOMPLETE_16B_SERVICES: bytes.fromhex("0f18"),
+        COMPLETE_16B_SERVICES: bytes.fromhex("6ffd0d18"),
+        COMPLETE_LOCAL_NAME: b"Headphones",
+        SHORT_LOCAL_NAME: b"Head",
+        DEVICE_CLASS: TEST_DEVICE_CLASS,
+    })
+
+    advertisement = decode_advertisement(entry)
+
+    assert advertisement.addr == TEST_ADDR
+    assert advertisement.addr_type == "random"
+    assert advertisement.rssi == TEST_RSSI
+    assert advertisement.manufacturer_id == TEST_APPLE_ID
+    assert advertisement.manufacturer_data == TEST_MANU_DATA
+    assert advertisement.services == {TEST_CONTINUITY_UUID, TEST_BATTERY_UUID, TEST_HEART_RATE_UUID}
+    assert advertisement.name == "Headphones"
+    assert advertisement.short_name == "Head"
+    assert advertisement.device_class == TEST_DEVICE_CLASS
+
+def test_decode_advertisement_without_data():
+    advertisement = decode_advertisement(make_entry({}))
+    assert advertisement.manufacturer_id is None
+    assert advertisement.manufacturer_data == b""
+    assert advertisement.services == frozenset()
+    assert advertisement.name == ""
+
+def test_decode_advertisement_ignores_truncated_values():
+    advertisement = decode_advertisement(make_entry({
+        MANUFACTURER_DATA_TYPE: b"\x4c",
+        COMPLETE_16B_SERVICES: bytes.fromhex("6ffd0d"),
+    }))
+    assert advertisement.manufacturer_id is None
+    assert advertisement.services == {TEST_CONTINUITY_UUID}
+
+def test_read_company_id():
+    assert read_company_id(TEST_MANU_DATA) == TEST_APPLE_ID
+    assert read_company_id(bytearray(TEST_MANU_DATA)) == TEST_APPLE_ID
+    assert read_company_id(memoryview(TEST_MANU_DATA)) == TEST_APPLE_ID
+    assert read_company_id(b"\x4c") is None
+    assert read_company_id(None) is None
+
+def test_decode_advertisement_replaces_invalid_names():
+    advertisement = decode_advertisement(make_entry({COMPLETE_LOCAL_NAME: b"Tag\xff"}))
+    assert advertisement.name == "Tag?"
+
+def test_decode_advertisement_is_idempotent():
+    advertisement = decode_advertisement(make_entry({MANUFACTURER_DATA_TYPE: TEST_MANU_DATA}))
+    assert decode_advertisement(advertisement) is advertisement
+
+def test_advertisement_uses_slots():
+    advertisement = Advertisement(TEST_ADDR, "public", TEST_RSSI)
+    assert not hasattr(advertisement, "__dict__")
+
+def test_consumers_accept_decoded_advertisements():
+    entry = make_entry({MANUFACTURER_DATA_TYPE: TEST_MANU_DATA, COMPLETE_LOCAL_NAME: b"Headphones"})
+    advertisement = decode_advertisement(entry)
+
+    assert build_device_fingerprint(advertisement) == build_device_fingerprint(entry)
+    assert is_ios_device(advertisement)
+    assert get_manufacturer_from_device(advertisement) == "Apple, Inc."
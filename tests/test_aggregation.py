@@ -5,8 +5,16 @@ from datetime import datetime, timedelta
 
 import pytest
 
-from app.aggregation import aggregate_daily, aggregate_hourly, get_aggregated_history
+from app.aggregation import (
+    PERSISTED_DAILY_RESULTS,
+    aggregate_daily,
+    aggregate_hourly,
+    get_aggregated_history,
+    persisted_history_start,
+)
+from app.manufacturers import intern_manufacturer, intern_manufacturer_stats
 from app.models import ScanResult
+from app.sketch import SKETCH_RELATIVE_ACCURACY, QuantileSketch
 
 # Constants for test values
 HOURS_IN_DAY = 24
@@ -29,7 +37,7 @@ def sample_scan_results():
             unique_devices=10 + i,
             ios_devices=5 + i,
             other_devices=5,
-            manufacturer_stats={"Apple": 5 + i, "Nordic": 5},
+            manufacturer_stats=intern_manufacturer_stats({"Apple": 5 + i, "Nordic": 5}),
             session_stats={
                 "total_sessions": 10 + i,
                 "active_sessions": 5 + i,
@@ -44,7 +52,7 @@ def sample_scan_results():
             unique_devices=20 + i,
             ios_devices=10 + i,
             other_devices=10,
-            manufacturer_stats={"Apple": 10 + i, "Nordic": 10},
+            manufacturer_stats=intern_manufacturer_stats({"Apple": 10 + i, "Nordic": 10}),
             session_stats={
                 "total_sessions": 20 + i,
                 "active_sessions": 10 + i,
@@ -59,7 +67,7 @@ def sample_scan_results():
             unique_devices=30 + i,
             ios_devices=15 + i,
             other_devices=15,
-            manufacturer_stats={"Apple": 15 + i, "Nordic": 15},
+            manufacturer_stats=intern_manufacturer_stats({"Apple": 15 + i, "Nordic": 15}),
             session_stats={
                 "total_sessions": 30 + i,
                 "active_sessions": 15 + i,
@@ -85,8 +93,8 @@ def test_aggregate_hourly(sample_scan_results):
     assert all(r.unique_devices > 0 for r in aggregated)
     assert all(r.ios_devices > 0 for r in aggregated)
     assert all(r.other_devices > 0 for r in aggregated)
-    assert all("Apple" in r.manufacturer_stats for r in aggregated)
-    assert all("Nordic" in r.manufacturer_stats for r in aggregated)
+    assert all(intern_manufacturer("Apple") in r.manufacturer_stats for r in aggregated)
+    assert all(intern_manufacturer("Nordic") in r.manufacturer_stats for r in aggregated)
     assert all(r.session_stats["total_sessions"] > 0 for r in aggregated)
     assert all(r.session_stats["active_sessions"] > 0 for r in aggregated)
     assert all(r.session_stats["average_dwell_time"] > 0 for r in aggregated)
@@ -107,8 +115,8 @@ def test_aggregate_daily(sample_scan_results):
     assert all(r.unique_devices > 0 for r in aggregated)
     assert all(r.ios_devices > 0 for r in aggregated)
     assert all(r.other_devices > 0 for r in aggregated)
-    assert all("Apple" in r.manufacturer_stats for r in aggregated)
-    assert all("Nordic" in r.manufacturer_stats for r in aggregated)
+    assert all(intern_manufacturer("Apple") in r.manufacturer_stats for r in aggregated)
+    assert all(intern_manufacturer("Nordic") in r.manufacturer_stats for r in aggregated)
     assert all(r.session_stats["total_sessions"] > 0 for r in aggregated)
     assert all(r.session_stats["active_sessions"] > 0 for r in aggregated)
     assert all(r.session_stats["average_dwell_time"] > 0 for r in aggregated)
@@ -137,6 +145,18 @@ def test_get_aggregated_history(sample_scan_results):
     assert len(aggregated["daily"]) == EXPECTED_AGGREGATED_DAILY_DAYS  # 6 days of daily data (days 8-13)
     assert all(r.timestamp < datetime.now() - timedelta(days=DAYS_IN_WEEK) for r in aggregated["daily"])
 
+def test_results_before_persisted_history_start_are_dropped():
+    now = datetime.now()
+    results = [
+        ScanResult(timestamp=now - timedelta(days=day), unique_devices=1, ios_devices=0, other_devices=1, manufacturer_stats={})
+        for day in range(DAYS_IN_WEEK + PERSISTED_DAILY_RESULTS + DAYS_IN_WEEK)
+    ]
+    kept = [r for r in results if r.timestamp >= persisted_history_start(now)]
+
+    assert len(kept) < len(results)
+    for granularity in ("detailed", "hourly", "daily"):
+        assert len(get_aggregated_history(kept)[granularity]) == len(get_aggregated_history(results)[granularity])
+
 def test_empty_data():
     """Test aggregation with empty data."""
     empty_results = []
@@ -153,4 +173,28 @@ def test_empty_data():
     aggregated = get_aggregated_history(empty_results)
     assert len(aggregated["detailed"]) == 0
     assert len(aggregated["hourly"]) == 0
-    assert len(aggregated["daily"]) == 0
\ No newline at end of file
+    assert len(aggregated["daily"]) == 0
+
+def test_aggregation_merges_dwell_sketches():
+    """Rollups keep every closed session's dwell time rather than averaging averages."""
+    hour = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+    results = []
+    for minute, dwell_times in enumerate([[60.0], [600.0, 600.0, 600.0]]):
+        sketch = QuantileSketch()
+        for dwell_time in dwell_times:
+            sketch.add(dwell_time)
+        results.append(ScanResult(
+            timestamp=hour + timedelta(minutes=minute),
+            unique_devices=1,
+            ios_devices=0,
+            other_devices=1,
+            manufacturer_stats={},
+            dwell_sketch=sketch
+        ))
+
+    for aggregated in (aggregate_hourly(results), aggregate_daily(results)):
+        assert len(aggregated) == 1
+        sketch = aggregated[0].dwell_sketch
+        assert sketch.count == 4  # noqa: PLR2004 (dwell times above)
+        assert sketch.quantile(0.5) == pytest.approx(600.0, rel=SKETCH_RELATIVE_ACCURACY)
+        assert sketch.quantile(0) == pytest.approx(60.0, rel=SKETCH_RELATIVE_ACCURACY)
@@ -0,0 +1,183 @@
+"""
+Tests for the Bluetooth adapter management module.
+"""
+import struct
+import subprocess
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.bluetooth import (
+    ADAPTER_FAILED,
+    ADAPTER_READY,
+    ADAPTER_UNINITIALISED,
+    HCI_DEV_INFO_FLAGS_OFFSET,
+    HCI_UP,
+    HCIGETDEVINFO,
+    AdapterManager,
+    AdapterProbe,
+    check_system_requirements,
+    read_adapter_flags,
+    run_command,
+    setup_bluetooth,
+)
+
+# Test constants
+TEST_HCI_FLAGS = 0x0D  # HCI_UP | HCI_RUNNING | HCI_PSCAN
+TEST_PROBE_TTL = 60
+TEST_EXPECTED_PROBES = 2
+TEST_SETUP_BLUETOOTH_COMMANDS = 4
+HTTP_ERROR = 500
+TEST_INITIAL_BACKOFF = 5
+TEST_MAX_BACKOFF = 30
+TEST_EXPECTED_RESETS = 2
+TEST_EXPECTED_BACKOFFS = [5, 10, 20, 30, 30]
+
+def make_process(returncode: int = 0, stdout: str = "") -> MagicMock:
+    """Create a fake asyncio subprocess."""
+    process = MagicMock()
+    process.returncode = returncode
+    process.communicate = AsyncMock(return_value=(stdout.encode(), b""))
+    return process
+
+@pytest.mark.asyncio
+async def test_run_command():
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = make_process(stdout="output")
+        assert await run_command('hciconfig', 'hci0') == (0, "output")
+        assert mock_exec.call_args[0] == ('hciconfig', 'hci0')
+
+@pytest.fixture
+def mock_bluez_installed():
+    with patch('shutil.which', return_value='/usr/bin/btmgmt') as mock_which:
+        yield mock_which
+
+def test_check_system_requirements_success(mock_bluez_installed):
+    """Test successful system requirements check."""
+    with patch('app.bluetooth.read_adapter_flags', return_value=HCI_UP) as mock_flags:
+        success, message = check_system_requirements()
+        assert success is True
+        assert "System requirements met" in message
+        mock_flags.assert_called_once_with('hci0')
+
+def test_check_system_requirements_bluez_missing():
+    with patch('shutil.which', return_value=None):
+        success, message = check_system_requirements()
+        assert success is False
+        assert "BlueZ is not installed" in message
+
+def test_check_system_requirements_bluetooth_off(mock_bluez_installed):
+    with patch('app.bluetooth.read_adapter_flags', return_value=0):
+        success, message = check_system_requirements()
+        assert success is False
+        assert "Bluetooth is not powered on" in message
+
+def test_check_system_requirements_adapter_unavailable(mock_bluez_installed):
+    with patch('app.bluetooth.read_adapter_flags', side_effect=OSError("No such device")):
+        success, message = check_system_requirements()
+        assert success is False
+        assert "Could not check Bluetooth status" in message
+
+def test_read_adapter_flags():
+    def fake_ioctl(fd, request, buffer):
+        assert request == HCIGETDEVINFO
+        assert struct.unpack_from('=H', buffer, 0)[0] == 1  # Device id of hci1
+        struct.pack_into('=I', buffer, HCI_DEV_INFO_FLAGS_OFFSET, TEST_HCI_FLAGS)
+
+    with patch('socket.socket'), patch('fcntl.ioctl', side_effect=fake_ioctl):
+        assert read_adapter_flags('hci1') == TEST_HCI_FLAGS
+
+def test_adapter_probe_caches_result():
+    probe = AdapterProbe(ttl_seconds=TEST_PROBE_TTL)
+    with patch('app.bluetooth.check_system_requirements', return_value=(True, "System requirements met")) as mock_check:
+        assert probe.check() == (True, "System requirements met")
+        assert probe.check() == (True, "System requirements met")
+        mock_check.assert_called_once_with('hci0')
+
+        # Invalidating forces a fresh check
+        probe.invalidate()
+        probe.check()
+        assert mock_check.call_count == TEST_EXPECTED_PROBES
+
+def test_adapter_probe_refreshes_after_ttl():
+    probe = AdapterProbe(ttl_seconds=0)
+    with patch('app.bluetooth.check_system_requirements', return_value=(False, "Bluetooth is not powered on")) as mock_check:
+        probe.check()
+        probe.check()
+        assert mock_check.call_count == TEST_EXPECTED_PROBES
+
+@pytest.mark.asyncio
+async def test_setup_bluetooth_success():
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = make_process()
+        await setup_bluetooth()  # Should not raise an exception
+        assert mock_exec.call_count == TEST_SETUP_BLUETOOTH_COMMANDS
+
+@pytest.mark.asyncio
+async def test_setup_bluetooth_failure():
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = make_process(returncode=1)
+        with pytest.raises(HTTPException) as exc_info:
+            await setup_bluetooth()
+        assert exc_info.value.status_code == HTTP_ERROR
+        assert "Failed to set up Bluetooth adapter" in str(exc_info.value.detail)
+        assert isinstance(exc_info.value.__cause__, subprocess.CalledProcessError)
+
+@pytest.mark.asyncio
+async def test_setup_bluetooth_uses_given_adapter():
+    with patch('asyncio.create_subprocess_exec', new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = make_process()
+        await setup_bluetooth('hci1')
+        assert mock_exec.call_args_list[0][0] == ('hciconfig', 'hci1', 'reset')
+        # Every command acts on hci1, not on the default controller
+        assert all('hci1' in args or args[1:3] == ('--index', '1') for args, _ in mock_exec.call_args_list)
+
+@pytest.mark.asyncio
+async def test_adapter_manager_initialises_once():
+    manager = AdapterManager()
+    assert manager.state == ADAPTER_UNINITIALISED
+    with patch('app.bluetooth.setup_bluetooth', new_callable=AsyncMock) as mock_setup:
+        assert await manager.ensure_ready()
+        assert await manager.ensure_ready()
+        mock_setup.assert_called_once_with('hci0')
+    assert manager.state == ADAPTER_READY
+    assert manager.resets == 1
+
+@pytest.mark.asyncio
+async def test_adapter_manager_reinitialises_after_failure():
+    manager = AdapterManager(initial_backoff=0)
+    with patch('app.bluetooth.setup_bluetooth', new_callable=AsyncMock) as mock_setup:
+        await manager.ensure_ready()
+        manager.mark_failed(RuntimeError("helper died"))
+        assert manager.state == ADAPTER_FAILED
+        assert manager.last_error == "helper died"
+        assert await manager.ensure_ready()
+        assert mock_setup.call_count == TEST_EXPECTED_RESETS
+    assert manager.resets == TEST_EXPECTED_RESETS
+    assert manager.get_stats()["failures"] == 1
+
+@pytest.mark.asyncio
+async def test_adapter_manager_backs_off_after_failed_setup():
+    manager = AdapterManager(initial_backoff=TEST_INITIAL_BACKOFF, max_backoff=TEST_MAX_BACKOFF)
+    with patch('app.bluetooth.setup_bluetooth', new_callable=AsyncMock) as mock_setup:
+        mock_setup.side_effect = HTTPException(status_code=HTTP_ERROR, detail="Failed to set up Bluetooth adapter")
+        assert not await manager.ensure_ready()
+        # Still backing off, so setup is not attempted again
+        assert not await manager.ensure_ready()
+        mock_setup.assert_called_once()
+    assert manager.state == ADAPTER_FAILED
+    assert 0 < manager.seconds_until_retry() <= TEST_INITIAL_BACKOFF
+
+def test_adapter_manager_backoff_is_exponential_and_capped():
+    manager = AdapterManager(initial_backoff=TEST_INITIAL_BACKOFF, max_backoff=TEST_MAX_BACKOFF)
+    assert manager.backoff_seconds() == 0
+    backoffs = []
+    for _ in range(len(TEST_EXPECTED_BACKOFFS)):
+        manager.mark_failed("error")
+        backoffs.append(manager.backoff_seconds())
+    assert backoffs == TEST_EXPECTED_BACKOFFS
+
+    # Delivering results clears the backoff
+    manager.mark_healthy()
+    assert manager.backoff_seconds() == 0
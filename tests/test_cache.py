@@ -0,0 +1,41 @@
+"""
+Tests for the cache module.
+"""
+import json
+
+from app.cache import CachedResponse, ResponseCache, etag_matches
+
+# Test constants
+TEST_CONTENT = {"unique_devices": 3, "manufacturer_stats": {"Nordic Semiconductor ASA": 1.5}}
+TEST_ENDPOINT = "/time-series"
+TEST_PARAMS = (60,)
+
+def test_cached_response_serializes_content():
+    cached = CachedResponse(TEST_CONTENT)
+    assert json.loads(cached.body) == TEST_CONTENT
+    assert cached.etag.startswith('"') and cached.etag.endswith('"')
+    assert CachedResponse(dict(TEST_CONTENT)).etag == cached.etag
+
+def test_cache_is_dropped_on_new_version():
+    cache = ResponseCache()
+    assert cache.get(TEST_ENDPOINT, TEST_PARAMS, 1) is None
+    cached = cache.put(TEST_ENDPOINT, TEST_PARAMS, 1, TEST_CONTENT)
+
+    assert cache.get(TEST_ENDPOINT, TEST_PARAMS, 1) is cached
+    assert cache.get(TEST_ENDPOINT, (30,), 1) is None
+    assert cache.get(TEST_ENDPOINT, TEST_PARAMS, 2) is None
+    assert not cache.entries
+
+def test_response_for_old_version_is_not_cached():
+    cache = ResponseCache()
+    cache.get(TEST_ENDPOINT, TEST_PARAMS, 2)
+    cache.put(TEST_ENDPOINT, TEST_PARAMS, 1, TEST_CONTENT)
+    assert cache.get(TEST_ENDPOINT, TEST_PARAMS, 2) is None
+
+def test_etag_matches():
+    etag = CachedResponse(TEST_CONTENT).etag
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
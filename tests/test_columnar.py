@@ -0,0 +1,108 @@
+"""
+Tests for the columnar module.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import SCAN_INTERVAL, TEST_MANUFACTURERS, make_results
+
+pytest.importorskip("numpy")
+
+from app.columnar import ColumnarHistory  # noqa: E402 (needs the optional numpy)
+from app.manufacturers import intern_manufacturer_stats  # noqa: E402
+from app.models import ScanResult  # noqa: E402
+from app.timeseries import MinuteRollups  # noqa: E402
+from app.windows import ScanHistory, SlidingWindowMetrics  # noqa: E402
+
+# Test constants
+TEST_START = datetime(2024, 3, 20, 10, 7, 30)
+TEST_RESULTS_COUNT = 500
+TEST_CAPACITY = 200
+TEST_MANUFACTURER_COLUMNS = 2  # Fewer than the manufacturers, so the matrix grows
+TEST_WINDOWS = (timedelta(minutes=30), timedelta(hours=1), timedelta(hours=24))
+TEST_INTERVALS = (1, 7, 60, 120)
+
+def fields(result):
+    """The fields of a result, with its dwell time sketch by value."""
+    return (
+        result.timestamp,
+        result.unique_devices,
+        result.ios_devices,
+        result.other_devices,
+        result.manufacturer_stats,
+        result.session_stats,
+        result.dwell_sketch.bins,
+        result.dwell_sketch.count
+    )
+
+@pytest.fixture
+def results():
+    return make_results(TEST_RESULTS_COUNT, TEST_START)
+
+@pytest.fixture
+def columnar(results):
+    history = ColumnarHistory(TEST_CAPACITY, TEST_MANUFACTURER_COLUMNS)
+    history.extend(results)
+    return history
+
+def test_ring_buffer_keeps_newest_results(columnar, results):
+    assert len(columnar) == TEST_CAPACITY
+    assert [fields(result) for result in columnar] == [fields(result) for result in results[-TEST_CAPACITY:]]
+    assert fields(columnar[-1]) == fields(results[-1])
+    assert fields(columnar[0]) == fields(results[-TEST_CAPACITY])
+    with pytest.raises(IndexError):
+        columnar[TEST_CAPACITY]
+
+def test_copy_is_independent_of_later_appends(columnar, results):
+    start_time = results[-TEST_CAPACITY // 2].timestamp
+    copy = columnar.copy(start_time)
+    columnar.extend(make_results(TEST_CAPACITY, results[-1].timestamp + SCAN_INTERVAL))
+
+    assert [fields(result) for result in copy] == [fields(result) for result in results[-TEST_CAPACITY // 2:]]
+    assert len(columnar.copy()) == TEST_CAPACITY
+    assert not list(columnar.copy(results[-1].timestamp + 2 * TEST_CAPACITY * SCAN_INTERVAL))
+
+def test_version_and_clear(columnar):
+    version = columnar.version
+    columnar.clear()
+    assert columnar.version > version
+    assert len(columnar) == 0
+    assert not list(columnar)
+
+@pytest.mark.parametrize("window", TEST_WINDOWS)
+def test_metrics_match_sliding_window(columnar, results, window):
+    sliding = SlidingWindowMetrics(window)
+    ScanHistory(maxlen=TEST_CAPACITY, aggregates=[sliding]).extend(results)
+    now = results[-1].timestamp
+    assert columnar.get_metrics(now - window) == sliding.get_metrics(now)
+
+@pytest.mark.parametrize("interval_minutes", TEST_INTERVALS)
+def test_slots_match_minute_rollups(columnar, results, interval_minutes):
+    rollups = MinuteRollups()
+    ScanHistory(maxlen=TEST_CAPACITY, aggregates=[rollups]).extend(results)
+    end_time = results[-1].timestamp
+    start_time = end_time - timedelta(hours=6)
+    assert columnar.get_slots(start_time, end_time, interval_minutes) == rollups.get_slots(start_time, end_time, interval_minutes)
+
+def test_manufacturer_columns_grow_in_steps(columnar):
+    assert columnar._manufacturers.dtype.itemsize == 2  # noqa: PLR2004 (16-bit counts)
+    assert columnar._manufacturers.shape[1] == len(TEST_MANUFACTURERS) + 1  # Grown by two columns twice
+
+def test_rolled_up_averages_are_rounded():
+    history = ColumnarHistory(TEST_CAPACITY)
+    history.append(ScanResult(
+        timestamp=TEST_START,
+        unique_devices=7.6,
+        ios_devices=4.4,
+        other_devices=3.2,
+        manufacturer_stats=intern_manufacturer_stats({"Apple": 4.4, "Nordic": 0.3})
+    ))
+    result = history[-1]
+    assert (result.unique_devices, result.ios_devices, result.other_devices) == (8, 4, 3)
+    assert result.manufacturer_stats == intern_manufacturer_stats({"Apple": 4})
+
+def test_empty_history():
+    history = ColumnarHistory(TEST_CAPACITY)
+    assert history.get_metrics(TEST_START)["peak_unique_devices"] == 0
+    slots = history.get_slots(TEST_START, TEST_START + timedelta(hours=1), 60)
+    assert all(slot["average_unique_devices"] == 0 for slot in slots)
@@ -0,0 +1,88 @@
+"""
+Tests for the events module.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.events import (
+    SESSION_CLOSE,
+    SESSION_OPEN,
+    EventBroadcaster,
+    format_event,
+    session_event_data,
+)
+from app.session import DeviceSession
+
+# Test constants
+TEST_QUEUE_SIZE = 3
+TEST_RSSI = -70
+TEST_KEEPALIVE_SECONDS = 0.01
+TEST_EVENT = (SESSION_OPEN, {"fingerprint": "ab"})
+
+def test_session_event_data():
+    start = datetime(2024, 3, 20, 10, 0)
+    session = DeviceSession(0xAB, start, TEST_RSSI)
+    session.update(start + timedelta(minutes=2), TEST_RSSI)
+
+    assert session_event_data(session) == {
+        "fingerprint": "00000000000000ab",
+        "start": "2024-03-20T10:00:00",
+        "end": "2024-03-20T10:02:00",
+        "dwell_time": 120.0,
+        "rssi_trend": "stable"
+    }
+
+def test_format_event():
+    message = format_event(TEST_EVENT)
+    assert message.startswith("event: open\ndata: ")
+    assert message.endswith("\n\n")
+    assert json.loads(message.splitlines()[1][len("data: "):]) == TEST_EVENT[1]
+
+@pytest.mark.asyncio
+async def test_publish_fans_out_to_every_subscriber():
+    broadcaster = EventBroadcaster()
+    queues = [broadcaster.subscribe(), broadcaster.subscribe()]
+
+    broadcaster.publish(TEST_EVENT)
+
+    for queue in queues:
+        assert queue.get_nowait() == TEST_EVENT
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_dropped():
+    broadcaster = EventBroadcaster(queue_size=TEST_QUEUE_SIZE)
+    slow_stream = broadcaster.stream()
+    first_message = asyncio.create_task(anext(slow_stream))
+    await asyncio.sleep(0)  # The stream subscribes once it is iterated
+    slow, = broadcaster.subscribers
+    fast = broadcaster.subscribe()
+
+    for _ in range(TEST_QUEUE_SIZE + 1):
+        broadcaster.publish(TEST_EVENT)
+        fast.get_nowait()
+
+    assert slow not in broadcaster.subscribers
+    assert fast in broadcaster.subscribers
+    assert broadcaster.get_stats() == {"subscribers": 1, "dropped": 1}
+
+    # The dropped subscriber's stream ends after the events it was sent
+    messages = [await first_message, *[message async for message in slow_stream]]
+    assert messages == [format_event(TEST_EVENT)] * TEST_QUEUE_SIZE
+
+@pytest.mark.asyncio
+async def test_stream_sends_keepalives_and_unsubscribes_when_closed():
+    broadcaster = EventBroadcaster()
+    stream = broadcaster.stream(keepalive_seconds=TEST_KEEPALIVE_SECONDS)
+    # A client that disconnects before its stream starts never subscribes
+    assert not broadcaster.subscribers
+
+    assert await anext(stream) == ": keepalive\n\n"
+    assert len(broadcaster.subscribers) == 1
+    broadcaster.publish((SESSION_CLOSE, {}))
+    assert await anext(stream) == format_event((SESSION_CLOSE, {}))
+
+    await stream.aclose()
+    assert not broadcaster.subscribers
@@ -0,0 +1,274 @@
+"""
+Tests for the fingerprint cache.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import fingerprint
+from app.core.constants import COMPLETE_16B_SERVICES, MANUFACTURER_DATA_TYPE
+from app.fingerprint import (
+    PLATFORM_ANDROID,
+    PLATFORM_IOS,
+    PLATFORM_UNKNOWN,
+    PLATFORM_WINDOWS,
+    FingerprintCache,
+    build_compact_fingerprint,
+    build_device_fingerprint,
+    build_device_fingerprints,
+    build_device_fingerprints_async,
+    classify_platform,
+    fingerprint_to_hex,
+    identify_device,
+    is_ios_device,
+)
+from app.manufacturers import manufacturer_name
+from app.session import SessionManager
+
+# Test constants
+TEST_APPLE_MANU_DATA = bytes.fromhex("4c0010050b1c")
+TEST_NORDIC_MANU_DATA = bytes.fromhex("5900aabb")
+TEST_APPLE_SERVICE = b"\x6f\xfd"
+TEST_MICROSOFT_MANU_DATA = bytes.fromhex("060003")
+TEST_GOOGLE_MANU_DATA = bytes.fromhex("e00001")
+TEST_FAST_PAIR_SERVICE = b"\x2c\xfe"
+TEST_BATTERY_SERVICE = b"\x0f\x18"
+TEST_CACHE_SIZE = 2
+TEST_REPEATS = 3
+TEST_COMPACT_HEX_LENGTH = 16
+TEST_RSSI = -60
+TEST_SHARDS = 2
+TEST_TIMEOUT_SECONDS = 5
+
+def make_device(addr, scan_data, addr_type="random"):
+    device = MagicMock()
+    device.addr = addr
+    device.addrType = addr_type
+    device.scanData = scan_data
+    return device
+
+def test_cache_returns_computed_identity():
+    cache = FingerprintCache()
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+
+    identity = cache.identify(device)
+
+    assert identity == identify_device(device)
+    assert identity.is_ios
+    assert manufacturer_name(identity.manufacturer) == "Apple, Inc."
+
+def test_cache_hits_for_repeated_payloads():
+    cache = FingerprintCache()
+    for i in range(TEST_REPEATS):
+        # The same payload advertised under rotating addresses
+        cache.identify(make_device(f"4a:00:00:00:00:0{i}", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}))
+
+    with patch('app.fingerprint.identify_device') as mock_identify:
+        cache.identify(make_device("4a:00:00:00:00:09", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}))
+        mock_identify.assert_not_called()
+
+    stats = cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == TEST_REPEATS
+    assert stats["size"] == 1
+
+def test_cache_key_ignores_structure_order():
+    cache = FingerprintCache()
+    cache.identify(make_device("4a:00:00:00:00:01", {
+        MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA, COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE
+    }))
+    cache.identify(make_device("4a:00:00:00:00:02", {
+        COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE, MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA
+    }))
+    assert cache.hits == 1
+
+def test_cache_key_includes_address_details():
+    cache = FingerprintCache()
+    ios_private = cache.identify(make_device("40:00:11:22:33:44", {}))
+    android_random = cache.identify(make_device("42:11:22:33:44:55", {}))
+    public = cache.identify(make_device("00:11:22:33:44:55", {}, addr_type="public"))
+
+    assert cache.misses == TEST_REPEATS
+    assert len({ios_private.fingerprint, android_random.fingerprint, public.fingerprint}) == TEST_REPEATS
+
+def test_cache_evicts_least_recently_used():
+    cache = FingerprintCache(maxsize=TEST_CACHE_SIZE)
+    apple = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    nordic = make_device("4a:00:00:00:00:02", {MANUFACTURER_DATA_TYPE: TEST_NORDIC_MANU_DATA})
+    services = make_device("4a:00:00:00:00:03", {COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE})
+
+    cache.identify(apple)
+    cache.identify(nordic)
+    cache.identify(apple)  # Apple is now the most recently used
+    cache.identify(services)  # Evicts Nordic
+
+    assert cache.evictions == 1
+    assert len(cache.entries) == TEST_CACHE_SIZE
+    cache.identify(apple)
+    assert cache.hits == TEST_CACHE_SIZE
+    cache.identify(nordic)
+    assert cache.misses == TEST_REPEATS + 1
+
+def test_cache_stats_hit_rate():
+    cache = FingerprintCache()
+    assert cache.get_stats()["hit_rate"] == 0  # No lookups yet
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    cache.identify(device)
+    cache.identify(device)
+    assert cache.get_stats()["hit_rate"] == 0.5  # noqa: PLR2004 (one hit, one miss)
+    cache.clear()
+    assert cache.get_stats()["size"] == 0
+
+def test_compact_fingerprint_is_64_bit_integer():
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    fingerprint = build_compact_fingerprint(device)
+    assert isinstance(fingerprint, int)
+    assert 0 <= fingerprint < 2 ** 64
+    assert len(fingerprint_to_hex(fingerprint)) == TEST_COMPACT_HEX_LENGTH
+
+def test_compact_fingerprint_identifies_like_sha256():
+    apple_1 = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    apple_2 = make_device("4a:00:00:00:00:02", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    nordic = make_device("4a:00:00:00:00:03", {MANUFACTURER_DATA_TYPE: TEST_NORDIC_MANU_DATA})
+
+    assert build_compact_fingerprint(apple_1) == build_compact_fingerprint(apple_2)
+    assert build_compact_fingerprint(apple_1) != build_compact_fingerprint(nordic)
+    assert build_device_fingerprint(apple_1) == build_device_fingerprint(apple_2)
+
+def test_compact_fingerprint_is_keyed():
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    unkeyed = build_compact_fingerprint(device)
+    with patch('app.fingerprint.FINGERPRINT_KEY', b"deployment secret"):
+        assert build_compact_fingerprint(device) != unkeyed
+
+def test_fingerprint_to_hex_keeps_sha256_strings():
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    fingerprint = build_device_fingerprint(device)
+    assert fingerprint_to_hex(fingerprint) == fingerprint
+
+def test_compact_cache_feeds_session_manager():
+    cache = FingerprintCache(compact=True)
+    device = make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})
+    identity = cache.identify(device)
+    assert isinstance(identity.fingerprint, int)
+
+    session_manager = SessionManager()
+    session_manager.update_session(identity.fingerprint, datetime.now(), TEST_RSSI)
+    assert identity.fingerprint in session_manager.sessions
+
+def test_classify_platform_by_manufacturer():
+    assert classify_platform(make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA})) == PLATFORM_IOS
+    assert classify_platform(make_device("4a:00:00:00:00:02", {MANUFACTURER_DATA_TYPE: TEST_MICROSOFT_MANU_DATA})) == PLATFORM_WINDOWS
+    assert classify_platform(make_device("4a:00:00:00:00:03", {MANUFACTURER_DATA_TYPE: TEST_GOOGLE_MANU_DATA})) == PLATFORM_ANDROID
+    assert classify_platform(make_device("4a:00:00:00:00:04", {MANUFACTURER_DATA_TYPE: TEST_NORDIC_MANU_DATA})) == PLATFORM_UNKNOWN
+
+def test_classify_platform_by_service():
+    assert classify_platform(make_device("4a:00:00:00:00:01", {COMPLETE_16B_SERVICES: TEST_BATTERY_SERVICE + TEST_APPLE_SERVICE})) == PLATFORM_IOS
+    assert classify_platform(make_device("4a:00:00:00:00:02", {COMPLETE_16B_SERVICES: TEST_FAST_PAIR_SERVICE})) == PLATFORM_ANDROID
+    assert classify_platform(make_device("4a:00:00:00:00:03", {COMPLETE_16B_SERVICES: TEST_BATTERY_SERVICE})) == PLATFORM_UNKNOWN
+
+def test_classify_platform_prefers_manufacturer():
+    device = make_device("4a:00:00:00:00:01", {
+        MANUFACTURER_DATA_TYPE: TEST_GOOGLE_MANU_DATA, COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE
+    })
+    assert classify_platform(device) == PLATFORM_ANDROID
+    assert not is_ios_device(device)
+
+def test_apple_service_match_does_not_span_uuid_boundaries():
+    # 0x12FD and 0x6F34 read as "12fd6f34" in hex, which contains "FD6F"
+    device = make_device("4a:00:00:00:00:01", {COMPLETE_16B_SERVICES: b"\xfd\x12\x34\x6f"})
+    assert not is_ios_device(device)
+
+def make_window():
+    return [
+        make_device("4a:00:00:00:00:01", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}),
+        make_device("4a:00:00:00:00:02", {MANUFACTURER_DATA_TYPE: TEST_NORDIC_MANU_DATA}),
+        make_device("4a:00:00:00:00:03", {COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE}),
+        make_device("4a:00:00:00:00:04", {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}),
+        make_device("42:00:00:00:00:05", {}),
+    ]
+
+def test_build_device_fingerprints_keeps_order():
+    devices = make_window()
+    fingerprints, ios_flags, manufacturers = build_device_fingerprints(devices)
+
+    assert fingerprints == [build_device_fingerprint(device) for device in devices]
+    assert ios_flags == [True, False, True, True, False]
+    assert [manufacturer_name(key) for key in manufacturers] == ["Apple, Inc.", "Nordic Semiconductor ASA", "Unknown", "Apple, Inc.", "Unknown"]
+
+def test_build_device_fingerprints_shards_large_batches():
+    devices = make_window()
+    with ThreadPoolExecutor(TEST_SHARDS) as executor:
+        sharded = build_device_fingerprints(devices, executor=executor, pool_threshold=1, shards=TEST_SHARDS)
+    assert sharded == build_device_fingerprints(devices)
+
+def test_build_device_fingerprints_skips_pool_for_small_batches():
+    executor = MagicMock()
+    build_device_fingerprints(make_window(), executor=executor, pool_threshold=TEST_CACHE_SIZE * 10)
+    executor.map.assert_not_called()
+
+def test_build_device_fingerprints_in_process_pool():
+    devices = make_window()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(TEST_SHARDS, mp_context=context) as executor:
+        pooled = build_device_fingerprints(devices, compact=True, executor=executor, pool_threshold=1, shards=TEST_SHARDS)
+    assert pooled == build_device_fingerprints(devices, compact=True)
+
+@pytest.mark.asyncio
+async def test_build_device_fingerprints_async_matches_sync():
+    devices = make_window()
+    with ThreadPoolExecutor(TEST_SHARDS) as executor:
+        pooled = await build_device_fingerprints_async(devices, executor=executor, pool_threshold=1, shards=TEST_SHARDS)
+    assert pooled == build_device_fingerprints(devices)
+
+@pytest.mark.asyncio
+async def test_build_device_fingerprints_async_does_not_block_event_loop():
+    """The shards only finish once the event loop has run a callback, which it cannot do while blocked on them."""
+    devices = make_window()
+    identify_payloads = fingerprint._identify_payloads
+    released = threading.Event()
+
+    def identify_when_released(payloads, compact):
+        assert released.wait(TEST_TIMEOUT_SECONDS)
+        return identify_payloads(payloads, compact)
+
+    with ThreadPoolExecutor(TEST_SHARDS) as executor, \
+         patch('app.fingerprint._identify_payloads', identify_when_released):
+        asyncio.get_running_loop().call_soon(released.set)
+        pooled = await build_device_fingerprints_async(devices, executor=executor, pool_threshold=1, shards=TEST_SHARDS)
+    assert pooled == build_device_fingerprints(devices)
+
+@pytest.mark.asyncio
+async def test_cache_identify_many_matches_identify():
+    devices = make_window()
+    cache = FingerprintCache()
+    fingerprints, ios_flags, manufacturers = await cache.identify_many(devices)
+
+    # The repeated Apple payload is identified once
+    assert cache.misses == len(devices)
+    assert len(cache.entries) == len(devices) - 1
+    assert fingerprints[0] == fingerprints[3]
+
+    expected = [identify_device(device) for device in devices]
+    assert fingerprints == [identity.fingerprint for identity in expected]
+    assert ios_flags == [identity.is_ios for identity in expected]
+    assert manufacturers == [identity.manufacturer for identity in expected]
+
+    # A second window is answered entirely from the cache
+    with patch('app.fingerprint.build_device_fingerprints_async') as mock_build:
+        assert await cache.identify_many(devices) == (fingerprints, ios_flags, manufacturers)
+        mock_build.assert_not_called()
+    assert cache.hits == len(devices)
+
+@pytest.mark.asyncio
+async def test_cache_without_workers_has_no_pool():
+    cache = FingerprintCache(workers=0)
+    with patch('app.fingerprint.FINGERPRINT_POOL_THRESHOLD', 1):
+        await cache.identify_many(make_window())
+    assert cache.executor is None
+    cache.close()
@@ -1,47 +1,57 @@
 import asyncio
 import hashlib
-import subprocess
+import sys
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
-from app.core.constants import MAX_TIME_SERIES_MINUTES
-from app.main import (
+from app.bluetooth import ADAPTER_FAILED, AdapterManager
+from app.core.constants import (
     COMPLETE_16B_SERVICES,
-    INCOMPLETE_16B_SERVICES,
     MANUFACTURER_DATA_TYPE,
+    MAX_TIME_SERIES_MINUTES,
+    SCAN_PROCESS_TIMEOUT_SECONDS,
+)
+from app.fingerprint import build_device_fingerprint, is_ios_device
+from app.main import (
     SCAN_DURATION_SECONDS,
     BackgroundScanner,
-    ScanDelegate,
     app,
     background_scan,
-    build_device_fingerprint,
+    build_time_series,
     calculate_metrics,
-    check_system_requirements,
-    get_time_series,
-    is_ios_device,
+    columnar_history_class,
+    record_scan_window,
+    restore_sessions,
+    scan_adapter,
     scan_history,
-    setup_bluetooth,
+    session_events,
+    session_manager,
+    shutdown_event,
+    stream_session_events,
 )
+from app.manufacturers import intern_manufacturer_stats
 from app.persistence import ScanResult
+from app.scanner import ScanBatch, next_window_end
 
 # Test constants
 TEST_INTERVAL_MINUTES = 60
 TEST_RESULTS_COUNT = 3
 TEST_MAC_ADDRESS = "00:11:22:33:44:55"
 TEST_RSSI = -50
+TEST_WEAK_RSSI = -80
+TEST_MAX_LOOP_ITERATIONS = 100
+TEST_WINDOW_COUNT = 2
 TEST_SCAN_DURATION = SCAN_DURATION_SECONDS
-TEST_APPLE_MANU_DATA = "4c000000000000000000000000000000"
-TEST_APPLE_SERVICE = "0xFD6F"
-TEST_OTHER_SERVICE = "1234"
-TEST_SETUP_BLUETOOTH_COMMANDS = 4
+TEST_APPLE_MANU_DATA = bytes.fromhex("4c000000000000000000000000000000")
+TEST_APPLE_SERVICE = b"\x6f\xfd"  # 0xFD6F, little-endian
 SHA256_LENGTH = 64
-TEST_APPLE_COMPANY_ID = "4c00"
-TEST_APPLE_SERVICE_UUID = "FD6F"  # Valid Apple Continuity UUID
-TEST_NON_APPLE_SERVICE_UUID = "fe0d"
+TEST_APPLE_COMPANY_ID = b"\x4c\x00"
+TEST_APPLE_SERVICE_UUID = b"\x6f\xfd"  # Valid Apple Continuity UUID
+TEST_NON_APPLE_SERVICE_UUID = b"\x0d\xfe"
 TEST_MANUFACTURER_DATA_TYPE = 255
 
 # MAC randomization test constants
@@ -49,8 +59,8 @@ IOS_PRIVATE_ADDR_1 = "40:00:11:22:33:44"
 IOS_PRIVATE_ADDR_2 = "40:00:55:66:77:88"
 ANDROID_RANDOM_ADDR_1 = "42:11:22:33:44:55"
 ANDROID_RANDOM_ADDR_2 = "42:aa:bb:cc:dd:ee"
-TEST_IOS_MANU_DATA = "4c0012345678"  # Full Apple manufacturer data
-TEST_ANDROID_MANU_DATA = "005912345678"  # Nordic Semiconductor manufacturer data
+TEST_IOS_MANU_DATA = bytes.fromhex("4c0012345678")  # Full Apple manufacturer data
+TEST_ANDROID_MANU_DATA = bytes.fromhex("590012345678")  # Nordic Semiconductor manufacturer data
 
 client = TestClient(app)
 
@@ -58,15 +68,18 @@ client = TestClient(app)
 HTTP_OK = 200
 HTTP_ERROR = 500
 HTTP_BAD_REQUEST = 400
+HTTP_NOT_MODIFIED = 304
 
 def test_health_check():
-    with patch('app.main.check_system_requirements') as mock_check:
+    with patch('app.main.AdapterProbe.check') as mock_check:
         mock_check.return_value = (True, "System requirements met")
         response = client.get("/health")
         assert response.status_code == HTTP_OK
         data = response.json()
         assert data["status"] == "healthy"
         assert data["message"] == "System requirements met"
+        assert data["adapters"][0]["adapter"] == "hci0"
+        assert "hit_rate" in data["fingerprint_cache"]
 
 @pytest.fixture
 def mock_device():
@@ -74,14 +87,12 @@ def mock_device():
     device.addr = TEST_MAC_ADDRESS
     device.addrType = "random"
     device.rssi = TEST_RSSI
-    device.getValue = MagicMock(return_value=None)
-    device.getValueText = MagicMock(return_value='')
+    device.scanData = {}
     return device
 
 @pytest.fixture
 def mock_complete_device(mock_device):
-    mock_device.getValue = MagicMock(return_value=b'4c00')
-    mock_device.getValueText = MagicMock(return_value=TEST_APPLE_MANU_DATA)
+    mock_device.scanData = {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}
     return mock_device
 
 @pytest.mark.asyncio
@@ -92,55 +103,19 @@ async def test_latest_endpoint():
     mock_device.addrType = "random"
     mock_device.rssi = TEST_RSSI
 
-    # Configure mock device's getValue and getValueText behavior
-    def mock_get_value(x):
-        if x == MANUFACTURER_DATA_TYPE:
-            return b'4c00'
-        if x in [INCOMPLETE_16B_SERVICES, COMPLETE_16B_SERVICES]:
-            return b'0xFD6F'
-        return None
-
-    def mock_get_value_text(x):
-        if x == MANUFACTURER_DATA_TYPE:
-            return TEST_APPLE_MANU_DATA
-        if x in [INCOMPLETE_16B_SERVICES, COMPLETE_16B_SERVICES]:
-            return TEST_APPLE_SERVICE
-        return ''
-
-    mock_device.getValue = MagicMock(side_effect=mock_get_value)
-    mock_device.getValueText = MagicMock(side_effect=mock_get_value_text)
-
-    # Mock Scanner class and BTLEManagementError
-    with patch('app.main.Scanner') as mock_scanner_class, \
-         patch('app.main.check_system_requirements') as mock_check, \
-         patch('subprocess.run') as mock_run, \
+    # Configure the mock device's advertising data
+    mock_device.scanData = {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA, COMPLETE_16B_SERVICES: TEST_APPLE_SERVICE}
+
+    # Mock system checks, manufacturer lookup and scan history
+    with patch('app.main.AdapterProbe.check') as mock_check, \
          patch('app.manufacturers.lookup_manufacturer') as mock_lookup, \
          patch('app.main.scan_history') as mock_history:
 
-        # Configure scanner mock
-        scanner_instance = MagicMock()
-        scanner_instance.scan = MagicMock(return_value=[mock_device])
-        scanner_instance.withDelegate = MagicMock(return_value=scanner_instance)
-        mock_scanner_class.return_value = scanner_instance
-
         # Mock system requirements check
         mock_check.return_value = (True, "System requirements met")
 
         # Mock manufacturer lookup
-        mock_lookup.return_value = "Apple Inc."
-
-        # Mock subprocess calls
-        def mock_run_cmd(*args, **kwargs):
-            result = MagicMock()
-            result.returncode = 0
-            if 'bluetoothctl --version' in args[0]:
-                result.stdout = "bluetoothctl version 5.66"
-            elif 'bluetoothctl show' in args[0]:
-                result.stdout = f"Controller {TEST_MAC_ADDRESS}\nPowered: yes\nDiscoverable: no\nPairable: yes"
-            elif 'hciconfig' in args[0]:
-                result.stdout = ""
-            return result
-        mock_run.side_effect = mock_run_cmd
+        mock_lookup.return_value = "Apple, Inc."
 
         # Mock scan history
         mock_history.__getitem__.return_value = ScanResult(
@@ -148,7 +123,7 @@ async def test_latest_endpoint():
             unique_devices=1,
             ios_devices=1,
             other_devices=0,
-            manufacturer_stats={"Apple Inc.": 1}
+            manufacturer_stats=intern_manufacturer_stats({"Apple, Inc.": 1})
         )
         mock_history.__len__.return_value = 1
 
@@ -166,7 +141,7 @@ async def test_latest_endpoint():
         assert current["unique_devices"] == 1
         assert current["ios_devices"] == 1
         assert current["other_devices"] == 0
-        assert "Apple Inc." in current["manufacturer_stats"]
+        assert "Apple, Inc." in current["manufacturer_stats"]
         assert current["scan_duration_seconds"] == TEST_SCAN_DURATION
 
 @pytest.mark.asyncio
@@ -179,59 +154,6 @@ async def test_latest_endpoint_error():
         assert response.status_code == HTTP_ERROR
         assert response.json() == {"detail": "Error getting scan results: Failed to get latest scan"}
 
-def test_check_system_requirements_success():
-    """Test successful system requirements check."""
-    with patch('subprocess.run') as mock_run:
-        # Mock successful bluetoothctl version check
-        mock_version = MagicMock()
-        mock_version.returncode = 0
-        mock_version.stdout = "bluetoothctl version 5.66"
-
-        # Mock successful bluetoothctl show check
-        mock_show = MagicMock()
-        mock_show.returncode = 0
-        mock_show.stdout = f"Controller {TEST_MAC_ADDRESS}\nPowered: yes\nDiscoverable: no\nPairable: yes"
-
-        # Configure mock_run to return different results based on command
-        def mock_run_cmd(*args, **kwargs):
-            if not isinstance(args[0], list):
-                return MagicMock(returncode=1)
-
-            cmd = args[0][0]
-            if cmd == 'bluetoothctl':
-                if args[0][1] == '--version':
-                    return mock_version
-                elif args[0][1] == 'show':
-                    return mock_show
-            return MagicMock(returncode=1)
-        mock_run.side_effect = mock_run_cmd
-
-        success, message = check_system_requirements()
-        assert success is True
-        assert "System requirements met" in message
-
-def test_check_system_requirements_bluez_missing():
-    with patch('subprocess.run') as mock_run:
-        mock_run.side_effect = FileNotFoundError()
-        success, message = check_system_requirements()
-        assert success is False
-        assert "BlueZ is not installed" in message
-
-def test_check_system_requirements_bluetooth_off():
-    with patch('subprocess.run') as mock_run:
-        def mock_run_cmd(*args, **kwargs):
-            result = MagicMock()
-            result.returncode = 0
-            if 'bluetoothctl --version' in args[0]:
-                result.stdout = "bluetoothctl version 5.66"
-            elif 'bluetoothctl show' in args[0]:
-                result.stdout = f"Controller {TEST_MAC_ADDRESS}\nPowered: no\nDiscoverable: no\nPairable: yes"
-            return result
-        mock_run.side_effect = mock_run_cmd
-        success, message = check_system_requirements()
-        assert success is False
-        assert "Bluetooth is not powered on" in message
-
 def test_time_series_endpoint():
     response = client.get(f"/time-series?interval_minutes={TEST_INTERVAL_MINUTES}")
     assert response.status_code == HTTP_OK
@@ -269,7 +191,7 @@ def test_calculate_metrics():
             unique_devices=i+3,
             ios_devices=i+2,
             other_devices=i+1,
-            manufacturer_stats={"Apple": i+2, "Nordic": i+1}
+            manufacturer_stats=intern_manufacturer_stats({"Apple": i+2, "Nordic": i+1})
         )
         for i in range(TEST_RESULTS_COUNT)
     ]
@@ -289,22 +211,21 @@ def test_calculate_metrics():
     assert "peak_unique_devices" in metrics
     assert "peak_ios_devices" in metrics
     assert "peak_other_devices" in metrics
-    assert "manufacturer_stats" in metrics
+    # Manufacturer keys are resolved to names for the API
+    assert set(metrics["manufacturer_stats"]) == {"Apple", "Nordic"}
 
 @pytest.fixture
 def mock_apple_device():
     device = MagicMock()
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'4c00' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_APPLE_COMPANY_ID if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_APPLE_COMPANY_ID}
     return device
 
 @pytest.fixture
 def mock_apple_service_device():
     device = MagicMock()
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'fd6f' if x in [2, 3] else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_APPLE_SERVICE_UUID if x in [2, 3] else '')
+    device.scanData = {COMPLETE_16B_SERVICES: TEST_NON_APPLE_SERVICE_UUID + TEST_APPLE_SERVICE_UUID}
     return device
 
 def test_is_ios_device_by_manufacturer(mock_apple_device):
@@ -322,9 +243,8 @@ def test_build_device_fingerprint_complete(mock_complete_device):
     assert len(fingerprint) == SHA256_LENGTH
 
 def test_build_device_fingerprint_minimal(mock_device):
-    # Configure mock device to return empty strings for services
-    mock_device.getValue = MagicMock(return_value=None)
-    mock_device.getValueText = MagicMock(return_value='')
+    # Configure mock device without any advertising data
+    mock_device.scanData = {}
     fingerprint = build_device_fingerprint(mock_device)
     assert isinstance(fingerprint, str)
     assert len(fingerprint) == SHA256_LENGTH
@@ -342,10 +262,6 @@ def test_calculate_metrics_empty():
     assert isinstance(metrics["manufacturer_stats"], dict)
     assert len(metrics["manufacturer_stats"]) == 0
 
-def test_scan_delegate():
-    delegate = ScanDelegate()
-    assert delegate is not None
-
 @pytest.mark.asyncio
 async def test_background_scanner():
     scanner = BackgroundScanner()
@@ -367,6 +283,7 @@ async def test_background_scanner_double_start():
     task1 = scanner.task
     await scanner.start()
     assert scanner.task is task1  # Should not create a new task
+    await scanner.stop()
 
 @pytest.mark.asyncio
 async def test_background_scanner_double_stop():
@@ -376,64 +293,149 @@ async def test_background_scanner_double_stop():
     await scanner.stop()  # Should not raise an error
     assert scanner.task is None
 
-def test_setup_bluetooth_success():
-    with patch('subprocess.run') as mock_run:
-        mock_run.return_value.returncode = 0
-        setup_bluetooth()  # Should not raise an exception
-        assert mock_run.call_count == TEST_SETUP_BLUETOOTH_COMMANDS
-
-def test_setup_bluetooth_failure():
-    with patch('subprocess.run') as mock_run:
-        mock_run.side_effect = subprocess.CalledProcessError(1, 'hciconfig')
-        with pytest.raises(HTTPException) as exc_info:
-            setup_bluetooth()
-        assert exc_info.value.status_code == HTTP_ERROR
-        assert "Failed to set up Bluetooth adapter" in str(exc_info.value.detail)
+def test_health_check_failure():
+    with patch('app.main.AdapterProbe.check') as mock_check:
+        mock_check.return_value = (False, "Bluetooth is not powered on")
+        response = client.get("/health")
+        assert response.status_code == HTTP_ERROR
+        assert response.json() == {"detail": "hci0: Bluetooth is not powered on"}
 
 @pytest.mark.asyncio
-async def test_background_scan_system_requirements_not_met():
-    with patch('app.main.check_system_requirements') as mock_check:
+async def test_scan_adapter_system_requirements_not_met():
+    with patch('app.main.AdapterProbe.check') as mock_check:
         mock_check.return_value = (False, "Test error")
         with patch('asyncio.sleep') as mock_sleep:
             mock_sleep.side_effect = asyncio.CancelledError  # Stop the loop
             with pytest.raises(asyncio.CancelledError):
-                await background_scan()
+                await scan_adapter("hci0", asyncio.Queue())
 
 @pytest.mark.asyncio
-async def test_background_scan_success():
-    with patch('app.main.check_system_requirements') as mock_check, \
-         patch('app.main.setup_bluetooth') as mock_setup, \
-         patch('bluepy.btle.Scanner') as mock_scanner_class, \
+async def test_scan_adapter_success():
+    queue: asyncio.Queue = asyncio.Queue()
+    with patch('app.main.AdapterProbe.check') as mock_check, \
+         patch('app.bluetooth.setup_bluetooth', new_callable=AsyncMock) as mock_setup, \
+         patch.dict('app.main.adapter_managers', {"hci0": AdapterManager("hci0")}) as mock_adapter_managers, \
+         patch('app.main.ContinuousScanner') as mock_scanner_class, \
          patch('app.main.logger') as mock_logger:  # Mock logger to avoid permission error messages
 
         # Mock successful system check
         mock_check.return_value = (True, "OK")
 
-        # Mock scanner
-        mock_scanner = MagicMock()
-        mock_scanner.scan.return_value = []
-        mock_scanner_class.return_value.withDelegate.return_value = mock_scanner
+        # Mock continuous scanner whose second listen fails
+        mock_scanner = mock_scanner_class.return_value
+        mock_scanner.name = "hci0"
+        mock_scanner.finished = False
+        mock_scanner.read.side_effect = [ScanBatch(datetime.now(), [], "hci0"), RuntimeError("Scanner failed")]
 
-        # Run scan and cancel after first iteration
+        # The failure is reported back to the loop, which then waits before retrying
         with patch('asyncio.sleep') as mock_sleep:
             mock_sleep.side_effect = asyncio.CancelledError
             with pytest.raises(asyncio.CancelledError):
-                await background_scan()
+                await scan_adapter("hci0", queue)
 
         # Verify calls
         mock_check.assert_called_once()
-        mock_setup.assert_called_once()
-        mock_logger.info.assert_called_with("Starting background BLE scan")
+        mock_setup.assert_called_once_with("hci0")
+        mock_scanner_class.assert_called_once_with("hci0")
+        mock_scanner.start.assert_called_once()
+        mock_scanner.stop.assert_called_once()
+        mock_logger.info.assert_called_with("Starting background BLE scan on hci0")
+        mock_logger.error.assert_called_with("Error during background scan on hci0: Scanner failed")
+
+        # The batch scanned before the failure was handed to the queue
+        batch = queue.get_nowait()
+        assert batch.source == "hci0"
+
+        # The failure is recorded so the adapter is re-initialised after a backoff
+        adapter_manager = mock_adapter_managers["hci0"]
+        assert adapter_manager.resets == 1
+        assert adapter_manager.state == ADAPTER_FAILED
+
+@pytest.mark.asyncio
+async def test_background_scan_records_completed_window(mock_ios_device):
+    scan_history.clear()
+    mock_ios_device.rssi = TEST_RSSI
+
+    async def fake_scan_adapter(adapter, queue):
+        await queue.put(ScanBatch(datetime.now(), [mock_ios_device], adapter))
+
+    with patch('app.main.scan_adapter', side_effect=fake_scan_adapter), \
+         patch('app.main.ScanWindow.is_complete', return_value=True), \
+         patch('app.main.persistence') as mock_persistence:
+        mock_persistence.should_save.return_value = False
+
+        task = asyncio.create_task(background_scan())
+        for _ in range(TEST_MAX_LOOP_ITERATIONS):
+            if scan_history:
+                break
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert len(scan_history) == 1
+    assert scan_history[-1].unique_devices == 1
+    assert scan_history[-1].ios_devices == 1
+
+@pytest.mark.asyncio
+async def test_background_scan_records_windows_at_their_end(mock_ios_device):
+    scan_history.clear()
+    session_manager.clear()
+    mock_ios_device.rssi = TEST_RSSI
+    start = datetime.now()
+    first_end = next_window_end(start)
+    second_end = next_window_end(first_end)
+    late = timedelta(seconds=SCAN_PROCESS_TIMEOUT_SECONDS)
+
+    async def fake_scan_adapter(adapter, queue):
+        # Batches arrive up to one process() call after each window boundary
+        await queue.put(ScanBatch(first_end + late, [mock_ios_device], adapter))
+        await queue.put(ScanBatch(second_end + late, [], adapter))
+
+    with patch('app.main.scan_adapter', side_effect=fake_scan_adapter), \
+         patch('app.main.datetime', wraps=datetime) as mock_datetime, \
+         patch('app.main.persistence') as mock_persistence:
+        mock_datetime.now.return_value = start
+        mock_persistence.should_save.return_value = False
+
+        task = asyncio.create_task(background_scan())
+        for _ in range(TEST_MAX_LOOP_ITERATIONS):
+            if len(scan_history) == TEST_WINDOW_COUNT:
+                break
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert [result.timestamp for result in scan_history] == [first_end, second_end]
+    # The device missed the whole second window, so its session is no longer active
+    assert not any(session.is_active for session in session_manager.sessions.values())
+
+@pytest.mark.asyncio
+async def test_record_scan_window_deduplicates_by_fingerprint(mock_ios_device, mock_ios_device_different_mac):
+    """A device seen under two addresses (or by two adapters) is counted once with its strongest signal."""
+    scan_history.clear()
+    session_manager.clear()
+    mock_ios_device.rssi = TEST_WEAK_RSSI
+    mock_ios_device_different_mac.rssi = TEST_RSSI
+
+    result = await record_scan_window([mock_ios_device, mock_ios_device_different_mac], datetime.now())
+
+    assert result.unique_devices == 1
+    assert result.ios_devices == 1
+    assert sum(result.manufacturer_stats.values()) == 1
+    fingerprint = build_device_fingerprint(mock_ios_device)
+    assert session_manager.sessions[fingerprint].rssi_samples == [TEST_RSSI]
 
 @pytest.mark.asyncio
 async def test_get_time_series_invalid_interval():
     with pytest.raises(HTTPException) as exc_info:
-        await get_time_series(interval_minutes=0)
+        build_time_series(interval_minutes=0)
     assert exc_info.value.status_code == HTTP_BAD_REQUEST
     assert "must be between 1 and 1440" in str(exc_info.value.detail)
 
     with pytest.raises(HTTPException) as exc_info:
-        await get_time_series(interval_minutes=1441)  # More than 24 hours
+        build_time_series(interval_minutes=1441)  # More than 24 hours
     assert exc_info.value.status_code == HTTP_BAD_REQUEST
     assert "must be between 1 and 1440" in str(exc_info.value.detail)
 
@@ -450,11 +452,11 @@ async def test_get_time_series_success():
             unique_devices=i,
             ios_devices=i//2,
             other_devices=i//2,
-            manufacturer_stats={"Test": i}
+            manufacturer_stats=intern_manufacturer_stats({"Test": i})
         ))
 
     # Test with 30-minute interval
-    result = await get_time_series(interval_minutes=30)
+    result = build_time_series(interval_minutes=30)
     assert "summary" in result
     assert "time_series" in result
     assert len(result["time_series"]) > 0
@@ -466,8 +468,7 @@ def mock_ios_device():
     device = MagicMock()
     device.addr = IOS_PRIVATE_ADDR_1
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'4c0012345678' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_IOS_MANU_DATA if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_IOS_MANU_DATA}
     return device
 
 @pytest.fixture
@@ -476,8 +477,7 @@ def mock_ios_device_different_mac():
     device = MagicMock()
     device.addr = IOS_PRIVATE_ADDR_2
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'4c0012345678' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_IOS_MANU_DATA if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_IOS_MANU_DATA}
     return device
 
 @pytest.fixture
@@ -486,8 +486,7 @@ def mock_android_device():
     device = MagicMock()
     device.addr = ANDROID_RANDOM_ADDR_1
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'005912345678' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_ANDROID_MANU_DATA if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_ANDROID_MANU_DATA}
     return device
 
 @pytest.fixture
@@ -496,8 +495,7 @@ def mock_android_device_different_mac():
     device = MagicMock()
     device.addr = ANDROID_RANDOM_ADDR_2
     device.addrType = "random"
-    device.getValue = MagicMock(side_effect=lambda x: b'005912345678' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_ANDROID_MANU_DATA if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_ANDROID_MANU_DATA}
     return device
 
 def test_ios_mac_randomization(mock_ios_device, mock_ios_device_different_mac):
@@ -525,8 +523,7 @@ def test_ios_device_without_manufacturer_data():
     device = MagicMock()
     device.addr = IOS_PRIVATE_ADDR_1
     device.addrType = "random"
-    device.getValue = MagicMock(return_value=None)
-    device.getValueText = MagicMock(return_value='')
+    device.scanData = {}
 
     # Get the fingerprint components before hashing
     fingerprint_components = []
@@ -546,8 +543,7 @@ def test_android_device_without_manufacturer_data():
     device = MagicMock()
     device.addr = ANDROID_RANDOM_ADDR_1
     device.addrType = "random"
-    device.getValue = MagicMock(return_value=None)
-    device.getValueText = MagicMock(return_value='')
+    device.scanData = {}
 
     # Get the fingerprint components before hashing
     fingerprint_components = []
@@ -567,16 +563,147 @@ def test_different_ios_devices():
     device1 = MagicMock()
     device1.addr = IOS_PRIVATE_ADDR_1
     device1.addrType = "random"
-    device1.getValue = MagicMock(side_effect=lambda x: b'4c0012345678' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device1.getValueText = MagicMock(side_effect=lambda x: "4c0012345678" if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device1.scanData = {TEST_MANUFACTURER_DATA_TYPE: TEST_IOS_MANU_DATA}
 
     device2 = MagicMock()
     device2.addr = IOS_PRIVATE_ADDR_2
     device2.addrType = "random"
-    device2.getValue = MagicMock(side_effect=lambda x: b'4c0098765432' if x == TEST_MANUFACTURER_DATA_TYPE else None)
-    device2.getValueText = MagicMock(side_effect=lambda x: "4c0098765432" if x == TEST_MANUFACTURER_DATA_TYPE else '')
+    device2.scanData = {TEST_MANUFACTURER_DATA_TYPE: bytes.fromhex("4c0098765432")}
 
     fingerprint1 = build_device_fingerprint(device1)
     fingerprint2 = build_device_fingerprint(device2)
 
-    assert fingerprint1 != fingerprint2  # Different manufacturer data = different devices
\ No newline at end of file
+    assert fingerprint1 != fingerprint2  # Different manufacturer data = different devices
+
+@pytest.mark.asyncio
+async def test_shutdown_saves_sessions_for_next_start(mock_ios_device):
+    session_manager.clear()
+    mock_ios_device.rssi = TEST_RSSI
+    await record_scan_window([mock_ios_device], datetime.now())
+    fingerprint = build_device_fingerprint(mock_ios_device)
+
+    with patch('app.main.persistence') as mock_persistence, \
+         patch('app.main.scanner', AsyncMock()):
+        await shutdown_event()
+        snapshot = mock_persistence.save_sessions.call_args.args[0]
+
+        session_manager.clear()
+        mock_persistence.load_sessions.return_value = snapshot
+        restore_sessions()
+
+    assert session_manager.sessions[fingerprint].rssi_samples == [TEST_RSSI]
+
+@pytest.mark.asyncio
+async def test_closed_sessions_feed_dwell_sketch(mock_ios_device):
+    session_manager.clear()
+    scan_history.clear()
+    mock_ios_device.rssi = TEST_RSSI
+    start = datetime.now()
+    await record_scan_window([mock_ios_device], start)
+    await record_scan_window([mock_ios_device], start + timedelta(minutes=2))
+
+    # The device leaves and its session times out
+    await record_scan_window([], start + timedelta(minutes=10))
+
+    sketch = scan_history[-1].dwell_sketch
+    assert sketch.count == 1
+    assert sketch.quantile(0.5) == pytest.approx(timedelta(minutes=2).total_seconds(), rel=0.01)
+    assert calculate_metrics(timedelta(hours=1))["dwell_time_percentiles"] == sketch.percentiles()
+
+@pytest.mark.asyncio
+async def test_session_events_stream(mock_ios_device):
+    session_manager.clear()
+    mock_ios_device.rssi = TEST_RSSI
+    response = await stream_session_events()
+    assert response.media_type == "text/event-stream"
+    assert not session_events.subscribers  # Until the response starts streaming
+
+    first_event = asyncio.create_task(anext(response.body_iterator))
+    await asyncio.sleep(0)
+    assert len(session_events.subscribers) == 1
+
+    await record_scan_window([mock_ios_device], datetime.now())
+    opened = await first_event
+    updated = await anext(response.body_iterator)
+    await response.body_iterator.aclose()
+
+    fingerprint = build_device_fingerprint(mock_ios_device)
+    assert opened.startswith("event: open\n")
+    assert fingerprint in opened
+    assert updated.startswith("event: update\n")
+    assert fingerprint in updated
+    assert not session_events.subscribers
+
+def test_latest_response_is_cached_until_next_scan():
+    scan_history.clear()
+    scan_history.append(ScanResult(
+        timestamp=datetime.now(),
+        unique_devices=1,
+        ios_devices=1,
+        other_devices=0,
+        manufacturer_stats=intern_manufacturer_stats({"Apple, Inc.": 1})
+    ))
+
+    first = client.get("/latest")
+    etag = first.headers["etag"]
+    assert client.get("/latest").content == first.content
+
+    not_modified = client.get("/latest", headers={"If-None-Match": etag})
+    assert not_modified.status_code == HTTP_NOT_MODIFIED
+    assert not not_modified.content
+
+    # A new scan result changes the response
+    scan_history.append(ScanResult(
+        timestamp=datetime.now(),
+        unique_devices=2,
+        ios_devices=1,
+        other_devices=1,
+        manufacturer_stats=intern_manufacturer_stats({"Apple, Inc.": 2})
+    ))
+    changed = client.get("/latest", headers={"If-None-Match": etag})
+    assert changed.status_code == HTTP_OK
+    assert changed.headers["etag"] != etag
+    assert changed.json()["current_scan"]["unique_devices"] == 2  # noqa: PLR2004 (the second result)
+
+def test_cached_responses_age_without_scans():
+    """If scanning stalls, the last hour window still moves on and old results drop out of it."""
+    scan_history.clear()
+    scan_time = datetime.now()
+    scan_history.append(ScanResult(
+        timestamp=scan_time,
+        unique_devices=1,
+        ios_devices=1,
+        other_devices=0,
+        manufacturer_stats=intern_manufacturer_stats({"Apple, Inc.": 1})
+    ))
+    first = client.get("/latest")
+    assert first.json()["last_hour"]["average_unique_devices"] == 1
+
+    class LaterDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return scan_time + timedelta(hours=2)
+
+    with patch('app.main.datetime', LaterDatetime):
+        later = client.get("/latest", headers={"If-None-Match": first.headers["etag"]})
+    assert later.status_code == HTTP_OK
+    assert later.json()["last_hour"]["average_unique_devices"] == 0
+
+def test_time_series_responses_are_cached_per_interval():
+    scan_history.clear()
+    hourly = client.get(f"/time-series?interval_minutes={TEST_INTERVAL_MINUTES}")
+    half_hourly = client.get(f"/time-series?interval_minutes={TEST_INTERVAL_MINUTES // 2}")
+    assert hourly.headers["etag"] != half_hourly.headers["etag"]
+    assert hourly.json()["interval_minutes"] == TEST_INTERVAL_MINUTES
+
+    response = client.get(
+        f"/time-series?interval_minutes={TEST_INTERVAL_MINUTES}",
+        headers={"If-None-Match": hourly.headers["etag"]}
+    )
+    assert response.status_code == HTTP_NOT_MODIFIED
+
+def test_columnar_history_without_numpy_fails_with_a_clear_error():
+    with patch.dict(sys.modules, {"numpy": None}):
+        sys.modules.pop("app.columnar", None)
+        with pytest.raises(RuntimeError, match="HISTORY_STORE=columnar needs NumPy"):
+            columnar_history_class()
@@ -1,90 +1,156 @@
+import gzip
 from unittest.mock import MagicMock
 
 import pytest
 
-from app.main import MANUFACTURER_DATA_TYPE
+from app.core.constants import MANUFACTURER_DATA_TYPE
 from app.manufacturers import (
     MANUFACTURER_DB,
+    UNKNOWN_MANUFACTURER_KEY,
+    CompanyTable,
     get_manufacturer_from_device,
+    get_manufacturer_key_from_device,
+    intern_manufacturer,
+    intern_manufacturer_stats,
     lookup_manufacturer,
+    manufacturer_name,
+    resolve_manufacturer_stats,
 )
 
 # Test constants
-TEST_APPLE_MANU_DATA = "4c00"
-TEST_NORDIC_MANU_DATA = "0059"
-TEST_UNKNOWN_MANU_DATA = "ffff"
+TEST_APPLE_MANU_DATA = b"\x4c\x00"
+TEST_NORDIC_MANU_DATA = b"\x59\x00"
+TEST_UNKNOWN_MANU_DATA = b"\xfe\xff"
 TEST_APPLE_ID = 0x004C
 TEST_NORDIC_ID = 0x0059
-TEST_GOOGLE_ID = 0x0029
-TEST_UNKNOWN_ID = 0xFFFF
+TEST_GOOGLE_ID = 0x00E0
+TEST_HITACHI_ID = 0x0029
+TEST_UNKNOWN_ID = 0xFFFE
+TEST_REGISTRY_MIN_SIZE = 3000
+TEST_INTERNED_ENTRIES = 3
 
 @pytest.fixture
 def mock_device():
     device = MagicMock()
-    device.getValue = MagicMock(side_effect=lambda x: b'4c00' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_APPLE_MANU_DATA if x == MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {MANUFACTURER_DATA_TYPE: TEST_APPLE_MANU_DATA}
     return device
 
 def test_lookup_manufacturer_known():
-    assert lookup_manufacturer(TEST_APPLE_ID) == "Apple Inc."
+    assert lookup_manufacturer(TEST_APPLE_ID) == "Apple, Inc."
     assert lookup_manufacturer(TEST_NORDIC_ID) == "Nordic Semiconductor ASA"
-    assert lookup_manufacturer(TEST_GOOGLE_ID) == "Google Inc."
+    assert lookup_manufacturer(TEST_GOOGLE_ID) == "Google"
 
 def test_lookup_manufacturer_unknown():
     assert lookup_manufacturer(TEST_UNKNOWN_ID) == "Unknown"
 
 def test_get_manufacturer_from_device_apple(mock_device):
-    assert get_manufacturer_from_device(mock_device) == "Apple Inc."
+    assert get_manufacturer_from_device(mock_device) == "Apple, Inc."
 
 def test_get_manufacturer_from_device_nordic():
     device = MagicMock()
-    device.getValue = MagicMock(side_effect=lambda x: b'0059' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_NORDIC_MANU_DATA if x == MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {MANUFACTURER_DATA_TYPE: TEST_NORDIC_MANU_DATA}
     assert get_manufacturer_from_device(device) == "Nordic Semiconductor ASA"
 
 def test_get_manufacturer_from_device_unknown():
     device = MagicMock()
-    device.getValue = MagicMock(side_effect=lambda x: b'ffff' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: TEST_UNKNOWN_MANU_DATA if x == MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {MANUFACTURER_DATA_TYPE: TEST_UNKNOWN_MANU_DATA}
     assert get_manufacturer_from_device(device) == "Unknown"
 
 def test_get_manufacturer_from_device_with_data():
     device = MagicMock()
-    # Mock manufacturer data for Apple (0x004C)
-    device.getValue = MagicMock(side_effect=lambda x: b'004c' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: '004c' if x == MANUFACTURER_DATA_TYPE else '')
+    # Apple iBeacon payload, the company ID 0x004C is sent little-endian
+    device.scanData = {MANUFACTURER_DATA_TYPE: b'\x4c\x00\x02\x15'}
 
-    assert get_manufacturer_from_device(device) == "Apple Inc."
+    assert get_manufacturer_from_device(device) == "Apple, Inc."
+
+def test_get_manufacturer_from_device_is_little_endian():
+    device = MagicMock()
+    # Read little-endian as the specification requires, these bytes are company 0x4C00
+    device.scanData = {MANUFACTURER_DATA_TYPE: b'\x00\x4c\x02\x15'}
+
+    assert get_manufacturer_from_device(device) == "Unknown"
 
 def test_get_manufacturer_from_device_no_data():
     device = MagicMock()
     # Mock no manufacturer data
-    device.getValue = MagicMock(return_value=None)
-    device.getValueText = MagicMock(return_value='')
+    device.scanData = {}
 
     assert get_manufacturer_from_device(device) == "Unknown"
 
 def test_get_manufacturer_from_device_invalid_data():
     device = MagicMock()
-    # Mock invalid manufacturer data format
-    device.getValue = MagicMock(side_effect=lambda x: b'xyz' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: 'xyz' if x == MANUFACTURER_DATA_TYPE else '')
+    # Mock empty manufacturer data without a company ID
+    device.scanData = {MANUFACTURER_DATA_TYPE: b''}
 
-    # Should return Unknown for invalid hex data
+    # Should return Unknown for invalid data
     assert get_manufacturer_from_device(device) == "Unknown"
 
 def test_get_manufacturer_from_device_short_data():
     device = MagicMock()
     # Mock too short manufacturer data
-    device.getValue = MagicMock(side_effect=lambda x: b'00' if x == MANUFACTURER_DATA_TYPE else None)
-    device.getValueText = MagicMock(side_effect=lambda x: '00' if x == MANUFACTURER_DATA_TYPE else '')
+    device.scanData = {MANUFACTURER_DATA_TYPE: b'\x00'}
 
     # Should return Unknown for too short data
     assert get_manufacturer_from_device(device) == "Unknown"
 
 def test_manufacturer_db_content():
     # Test that the database contains expected entries
-    assert len(MANUFACTURER_DB) > 0
-    assert MANUFACTURER_DB[0x004C] == "Apple Inc."
-    assert MANUFACTURER_DB[0x0059] == "Nordic Semiconductor ASA"
-    assert MANUFACTURER_DB[0x0029] == "Google Inc."
\ No newline at end of file
+    assert len(MANUFACTURER_DB) > TEST_REGISTRY_MIN_SIZE
+    assert MANUFACTURER_DB[TEST_APPLE_ID] == "Apple, Inc."
+    assert MANUFACTURER_DB[TEST_NORDIC_ID] == "Nordic Semiconductor ASA"
+    assert MANUFACTURER_DB[TEST_HITACHI_ID] == "Hitachi Ltd"
+    assert TEST_UNKNOWN_ID not in MANUFACTURER_DB
+
+def test_company_table_loads_lazily():
+    table = CompanyTable()
+    assert table._index is None
+    assert table.get(TEST_APPLE_ID) == "Apple, Inc."
+    assert table._index is not None
+
+def test_company_table_interns_names(tmp_path):
+    path = tmp_path / "companies.tsv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("0001\tAcme\n0002\tAcme\n0003\tOther Corp\n")
+    table = CompanyTable(path)
+
+    assert table[1] is table[2]
+    assert len(table) == TEST_INTERNED_ENTRIES
+    assert table.get(TEST_UNKNOWN_ID, "Unknown") == "Unknown"
+    with pytest.raises(KeyError):
+        table[TEST_UNKNOWN_ID]
+
+def test_company_table_rejects_out_of_range_ids():
+    assert MANUFACTURER_DB.get(-1) is None
+    assert MANUFACTURER_DB.get(1 << 16) is None
+
+def test_manufacturer_key_from_device(mock_device):
+    key = get_manufacturer_key_from_device(mock_device)
+    assert key == intern_manufacturer("Apple, Inc.")
+    assert manufacturer_name(key) == "Apple, Inc."
+
+def test_manufacturer_key_unknown():
+    device = MagicMock()
+    device.scanData = {MANUFACTURER_DATA_TYPE: TEST_UNKNOWN_MANU_DATA}
+    assert get_manufacturer_key_from_device(device) == UNKNOWN_MANUFACTURER_KEY
+    assert intern_manufacturer("Unknown") == UNKNOWN_MANUFACTURER_KEY
+    assert manufacturer_name(UNKNOWN_MANUFACTURER_KEY) == "Unknown"
+
+def test_company_table_keys_share_interned_names(tmp_path):
+    path = tmp_path / "companies.tsv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("0001\tAcme\n0002\tAcme\n")
+    table = CompanyTable(path)
+
+    assert table.key(1) == table.key(2) == table.intern("Acme")
+    assert table.key(None) == UNKNOWN_MANUFACTURER_KEY
+    # Names missing from the registry, e.g. from older history files, get new keys
+    key = table.intern("Acme Legacy")
+    assert key not in (UNKNOWN_MANUFACTURER_KEY, table.key(1))
+    assert table.intern("Acme Legacy") == key
+    assert table.name(key) == "Acme Legacy"
+
+def test_manufacturer_stats_round_trip():
+    stats = {"Apple, Inc.": 5, "Nordic Semiconductor ASA": 3, "Unknown": 1}
+    interned = intern_manufacturer_stats(stats)
+    assert all(isinstance(key, int) for key in interned)
+    assert resolve_manufacturer_stats(interned) == stats
@@ -8,6 +8,7 @@ from unittest.mock import patch
 
 import pytest
 
+from app.manufacturers import intern_manufacturer_stats, resolve_manufacturer_stats
 from app.models import ScanResult
 
 # Test constants
@@ -28,7 +29,7 @@ def sample_scan_result():
         unique_devices=SAMPLE_UNIQUE_DEVICES,
         ios_devices=SAMPLE_IOS_DEVICES,
         other_devices=SAMPLE_OTHER_DEVICES,
-        manufacturer_stats={"Apple": SAMPLE_IOS_DEVICES, "Nordic": SAMPLE_OTHER_DEVICES}
+        manufacturer_stats=intern_manufacturer_stats({"Apple": SAMPLE_IOS_DEVICES, "Nordic": SAMPLE_OTHER_DEVICES})
     )
 
 @pytest.fixture
@@ -65,6 +66,8 @@ def test_save_history(temp_data_dir, sample_scan_result):
         detailed_data = json.load(f)
         assert len(detailed_data) == 1
         assert detailed_data[0]["unique_devices"] == SAMPLE_UNIQUE_DEVICES
+        # Manufacturers are saved by name, not by their in-process keys
+        assert detailed_data[0]["manufacturer_stats"] == {"Apple": SAMPLE_IOS_DEVICES, "Nordic": SAMPLE_OTHER_DEVICES}
 
 def test_load_history(temp_data_dir, sample_scan_result):
     from app.persistence import DataPersistence
@@ -81,7 +84,7 @@ def test_load_history(temp_data_dir, sample_scan_result):
     assert loaded_history[0].unique_devices == SAMPLE_UNIQUE_DEVICES
     assert loaded_history[0].ios_devices == SAMPLE_IOS_DEVICES
     assert loaded_history[0].other_devices == SAMPLE_OTHER_DEVICES
-    assert loaded_history[0].manufacturer_stats == {"Apple": SAMPLE_IOS_DEVICES, "Nordic": SAMPLE_OTHER_DEVICES}
+    assert resolve_manufacturer_stats(loaded_history[0].manufacturer_stats) == {"Apple": SAMPLE_IOS_DEVICES, "Nordic": SAMPLE_OTHER_DEVICES}
 
 def test_load_history_empty_file(temp_data_dir):
     from app.persistence import DataPersistence
@@ -142,7 +145,7 @@ def test_multiple_scan_results(temp_data_dir):
             unique_devices=i+3,
             ios_devices=i+2,
             other_devices=i+1,
-            manufacturer_stats={"Apple": i+2, "Nordic": i+1}
+            manufacturer_stats=intern_manufacturer_stats({"Apple": i+2, "Nordic": i+1})
         )
         for i in range(TEST_RESULTS_COUNT)
     ]
@@ -179,7 +182,7 @@ def test_data_aggregation(temp_data_dir):
             unique_devices=10,
             ios_devices=5,
             other_devices=5,
-            manufacturer_stats={"Apple": 5, "Nordic": 5}
+            manufacturer_stats=intern_manufacturer_stats({"Apple": 5, "Nordic": 5})
         ))
 
     # 2-7 days ago - hourly data
@@ -190,7 +193,7 @@ def test_data_aggregation(temp_data_dir):
                 unique_devices=20,
                 ios_devices=10,
                 other_devices=10,
-                manufacturer_stats={"Apple": 10, "Nordic": 10}
+                manufacturer_stats=intern_manufacturer_stats({"Apple": 10, "Nordic": 10})
             ))
 
     # 8-14 days ago - daily data
@@ -201,7 +204,7 @@ def test_data_aggregation(temp_data_dir):
                 unique_devices=30,
                 ios_devices=15,
                 other_devices=15,
-                manufacturer_stats={"Apple": 15, "Nordic": 15}
+                manufacturer_stats=intern_manufacturer_stats({"Apple": 15, "Nordic": 15})
             ))
 
     persistence.save_history(results)
@@ -217,4 +220,42 @@ def test_data_aggregation(temp_data_dir):
 
     assert len(detailed_data) == HOURS_IN_DAY  # One entry per hour for last 24 hours
     assert len(hourly_data) == 5 * HOURS_IN_DAY  # 5 days of hourly data (days 2-6)
-    assert len(daily_data) == DAYS_IN_WEEK  # 7 days of daily data (days 8-14)
\ No newline at end of file
+    assert len(daily_data) == DAYS_IN_WEEK  # 7 days of daily data (days 8-14)
+
+def test_save_and_load_sessions(temp_data_dir):
+    from app.persistence import DataPersistence
+
+    persistence = DataPersistence(data_dir=temp_data_dir)
+    assert persistence.load_sessions() is None
+
+    persistence.save_sessions(b"snapshot")
+    assert persistence.load_sessions() == b"snapshot"
+    assert not persistence.should_save_sessions()
+
+def test_should_save_sessions_after_interval(temp_data_dir):
+    from app.persistence import DataPersistence
+
+    persistence = DataPersistence(data_dir=temp_data_dir, session_save_interval_seconds=0)
+    assert persistence.should_save_sessions()
+
+def test_dwell_sketch_round_trip(temp_data_dir, sample_scan_result):
+    from app.persistence import DataPersistence
+
+    for dwell_time in (0, 60, 600):
+        sample_scan_result.dwell_sketch.add(dwell_time)
+    persistence = DataPersistence(data_dir=temp_data_dir)
+    persistence.save_history([sample_scan_result])
+
+    loaded = persistence.load_history()[0].dwell_sketch
+    assert loaded.bins == sample_scan_result.dwell_sketch.bins
+    assert loaded.count == sample_scan_result.dwell_sketch.count
+
+def test_load_history_without_dwell_sketches(temp_data_dir, sample_scan_result):
+    from app.persistence import DataPersistence
+
+    persistence = DataPersistence(data_dir=temp_data_dir)
+    data = persistence._serialize_results([sample_scan_result])
+    del data[0]["dwell_sketch"]
+    persistence._atomic_write(persistence.detailed_file, data)
+
+    assert persistence.load_history()[0].dwell_sketch.count == 0
@@ -0,0 +1,158 @@
+"""
+Tests for the continuous scanning pipeline.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bluepy.btle import BTLEException
+
+from app.scanner import ContinuousScanner, ScanBatch, ScanDelegate, ScanSource, ScanWindow, ScanWorker, next_window_end
+
+# Test constants
+TEST_WINDOW_SECONDS = 60
+TEST_ADDR_1 = "00:11:22:33:44:55"
+TEST_ADDR_2 = "66:77:88:99:aa:bb"
+TEST_RSSI_OLD = -80
+TEST_RSSI_NEW = -60
+TEST_WINDOW_DEVICES = 2
+
+def make_device(addr: str, rssi: int) -> MagicMock:
+    device = MagicMock()
+    device.addr = addr
+    device.rssi = rssi
+    return device
+
+def test_next_window_end_is_aligned():
+    current_time = datetime(2024, 3, 20, 10, 15, 42)
+    assert next_window_end(current_time, TEST_WINDOW_SECONDS) == datetime(2024, 3, 20, 10, 16)
+
+def test_next_window_end_on_boundary():
+    current_time = datetime(2024, 3, 20, 10, 15)
+    assert next_window_end(current_time, TEST_WINDOW_SECONDS) == datetime(2024, 3, 20, 10, 16)
+
+def test_scan_window_keeps_strongest_entry_per_address():
+    window = ScanWindow(datetime.now(), TEST_WINDOW_SECONDS)
+    window.add([make_device(TEST_ADDR_1, TEST_RSSI_OLD), make_device(TEST_ADDR_2, TEST_RSSI_NEW)])
+    # The same addresses reported by a second adapter
+    window.add([make_device(TEST_ADDR_1, TEST_RSSI_NEW), make_device(TEST_ADDR_2, TEST_RSSI_OLD)])
+    assert len(window.devices) == TEST_WINDOW_DEVICES
+    assert window.devices[TEST_ADDR_1].rssi == TEST_RSSI_NEW
+    assert window.devices[TEST_ADDR_2].rssi == TEST_RSSI_NEW
+
+def test_scan_window_is_complete():
+    window = ScanWindow(datetime.now(), TEST_WINDOW_SECONDS)
+    assert not window.is_complete(window.start_time)
+    assert window.is_complete(window.end_time)
+    assert window.is_complete(window.end_time + timedelta(seconds=1))
+
+def test_scan_delegate_forwards_advertisements():
+    received = []
+    delegate = ScanDelegate(received.append)
+    device = make_device(TEST_ADDR_1, TEST_RSSI_NEW)
+    delegate.handleDiscovery(device, True, True)
+    assert received == [device]
+
+def test_scan_delegate_without_callback():
+    delegate = ScanDelegate()
+    delegate.handleDiscovery(make_device(TEST_ADDR_1, TEST_RSSI_NEW), True, False)  # Should not raise
+
+@pytest.fixture
+def mock_scanner():
+    with patch('app.scanner.Scanner') as mock_scanner_class:
+        scanner_instance = MagicMock()
+        scanner_instance.withDelegate.return_value = scanner_instance
+        mock_scanner_class.return_value = scanner_instance
+        yield scanner_instance
+
+def test_continuous_scanner_buffers_and_drains(mock_scanner):
+    continuous_scanner = ContinuousScanner()
+    continuous_scanner.start()
+    mock_scanner.start.assert_called_once()
+
+    # Simulate bluepy calling the delegate while processing
+    delegate = mock_scanner.withDelegate.call_args[0][0]
+    device = make_device(TEST_ADDR_1, TEST_RSSI_NEW)
+    mock_scanner.process.side_effect = lambda timeout: delegate.handleDiscovery(device, True, True)
+    continuous_scanner.process()
+
+    assert continuous_scanner.drain() == [device]
+    mock_scanner.clear.assert_called_once()
+    assert continuous_scanner.drain() == []
+
+def test_continuous_scanner_read_returns_batch(mock_scanner):
+    continuous_scanner = ContinuousScanner("hci1")
+    continuous_scanner.start()
+    delegate = mock_scanner.withDelegate.call_args[0][0]
+    device = make_device(TEST_ADDR_1, TEST_RSSI_NEW)
+    mock_scanner.process.side_effect = lambda timeout: delegate.handleDiscovery(device, True, True)
+
+    batch = continuous_scanner.read()
+    assert batch.devices == [device]
+    assert batch.source == "hci1"
+    assert not continuous_scanner.finished
+
+def test_continuous_scanner_process_requires_start():
+    with pytest.raises(RuntimeError):
+        ContinuousScanner().process()
+
+def test_continuous_scanner_stop_ignores_helper_errors(mock_scanner):
+    continuous_scanner = ContinuousScanner()
+    continuous_scanner.start()
+    mock_scanner.stop.side_effect = BTLEException("helper exited")
+    continuous_scanner.stop()
+    assert continuous_scanner.scanner is None
+    continuous_scanner.stop()  # Should not raise when already stopped
+
+def test_continuous_scanner_uses_adapter_index():
+    with patch('app.scanner.Scanner') as mock_scanner_class:
+        ContinuousScanner("hci2").start()
+        mock_scanner_class.assert_called_once_with(2)
+
+def test_scan_source_without_read_cannot_be_created():
+    class IncompleteSource(ScanSource):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        IncompleteSource()
+
+@pytest.mark.asyncio
+async def test_scan_worker_publishes_batches_and_errors():
+    continuous_scanner = MagicMock()
+    continuous_scanner.name = "hci1"
+    continuous_scanner.finished = False
+    device = make_device(TEST_ADDR_1, TEST_RSSI_NEW)
+    continuous_scanner.read.side_effect = [ScanBatch(datetime.now(), [device], "hci1"), RuntimeError("helper died")]
+
+    queue: asyncio.Queue = asyncio.Queue()
+    worker = ScanWorker(continuous_scanner, queue, asyncio.get_running_loop())
+    worker.start()
+
+    batch = await asyncio.wait_for(queue.get(), timeout=1)
+    assert isinstance(batch, ScanBatch)
+    assert batch.devices == [device]
+    assert batch.source == "hci1"
+
+    with pytest.raises(RuntimeError, match="helper died"):
+        await asyncio.wait_for(worker.wait(), timeout=1)
+
+    await worker.stop()
+    assert worker.thread is None
+    continuous_scanner.start.assert_called_once()
+    continuous_scanner.stop.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_scan_worker_stops_cleanly():
+    continuous_scanner = MagicMock()
+    continuous_scanner.name = "hci0"
+    continuous_scanner.finished = False
+    continuous_scanner.read.side_effect = lambda: ScanBatch(datetime.now(), [], "hci0")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    worker = ScanWorker(continuous_scanner, queue, asyncio.get_running_loop())
+    worker.start()
+    await asyncio.wait_for(queue.get(), timeout=1)
+    await worker.stop()
+    await asyncio.wait_for(worker.wait(), timeout=1)  # Finishes without an error
+    continuous_scanner.stop.assert_called_once()
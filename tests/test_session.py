@@ -0,0 +1,297 @@
+"""
+Tests for the session module.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.session import MAX_RSSI_DIFF, MAX_SAMPLES, DeviceSession, SessionManager, pack_snapshot
+
+# Test constants
+TEST_RSSI = -70
+TEST_RSSI_STRONGER = -60
+TEST_RSSI_FAR = -30  # Too strong to be mistaken for a rotation of a TEST_RSSI_STRONGER device
+TEST_SESSION_COUNT = 1000
+TEST_STABLE_UPDATES = 4  # Updates at a steady RSSI until an approaching session is stable
+TEST_RANDOM_DEVICES = 50
+TEST_RANDOM_WINDOWS = 30
+SCAN_INTERVAL = timedelta(minutes=1)
+
+def make_approaching_session(manager, fingerprint, start_time):
+    """Create a session whose signal is getting stronger."""
+    manager.update_session(fingerprint, start_time, TEST_RSSI)
+    manager.update_session(fingerprint, start_time + SCAN_INTERVAL, TEST_RSSI_STRONGER)
+
+def test_rssi_trend_is_cached_on_update():
+    now = datetime.now()
+    session = DeviceSession("fp", now, TEST_RSSI)
+    assert session.get_rssi_trend() is None
+
+    session.update(now + SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    assert session.get_rssi_trend() == "increasing"
+
+    for i in range(TEST_STABLE_UPDATES):
+        session.update(now + (i + 2) * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    assert session.get_rssi_trend() == "stable"
+
+def test_rotated_address_joins_approaching_session():
+    manager = SessionManager()
+    now = datetime.now()
+    make_approaching_session(manager, "old", now)
+
+    manager.update_session("new", now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER + 1)
+
+    assert manager.sessions["new"] is manager.sessions["old"]
+
+def test_rotated_address_outside_rssi_range_is_new_session():
+    manager = SessionManager()
+    now = datetime.now()
+    make_approaching_session(manager, "old", now)
+
+    manager.update_session("new", now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER + MAX_RSSI_DIFF + 1)
+
+    assert manager.sessions["new"] is not manager.sessions["old"]
+
+def test_expired_session_is_not_matched():
+    manager = SessionManager()
+    now = datetime.now()
+    make_approaching_session(manager, "old", now)
+
+    later = now + SCAN_INTERVAL + manager.session_timeout + SCAN_INTERVAL
+    manager.update_session("new", later, TEST_RSSI_STRONGER)
+
+    assert manager.sessions["new"] is not manager.sessions["old"]
+
+def test_match_prefers_nearest_rssi():
+    manager = SessionManager()
+    now = datetime.now()
+    make_approaching_session(manager, "far", now)
+    manager.update_session("near", now, TEST_RSSI - 1)
+    manager.update_session("near", now + SCAN_INTERVAL, TEST_RSSI_STRONGER - 1)
+
+    manager.update_session("new", now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER - 1)
+
+    assert manager.sessions["new"] is manager.sessions["near"]
+
+def test_index_follows_updates_and_cleanup():
+    manager = SessionManager()
+    now = datetime.now()
+    # Every device is seen before any is approaching, so none are taken for rotations
+    for i in range(TEST_SESSION_COUNT):
+        manager.update_session(f"fp{i}", now, TEST_RSSI)
+    for i in range(TEST_SESSION_COUNT):
+        manager.update_session(f"fp{i}", now + SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    assert sum(map(len, manager._increasing.values())) == TEST_SESSION_COUNT
+
+    # A stable signal takes a session out of the index
+    for i in range(TEST_STABLE_UPDATES):
+        manager.update_session("fp0", now + (i + 2) * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    assert manager.sessions["fp0"].rssi_trend == "stable"
+    assert sum(map(len, manager._increasing.values())) == TEST_SESSION_COUNT - 1
+
+    manager.cleanup_old_sessions(now + SCAN_INTERVAL + manager.session_timeout + SCAN_INTERVAL)
+    assert list(manager.sessions) == ["fp0"]
+    assert not manager._increasing
+
+def test_expiry_hook_gets_each_session_once():
+    expired = []
+    manager = SessionManager(on_expire=expired.append)
+    now = datetime.now()
+    make_approaching_session(manager, "old", now)
+    manager.update_session("new", now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    manager.update_session("other", now + 3 * SCAN_INTERVAL, TEST_RSSI_FAR)
+    rotated_session = manager.sessions["old"]
+
+    manager.cleanup_old_sessions(now + 2 * SCAN_INTERVAL + manager.session_timeout)
+    assert not expired
+
+    manager.cleanup_old_sessions(now + 3 * SCAN_INTERVAL + manager.session_timeout)
+    # Both fingerprints of the rotated device go with its session
+    assert expired == [rotated_session]
+    assert list(manager.sessions) == ["other"]
+
+def test_returning_device_after_timeout_closes_old_session():
+    expired = []
+    manager = SessionManager(on_expire=expired.append)
+    now = datetime.now()
+    manager.update_session("fp", now, TEST_RSSI)
+    old_session = manager.sessions["fp"]
+
+    manager.update_session("fp", now + manager.session_timeout + SCAN_INTERVAL, TEST_RSSI)
+
+    assert expired == [old_session]
+    assert manager.sessions["fp"] is not old_session
+    manager.cleanup_old_sessions(now + manager.session_timeout + SCAN_INTERVAL)
+    assert list(manager.sessions) == ["fp"]
+
+def test_clear_forgets_sessions():
+    manager = SessionManager()
+    make_approaching_session(manager, "fp", datetime.now())
+    manager.clear()
+    assert not manager.sessions
+    assert not manager._increasing
+    assert manager.get_session_stats()["total_sessions"] == 0
+
+def test_session_stats_empty():
+    assert SessionManager().get_session_stats() == {
+        "total_sessions": 0,
+        "active_sessions": 0,
+        "average_dwell_time": 0
+    }
+
+def test_session_stats_count_rotated_device_once():
+    manager = SessionManager()
+    now = datetime.now()
+    make_approaching_session(manager, "old", now)
+    manager.update_session("new", now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+
+    stats = manager.get_session_stats()
+    assert stats["total_sessions"] == 1
+    assert stats["active_sessions"] == 1
+    assert stats["average_dwell_time"] == (2 * SCAN_INTERVAL).total_seconds()
+
+def test_session_stats_match_recomputed_totals():
+    manager = SessionManager()
+    rng = random.Random(0)
+    now = datetime.now()
+    for window in range(TEST_RANDOM_WINDOWS):
+        current_time = now + window * SCAN_INTERVAL
+        manager.cleanup_old_sessions(current_time)
+        for device in rng.sample(range(TEST_RANDOM_DEVICES), TEST_RANDOM_DEVICES // 5):
+            manager.update_session(f"fp{device}", current_time, rng.randint(-90, -40))
+
+        sessions = set(manager.sessions.values())
+        active = [session for session in sessions if session.is_active]
+        stats = manager.get_session_stats()
+        assert all(session.is_active == (session.last_seen == current_time) for session in sessions)
+        assert stats["total_sessions"] == len(sessions)
+        assert stats["active_sessions"] == len(active)
+        assert stats["average_dwell_time"] == pytest.approx(
+            sum(session.get_dwell_time() for session in active) / len(active)
+        )
+
+def test_rssi_half_sums_match_samples():
+    rng = random.Random(0)
+    now = datetime.now()
+    session = DeviceSession("fp", now, TEST_RSSI)
+    samples = [TEST_RSSI]
+    for i in range(TEST_RANDOM_WINDOWS):
+        rssi = rng.randint(-100, -30)
+        session.update(now + (i + 1) * SCAN_INTERVAL, rssi)
+        samples = [*samples, rssi][-MAX_SAMPLES:]
+
+        mid_point = len(samples) // 2
+        assert session.rssi_samples == samples
+        assert session.last_rssi == rssi
+        assert session._table.rssi[MAX_SAMPLES] == sum(samples[:mid_point])
+        assert session._table.rssi[MAX_SAMPLES + 1] == sum(samples[mid_point:])
+
+def test_session_deactivates_when_not_seen():
+    manager = SessionManager()
+    now = datetime.now()
+    manager.update_session("fp", now, TEST_RSSI)
+    session = manager.sessions["fp"]
+
+    manager.cleanup_old_sessions(now + SCAN_INTERVAL)
+    assert not session.is_active
+    assert manager.get_session_stats() == {"total_sessions": 1, "active_sessions": 0, "average_dwell_time": 0}
+
+    # Seen again before it times out, the session resumes
+    manager.update_session("fp", now + 2 * SCAN_INTERVAL, TEST_RSSI)
+    assert manager.sessions["fp"] is session
+    assert session.is_active
+    assert manager.get_session_stats()["average_dwell_time"] == (2 * SCAN_INTERVAL).total_seconds()
+
+def make_rotated_sessions(manager, now):
+    """Create an approaching device that rotated its address and a steady one."""
+    make_approaching_session(manager, "aa" * 32, now)
+    manager.update_session("bb" * 32, now + 2 * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    manager.update_session("cc" * 32, now + 2 * SCAN_INTERVAL, TEST_RSSI_FAR)
+
+def test_snapshot_round_trip():
+    manager = SessionManager()
+    now = datetime.now()
+    make_rotated_sessions(manager, now)
+
+    restored = SessionManager()
+    assert restored.restore(manager.snapshot(), now + 2 * SCAN_INTERVAL) == len(set(manager.sessions.values()))
+
+    assert restored.sessions["aa" * 32] is restored.sessions["bb" * 32]
+    assert restored.get_session_stats() == manager.get_session_stats()
+    for fingerprint, session in manager.sessions.items():
+        copy = restored.sessions[fingerprint]
+        assert copy.start_time == session.start_time
+        assert copy.last_seen == session.last_seen
+        assert copy.rssi_samples == session.rssi_samples
+        assert copy.get_rssi_trend() == session.get_rssi_trend()
+    # The restored index still matches rotated addresses
+    restored.update_session("dd" * 32, now + 3 * SCAN_INTERVAL, TEST_RSSI_STRONGER)
+    assert restored.sessions["dd" * 32] is restored.sessions["aa" * 32]
+
+def test_snapshot_round_trip_compact_fingerprints():
+    manager = SessionManager()
+    now = datetime.now()
+    for fingerprint in range(TEST_RANDOM_DEVICES):
+        manager.update_session(fingerprint * TEST_SESSION_COUNT, now, TEST_RSSI_FAR)
+
+    restored = SessionManager()
+    restored.restore(manager.snapshot(), now)
+    assert list(restored.sessions) == list(manager.sessions)
+
+def test_copied_sessions_are_packed_as_they_were():
+    """Sessions updated between copying and packing, as the scan loop may do, are saved as they were copied."""
+    manager = SessionManager()
+    now = datetime.now()
+    make_rotated_sessions(manager, now)
+    snapshot = manager.snapshot()
+    sessions = manager.copy_sessions()
+
+    make_approaching_session(manager, "bb" * 32, now + 3 * SCAN_INTERVAL)
+    manager.update_session("ff" * 32, now + 4 * SCAN_INTERVAL, TEST_RSSI_FAR)
+    assert pack_snapshot(sessions) == snapshot
+
+def test_restore_drops_timed_out_sessions():
+    manager = SessionManager()
+    now = datetime.now()
+    make_rotated_sessions(manager, now)
+    manager.update_session("ee" * 32, now + 3 * SCAN_INTERVAL, TEST_RSSI_FAR)
+
+    restored = SessionManager()
+    restored.restore(manager.snapshot(), now + 3 * SCAN_INTERVAL + manager.session_timeout)
+    assert list(restored.sessions) == ["ee" * 32]
+
+def test_restored_sessions_continue_like_the_originals():
+    manager = SessionManager()
+    restored = SessionManager()
+    rng = random.Random(0)
+    now = datetime.now()
+    for window in range(TEST_RANDOM_WINDOWS):
+        current_time = now + window * SCAN_INTERVAL
+        if window == TEST_RANDOM_WINDOWS // 2:
+            # Timed out sessions leave free rows in the snapshot, which the restored table reuses
+            restored.restore(manager.snapshot(), current_time)
+        updates = [
+            (f"{device:064x}", rng.randint(-90, -40))
+            for device in rng.sample(range(TEST_RANDOM_DEVICES), TEST_RANDOM_DEVICES // 5)
+        ]
+        for sessions in (manager, restored):
+            sessions.cleanup_old_sessions(current_time)
+            for fingerprint, rssi in updates:
+                sessions.update_session(fingerprint, current_time, rssi)
+
+    assert restored.get_session_stats() == manager.get_session_stats()
+    assert restored.sessions.keys() == manager.sessions.keys()
+    for fingerprint, session in manager.sessions.items():
+        copy = restored.sessions[fingerprint]
+        assert (copy.start_time, copy.last_seen, copy.is_active) == (session.start_time, session.last_seen, session.is_active)
+        assert copy.rssi_samples == session.rssi_samples
+
+def test_restore_rejects_invalid_snapshots():
+    manager = SessionManager()
+    make_rotated_sessions(manager, datetime.now())
+    snapshot = manager.snapshot()
+
+    for invalid in (b"", b"not a snapshot at all", snapshot[:-1]):
+        with pytest.raises(ValueError):
+            SessionManager().restore(invalid, datetime.now())
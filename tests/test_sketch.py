@@ -0,0 +1,94 @@
+"""
+Tests for the sketch module.
+"""
+import json
+import random
+
+import pytest
+
+from app.sketch import SKETCH_MAX_BINS, SKETCH_RELATIVE_ACCURACY, QuantileSketch, merge_sketches
+
+# Test constants
+TEST_VALUES = 10000
+TEST_QUANTILES = (0.5, 0.9, 0.99)
+TEST_SHORT_DWELL = 0.5  # Below the smallest binned value
+
+def exact_quantile(values, q):
+    """The quantile of a sorted list, at the same rank the sketch uses."""
+    return values[int(q * (len(values) - 1))]
+
+@pytest.fixture
+def dwell_times():
+    rng = random.Random(0)
+    return [rng.lognormvariate(6, 1) for _ in range(TEST_VALUES)]
+
+def make_sketch(values):
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+def test_empty_sketch():
+    sketch = QuantileSketch()
+    assert sketch.count == 0
+    assert sketch.percentiles() == {"p50": 0, "p90": 0, "p99": 0}
+
+def test_quantiles_within_relative_accuracy(dwell_times):
+    sketch = make_sketch(dwell_times)
+    values = sorted(dwell_times)
+    for q in TEST_QUANTILES:
+        assert sketch.quantile(q) == pytest.approx(exact_quantile(values, q), rel=SKETCH_RELATIVE_ACCURACY)
+
+def test_short_dwell_times_count_as_zero():
+    sketch = make_sketch([TEST_SHORT_DWELL, TEST_SHORT_DWELL, 0])
+    assert sketch.zero_count == sketch.count
+    assert sketch.quantile(0.5) == 0
+
+def test_merge_is_exact(dwell_times):
+    half = len(dwell_times) // 2
+    merged = merge_sketches([make_sketch(dwell_times[:half]), make_sketch(dwell_times[half:])])
+    whole = make_sketch(dwell_times)
+    assert merged.bins == whole.bins
+    assert merged.count == whole.count
+
+def test_merge_sketches_leaves_inputs_unchanged(dwell_times):
+    sketch = make_sketch(dwell_times)
+    merge_sketches([sketch, sketch])
+    assert sketch.count == TEST_VALUES
+
+def test_serialization_round_trip(dwell_times):
+    sketch = make_sketch([*dwell_times, 0])
+    restored = QuantileSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+    assert restored.bins == sketch.bins
+    assert restored.zero_count == sketch.zero_count
+    assert restored.count == sketch.count
+
+def test_bins_are_bounded():
+    # Values spread over far more orders of magnitude than the bins cover
+    sketch = make_sketch([1.1 ** i for i in range(3 * SKETCH_MAX_BINS)])
+    assert len(sketch.bins) == SKETCH_MAX_BINS
+    assert sketch.count == 3 * SKETCH_MAX_BINS
+    # The high quantiles are still accurate
+    assert sketch.quantile(1) == pytest.approx(1.1 ** (3 * SKETCH_MAX_BINS - 1), rel=SKETCH_RELATIVE_ACCURACY)
+
+def test_subtract_undoes_merge(dwell_times):
+    half = len(dwell_times) // 2
+    sketch = make_sketch(dwell_times[:half])
+    sketch.add(0)
+    added = make_sketch([*dwell_times[half:], 0])
+    sketch.merge(added)
+    sketch.subtract(added)
+
+    expected = make_sketch(dwell_times[:half])
+    expected.add(0)
+    assert sketch.bins == expected.bins
+    assert sketch.zero_count == expected.zero_count
+    assert sketch.count == expected.count
+
+def test_subtract_takes_collapsed_values_from_lowest_bin():
+    low = make_sketch([1.1 ** i for i in range(SKETCH_MAX_BINS)])
+    high = make_sketch([1.1 ** (SKETCH_MAX_BINS + i) for i in range(SKETCH_MAX_BINS)])
+    sketch = merge_sketches([low, high])
+    sketch.subtract(low)
+    assert sketch.count == SKETCH_MAX_BINS
+    assert sum(sketch.bins.values()) == SKETCH_MAX_BINS
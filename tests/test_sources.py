@@ -0,0 +1,187 @@
+"""
+Tests for the replayed, synthetic and recording scan sources.
+"""
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from bluepy.btle import ScanEntry
+
+from app.core.constants import COMPLETE_LOCAL_NAME, MANUFACTURER_DATA_TYPE
+from app.fingerprint import build_device_fingerprint, is_ios_device
+from app.manufacturers import get_manufacturer_from_device
+from app.scanner import ScanBatch
+from app.sources import (
+    RecordingScanSource,
+    ReplayScanSource,
+    SyntheticScanSource,
+    create_scan_source,
+    make_scan_entry,
+    parse_ad_structures,
+)
+
+# Test constants
+TEST_RAW = bytes.fromhex("02010609ff4c000215") + b"\x00" * 4 + bytes.fromhex("0509") + b"Test"
+TEST_ADDR = "4a:11:22:33:44:55"
+TEST_RSSI = -70
+TEST_RECORDING_START = 1_700_000_000.0
+TEST_READ_INTERVAL = 1.0
+TEST_SYNTHETIC_DEVICES = 50
+TEST_SYNTHETIC_READS = 30
+TEST_ROTATION_SECONDS = 10
+TEST_PRIVATE_ADDR_MASK = 0xC0
+TEST_PRIVATE_ADDR_BITS = 0x40
+TEST_APPLE_ADVERTISEMENT = bytes.fromhex("02010607ff4c0010020b00")
+TEST_SCAN_RESPONSE = bytes.fromhex("0509") + b"Test"
+BLUEPY_RANDOM_ADDR_TYPE = 2  # Address type code in bluepy scan responses
+
+def test_parse_ad_structures():
+    scan_data = parse_ad_structures(TEST_RAW)
+    assert scan_data[MANUFACTURER_DATA_TYPE].startswith(b"\x4c\x00")
+    assert scan_data[COMPLETE_LOCAL_NAME] == b"Test"
+
+def test_parse_ad_structures_stops_at_padding():
+    assert parse_ad_structures(bytes.fromhex("020106") + b"\x00" * 10) == {1: b"\x06"}
+
+def test_make_scan_entry_behaves_like_bluepy():
+    entry = make_scan_entry(TEST_ADDR, "random", TEST_RSSI, TEST_RAW)
+    assert entry.addr == TEST_ADDR
+    assert entry.rssi == TEST_RSSI
+    assert entry.getValueText(COMPLETE_LOCAL_NAME) == "Test"
+    assert entry.getValueText(MANUFACTURER_DATA_TYPE).startswith("4c00")
+    # The pipeline can fingerprint generated entries
+    assert len(build_device_fingerprint(entry)) == 64  # noqa: PLR2004 (SHA-256 hex digest)
+
+def write_recording(path, offsets):
+    with open(path, "w") as f:
+        for offset in offsets:
+            record = {
+                "timestamp": TEST_RECORDING_START + offset,
+                "addr": TEST_ADDR,
+                "addr_type": "random",
+                "rssi": TEST_RSSI,
+                "raw": TEST_RAW.hex()
+            }
+            f.write(json.dumps(record) + "\n")
+
+def test_replay_source_batches_by_recording_time(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    write_recording(path, [0.0, 0.5, 2.5])
+    source = ReplayScanSource(str(path), speed=0, read_interval=TEST_READ_INTERVAL)
+    source.start()
+
+    batches = []
+    while not source.finished:
+        batches.append(source.read())
+    source.stop()
+
+    assert [len(batch.devices) for batch in batches] == [2, 0, 1]
+    assert all(batch.source == "replay" for batch in batches)
+    # Timestamps are rebased to the replay start and advance with the recording
+    assert (batches[-1].timestamp - batches[0].timestamp).total_seconds() == pytest.approx(2 * TEST_READ_INTERVAL)
+
+def test_replay_source_empty_recording(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    path.write_text("")
+    source = ReplayScanSource(str(path), speed=0)
+    source.start()
+    assert source.finished
+    source.stop()
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path / "recording.jsonl"
+    entry = make_scan_entry(TEST_ADDR, "random", TEST_RSSI, TEST_RAW)
+    wrapped = MagicMock()
+    wrapped.name = "hci0"
+    wrapped.finished = False
+    wrapped.read.return_value = ScanBatch(datetime.fromtimestamp(TEST_RECORDING_START), [entry], "hci0")
+
+    recorder = RecordingScanSource(wrapped, str(path))
+    recorder.start()
+    assert recorder.read().source == "hci0"
+    recorder.stop()
+    wrapped.stop.assert_called_once()
+
+    replay = ReplayScanSource(str(path), speed=0)
+    replay.start()
+    replayed = replay.read().devices
+    replay.stop()
+    assert len(replayed) == 1
+    assert replayed[0].addr == TEST_ADDR
+    assert replayed[0].rssi == TEST_RSSI
+    assert replayed[0].rawData == TEST_RAW
+
+def record_and_replay(tmp_path, entry):
+    """Record an entry and replay it."""
+    path = tmp_path / "recording.jsonl"
+    wrapped = MagicMock()
+    wrapped.name = "hci0"
+    wrapped.finished = False
+    wrapped.read.return_value = ScanBatch(datetime.fromtimestamp(TEST_RECORDING_START), [entry], "hci0")
+    recorder = RecordingScanSource(wrapped, str(path))
+    recorder.start()
+    recorder.read()
+    recorder.stop()
+
+    replay = ReplayScanSource(str(path), speed=0)
+    replay.start()
+    replayed = replay.read().devices
+    replay.stop()
+    return replayed[0]
+
+def test_recording_keeps_advertisement_and_scan_response(tmp_path):
+    # A live entry updated by bluepy with an advertisement and then a scan response
+    entry = ScanEntry(TEST_ADDR, 0)
+    for data in (TEST_APPLE_ADVERTISEMENT, TEST_SCAN_RESPONSE):
+        entry._update({"type": [BLUEPY_RANDOM_ADDR_TYPE], "rssi": [-TEST_RSSI], "flag": [0], "d": [data]})
+    assert entry.rawData == TEST_SCAN_RESPONSE
+
+    replayed = record_and_replay(tmp_path, entry)
+
+    assert replayed.scanData == entry.scanData
+    assert is_ios_device(replayed) == is_ios_device(entry)
+    assert get_manufacturer_from_device(replayed) == get_manufacturer_from_device(entry) == "Apple, Inc."
+    assert build_device_fingerprint(replayed) == build_device_fingerprint(entry)
+
+def test_synthetic_source_is_reproducible():
+    def addresses(seed):
+        source = SyntheticScanSource(TEST_SYNTHETIC_DEVICES, speed=0, seed=seed)
+        source.start()
+        return [device.addr for device in source.read().devices]
+
+    assert addresses(1) == addresses(1)
+
+def test_synthetic_source_rotates_private_addresses():
+    source = SyntheticScanSource(TEST_SYNTHETIC_DEVICES, speed=0, seed=1, rotation_seconds=TEST_ROTATION_SECONDS)
+    source.churn_per_minute = 0
+    source.start()
+
+    addresses = set()
+    fingerprints = set()
+    for _ in range(TEST_SYNTHETIC_READS):
+        for device in source.read().devices:
+            addresses.add(device.addr)
+            fingerprints.add(build_device_fingerprint(device))
+            if device.addrType == "random":
+                assert int(device.addr[:2], 16) & TEST_PRIVATE_ADDR_MASK == TEST_PRIVATE_ADDR_BITS
+
+    # Addresses change over time while the advertised payloads stay the same
+    assert len(addresses) > TEST_SYNTHETIC_DEVICES
+    assert len(fingerprints) <= TEST_SYNTHETIC_DEVICES
+
+def test_synthetic_source_timestamps_follow_virtual_clock():
+    source = SyntheticScanSource(TEST_SYNTHETIC_DEVICES, speed=0, seed=1)
+    source.read_interval = TEST_READ_INTERVAL
+    source.start()
+    first = source.read()
+    for _ in range(TEST_SYNTHETIC_READS - 1):
+        last = source.read()
+    elapsed = (last.timestamp - first.timestamp).total_seconds()
+    assert elapsed == pytest.approx((TEST_SYNTHETIC_READS - 1) * TEST_READ_INTERVAL)
+
+def test_create_scan_source():
+    assert isinstance(create_scan_source("synthetic"), SyntheticScanSource)
+    assert isinstance(create_scan_source("replay"), ReplayScanSource)
+    with pytest.raises(ValueError):
+        create_scan_source("unknown")
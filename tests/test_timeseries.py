@@ -0,0 +1,76 @@
+"""
+Tests for the timeseries module.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import SCAN_INTERVAL, make_results
+
+from app.timeseries import EPOCH, MinuteRollups, RollupStats, minute_index
+from app.windows import ScanHistory
+
+# Test constants
+TEST_START = datetime(2024, 3, 20, 10, 7, 30)
+TEST_RESULTS_COUNT = 300
+TEST_HISTORY_LENGTH = 100
+TEST_INTERVALS = (1, 7, 60, 90, 120, 1440)
+
+def expected_slots(results, start_time, end_time, interval_minutes):
+    """Group results into aligned slots by brute force."""
+    interval = timedelta(minutes=interval_minutes)
+    slot_time = EPOCH + (start_time - EPOCH) // interval * interval
+    slots = []
+    while slot_time <= end_time:
+        stats = RollupStats()
+        for result in results:
+            if slot_time <= result.timestamp < slot_time + interval:
+                stats.add(result)
+        slots.append(stats.to_slot(slot_time))
+        slot_time += interval
+    return slots
+
+@pytest.mark.parametrize("interval_minutes", TEST_INTERVALS)
+def test_slots_are_aligned_to_interval(interval_minutes):
+    rollups = MinuteRollups()
+    results = make_results(TEST_RESULTS_COUNT, TEST_START)
+    for result in results:
+        rollups.append(result)
+    end_time = results[-1].timestamp
+
+    slots = rollups.get_slots(TEST_START, end_time, interval_minutes)
+
+    assert slots == expected_slots(results, TEST_START, end_time, interval_minutes)
+    for slot in slots:
+        assert minute_index(datetime.fromisoformat(slot["timestamp"])) % interval_minutes == 0
+
+def test_two_hour_slots_start_on_even_hours():
+    rollups = MinuteRollups()
+    for result in make_results(TEST_RESULTS_COUNT, TEST_START):
+        rollups.append(result)
+    slots = rollups.get_slots(TEST_START, TEST_START + TEST_RESULTS_COUNT * SCAN_INTERVAL, 120)
+    assert [slot["timestamp"] for slot in slots] == [
+        "2024-03-20T10:00:00", "2024-03-20T12:00:00", "2024-03-20T14:00:00"
+    ]
+
+def test_empty_slots():
+    slots = MinuteRollups().get_slots(TEST_START, TEST_START + timedelta(hours=1), 30)
+    assert len(slots) == 3  # noqa: PLR2004 (10:00, 10:30 and 11:00)
+    assert all(slot["average_unique_devices"] == 0 for slot in slots)
+    assert all(slot["manufacturer_stats"] == {} for slot in slots)
+
+def test_evicted_results_leave_their_buckets():
+    rollups = MinuteRollups()
+    history = ScanHistory(maxlen=TEST_HISTORY_LENGTH, aggregates=[rollups])
+    # Two results a minute, so evictions rebuild buckets that still hold a result
+    results = make_results(TEST_RESULTS_COUNT, TEST_START)
+    for i, result in enumerate(results):
+        result.timestamp = TEST_START + i // 2 * SCAN_INTERVAL
+    history.extend(results)
+
+    end_time = results[-1].timestamp
+    kept = results[-TEST_HISTORY_LENGTH:]
+    assert rollups.get_slots(TEST_START, end_time, 15) == expected_slots(kept, TEST_START, end_time, 15)
+    assert len(rollups) == TEST_HISTORY_LENGTH // 2
+
+    history.clear()
+    assert len(rollups) == 0
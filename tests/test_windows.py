@@ -0,0 +1,83 @@
+"""
+Tests for the windows module.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import SCAN_INTERVAL, make_results
+
+from app.sketch import merge_sketches
+from app.windows import ScanHistory, SlidingWindowMetrics
+
+# Test constants
+TEST_WINDOW = timedelta(minutes=30)
+TEST_RESULTS_COUNT = 200
+TEST_HISTORY_LENGTH = 50
+
+def expected_metrics(results):
+    """Metrics computed directly from a list of results."""
+    count = len(results)
+    manufacturer_sums = {}
+    for result in results:
+        for key, value in result.manufacturer_stats.items():
+            manufacturer_sums[key] = manufacturer_sums.get(key, 0) + value
+    return {
+        "average_unique_devices": sum(r.unique_devices for r in results) / count,
+        "average_ios_devices": sum(r.ios_devices for r in results) / count,
+        "average_other_devices": sum(r.other_devices for r in results) / count,
+        "peak_unique_devices": max(r.unique_devices for r in results),
+        "peak_ios_devices": max(r.ios_devices for r in results),
+        "peak_other_devices": max(r.other_devices for r in results),
+        "manufacturer_stats": {
+            key: value / count for key, value in manufacturer_sums.items()
+        },
+        "dwell_time_percentiles": merge_sketches([r.dwell_sketch for r in results]).percentiles()
+    }
+
+def assert_metrics_equal(metrics, results):
+    expected = expected_metrics(results)
+    manufacturer_stats = expected.pop("manufacturer_stats")
+    for key, value in expected.items():
+        assert metrics[key] == pytest.approx(value), key
+    assert len(metrics["manufacturer_stats"]) == len(manufacturer_stats)
+    assert sorted(metrics["manufacturer_stats"].values()) == pytest.approx(sorted(manufacturer_stats.values()))
+
+@pytest.mark.parametrize("fractional", [False, True])
+def test_window_matches_recomputed_metrics(fractional):
+    now = datetime.now()
+    results = make_results(TEST_RESULTS_COUNT, now, fractional)
+    window = SlidingWindowMetrics(TEST_WINDOW)
+    for i, result in enumerate(results):
+        window.append(result)
+        current_time = result.timestamp
+        in_window = [r for r in results[:i + 1] if r.timestamp >= current_time - TEST_WINDOW]
+        assert_metrics_equal(window.get_metrics(current_time), in_window)
+        assert len(window) == len(in_window)
+
+def test_empty_window():
+    window = SlidingWindowMetrics(TEST_WINDOW)
+    window.extend(make_results(TEST_RESULTS_COUNT, datetime.now()))
+    metrics = window.get_metrics(datetime.now() + TEST_RESULTS_COUNT * SCAN_INTERVAL + TEST_WINDOW)
+    assert len(window) == 0
+    assert metrics["average_unique_devices"] == 0
+    assert metrics["peak_unique_devices"] == 0
+    assert metrics["manufacturer_stats"] == {}
+
+def test_history_evictions_update_windows():
+    window = SlidingWindowMetrics(timedelta(days=1))
+    history = ScanHistory(maxlen=TEST_HISTORY_LENGTH, aggregates=[window])
+    results = make_results(TEST_RESULTS_COUNT, datetime.now())
+    history.extend(results)
+
+    assert len(window) == TEST_HISTORY_LENGTH
+    assert_metrics_equal(window.get_metrics(results[-1].timestamp), results[-TEST_HISTORY_LENGTH:])
+
+    history.clear()
+    assert len(window) == 0
+
+def test_history_loads_initial_results():
+    window = SlidingWindowMetrics(timedelta(days=1))
+    results = make_results(TEST_HISTORY_LENGTH, datetime.now())
+    history = ScanHistory(results, TEST_HISTORY_LENGTH, [window])
+    assert list(history) == results
+    assert len(window) == TEST_HISTORY_LENGTH